@@ -1,7 +1,13 @@
 import os
 import logging
 
-import copy
+import heapq
+import random
+import itertools
+import contextlib
+import multiprocessing
+
+import numpy as np
 
 from tqdm import tqdm
 
@@ -24,6 +30,10 @@ import VLMP.components.simulationSteps as _simulationSteps
 
 from pyUAMMD.utils.merging.merging import mergeSimulationsSet
 
+from .utils.cache import simulationCache, modelsCache, hashObject
+from .utils.merge import mergeSimulations, simulationSetAggregator
+from .utils.scoring import estimateSimulationCost, scoringProperties
+
 import importlib
 import inspect
 
@@ -82,9 +92,12 @@ class VLMP:
 
     #Distribute functions
 
-    def __distributeSimulationPoolByMaxNumberOfParticles(self,maxNumberOfParticles):
+    def __distributeSimulationPoolByUpperLimit(self,scoringPropertyName,upperLimit):
+
+        scoringProperty = scoringProperties[scoringPropertyName]
 
         simulationSets = []
+        setsScores     = []
 
         for simSet in self.simulationSets:
 
@@ -92,25 +105,25 @@ class VLMP:
             currentSetSize = 0
 
             for simName in simSet:
-                sim = self.simulations[simName]
-                if currentSetSize + sim.getNumberOfParticles() > maxNumberOfParticles:
+                simScore = scoringProperty(self.simulations[simName])
+                if currentSetSize + simScore > upperLimit:
                     if len(currentSet) > 0:
                         simulationSets.append(currentSet)
+                        setsScores.append(currentSetSize)
                     currentSet     = []
                     currentSetSize = 0
 
                 currentSet.append(simName)
-                currentSetSize += sim.getNumberOfParticles()
+                currentSetSize += simScore
 
             if len(currentSet) > 0:
                 simulationSets.append(currentSet)
+                setsScores.append(currentSetSize)
 
-        #Print the number of simulations and the number of particles in each set
+        #Print the number of simulations and the score in each set
         for i in range(len(simulationSets)):
-            self.logger.debug("[VLMP] Simulation set %d has %d simulations and %d particles (max %d)",
-                              i,len(simulationSets[i]),
-                              sum([self.simulations[simName].getNumberOfParticles() for simName in simulationSets[i]]),
-                              maxNumberOfParticles)
+            self.logger.debug("[VLMP] Simulation set %d has %d simulations and %s %s (max %s)",
+                              i,len(simulationSets[i]),setsScores[i],scoringPropertyName,upperLimit)
 
         return simulationSets.copy()
 
@@ -143,6 +156,59 @@ class VLMP:
 
         return simulationSets.copy()
 
+    def __distributeSimulationPoolBalanced(self,numberOfSets):
+
+        #Each simulation set is split into (at most) numberOfSets sets with similar estimated costs.
+        #Simulations are assigned, from the most to the least expensive, to the set with the lowest
+        #cost so far (longest processing time first), which keeps the slowest set close to the average.
+
+        simulationSets = []
+
+        for simSet in self.simulationSets:
+
+            costs = {simName:estimateSimulationCost(self.simulations[simName]) for simName in simSet}
+            order = sorted(simSet,key=lambda simName:costs[simName],reverse=True)
+
+            nSets       = min(numberOfSets,len(simSet))
+            currentSets = [[] for _ in range(nSets)]
+            setsCosts   = [(0.0,i) for i in range(nSets)]
+            for simName in order:
+                setCost,i = heapq.heappop(setsCosts)
+                currentSets[i].append(simName)
+                heapq.heappush(setsCosts,(setCost+costs[simName],i))
+
+            #Keep the pool order inside each set
+            poolOrder = {simName:i for i,simName in enumerate(simSet)}
+            for currentSet in currentSets:
+                currentSet.sort(key=lambda simName:poolOrder[simName])
+
+            setsCosts = sorted(setsCosts,key=lambda sc:sc[1])
+            for (setCost,_),currentSet in zip(setsCosts,currentSets):
+                if len(currentSet) == 0:
+                    continue
+                self.logger.debug("[VLMP] Simulation set %d has %d simulations (estimated cost %.3e)",
+                                  len(simulationSets),len(currentSet),setCost)
+                simulationSets.append(currentSet)
+
+        return simulationSets.copy()
+
+    def __getSimulationProperty(self,sim,propertyPath):
+        try:
+            propertyValue = sim[propertyPath[0]]
+            for i in range(1,len(propertyPath)):
+                propertyValue = propertyValue[propertyPath[i]]
+        except (KeyError,IndexError,TypeError):
+            self.logger.error("[VLMP] Property \"%s\" not found in simulation",propertyPath)
+            raise Exception("Property not found in simulation")
+
+        #The value is used to group the simulations, lists (for example ["Ensemble","NVT"]) are converted to tuples
+        def hashable(value):
+            if isinstance(value,list):
+                return tuple(hashable(v) for v in value)
+            return value
+
+        return hashable(propertyValue)
+
     def __distributeSimulationPoolByProperty(self,propertyPath):
 
         simulationSets = []
@@ -152,15 +218,7 @@ class VLMP:
             simulationSetsProp = {}
 
             for simName in simSet:
-                sim = self.simulations[simName]
-                #Get the property value
-                try:
-                    propertyValue = sim[propertyPath[0]]
-                    for i in range(1,len(propertyPath)):
-                        propertyValue = propertyValue[propertyPath[i]]
-                except:
-                    self.logger.error("[VLMP] Property \"%s\" not found in simulation",propertyPath)
-                    raise Exception("Property not found in simulation")
+                propertyValue = self.__getSimulationProperty(self.simulations[simName],propertyPath)
 
                 if propertyValue not in simulationSetsProp.keys():
                     simulationSetsProp[propertyValue] = []
@@ -213,6 +271,16 @@ class VLMP:
 
         return componentType,componentName,componentParameters
 
+    def __initComponent(self,sectionName,componentClass,args,param):
+        #Models are built through the models cache, repeated models are cloned instead of rebuilt
+        if sectionName == "models":
+            args  = args.copy()
+            name  = args.pop("name")
+            units,types,ensemble = args.pop("units"),args.pop("types"),args.pop("ensemble")
+            if len(args) == 0:
+                return self.modelsCache.build(componentClass,name,units,types,ensemble,param)
+        return componentClass(**args,**param)
+
     def __processSimulationPoolSection(self,
                                        simulationBuffer,
                                        simulationInfo,
@@ -275,7 +343,7 @@ class VLMP:
 
                     try:
 
-                        initComp = eval(f"_{sectionNamePlural}.{typ}")(**args, **param)
+                        initComp = self.__initComponent(sectionName,eval(f"_{sectionNamePlural}.{typ}"),args,param)
 
                         if addToSimulationBuffer:
                             simulationBuffer[f"{sectionNamePlural}_{name}"] = initComp
@@ -288,7 +356,7 @@ class VLMP:
                 if isAdditionalComp:
                     try:
 
-                        initComp = eval(f"self.additional{sectionNameUpper}.{typ}")(**args,**param)
+                        initComp = self.__initComponent(sectionName,eval(f"self.additional{sectionNameUpper}.{typ}"),args,param)
 
                         if addToSimulationBuffer:
                             simulationBuffer[f"{sectionName}_{name}"] = initComp
@@ -302,14 +370,21 @@ class VLMP:
 
     ########################################
 
-    def __init__(self,additionalComponets = None):
+    def __init__(self,additionalComponets = None,modelsCacheSize = 0):
         self.logger = logging.getLogger("VLMP")
 
         self.logger.info("[VLMP] Starting VLMP")
 
+        self.additionalComponents = additionalComponets
+
         self.simulations    = OrderedDict()
         self.simulationSets = []
 
+        #Built models, reused by the simulations of the pool with the same models (see modelsCache).
+        #Disabled by default, it is only useful for pools which repeat the same models
+        self.modelsCacheSize = modelsCacheSize
+        self.modelsCache     = modelsCache(modelsCacheSize)
+
         self.availableComponents = ["system","units","types","ensemble",
                                     "models","modelOperations","modelExtensions",
                                     "integrators",
@@ -329,199 +404,323 @@ class VLMP:
 
         self.__setUpAdditionalComponents(additionalComponets)
 
-    def loadSimulationPool(self,simulationPool:list):
+    def __getSimulationName(self,simulationInfo):
 
-        self.simulationsInfo = {}
+        #Check all keys are available components
+        for key in simulationInfo.keys():
+            if key not in self.availableComponents:
+                self.logger.error("[VLMP] Unknown component \"%s\"",key)
+                self.logger.error("[VLMP] Available components are: %s",self.availableComponents)
+                raise Exception("Unknown component")
 
-        for simulationInfo in simulationPool:
+        # Check there is one (and only one) system component of type "simulationName"
+        simNameComponents = [component for component in simulationInfo["system"] if component["type"] == "simulationName"]
+        if len(simNameComponents) == 0:
+            self.logger.error("[VLMP] Simulation name not specified")
+            raise Exception("Simulation name not specified")
+        elif len(simNameComponents) > 1:
+            self.logger.error("[VLMP] More than one simulation name specified")
+            raise Exception("More than one simulation name specified")
+
+        return simNameComponents[0].get("parameters",{}).get("simulationName",None)
+
+    def __getSimulationSeed(self,simulationInfo):
 
-            #Check all keys are available components
-            for key in simulationInfo.keys():
-                if key not in self.availableComponents:
-                    self.logger.error("[VLMP] Unknown component \"%s\"",key)
-                    self.logger.error("[VLMP] Available components are: %s",self.availableComponents)
-                    raise Exception("Unknown component")
+        seedComponents = [component for component in simulationInfo["system"] if component["type"] == "seed"]
+        if len(seedComponents) == 0:
+            return None
 
-            simulationBuffer = OrderedDict()
+        return seedComponents[0].get("parameters",{}).get("seed",None)
 
-            ############## SYSTEM ##############
+    def __getBuildSeed(self,simulationInfo):
 
-            #### Get simulation name ####
+        #Seed of the random generators used while the simulation is built.
+        #Simulations with a seed component get a seed derived from it and from the simulation name,
+        #so simulations sharing the seed (for example replicas in the same set) are built with different random numbers.
+        #Otherwise the seed is drawn from the random generators, so a seeded script gives the same pool.
+        seed = self.__getSimulationSeed(simulationInfo)
 
-            # Check there is one (and only one) system component of type "simulationName"
-            simNameComponents = [component for component in simulationInfo["system"] if component["type"] == "simulationName"]
-            if len(simNameComponents) == 0:
-                self.logger.error("[VLMP] Simulation name not specified")
-                raise Exception("Simulation name not specified")
-            elif len(simNameComponents) > 1:
-                self.logger.error("[VLMP] More than one simulation name specified")
-                raise Exception("More than one simulation name specified")
+        if seed is None:
+            buildSeed = hashObject({"random":random.getrandbits(32),
+                                    "numpy":int(np.random.randint(2**32,dtype=np.uint64))})
+        else:
+            buildSeed = hashObject({"seed":seed,
+                                    "simulationName":self.__getSimulationName(simulationInfo)})
+
+        return int(buildSeed[:8],16)
+
+    def _buildSimulation(self,simulationInfo,buildSeed):
+
+        #The random generators are seeded with the build seed while the simulation is built.
+        #This makes the build independent of the order (or the process) in which the simulations of the pool are built.
+        randomState   = random.getstate()
+        npRandomState = np.random.get_state()
+
+        random.seed(buildSeed)
+        np.random.seed(buildSeed)
+
+        try:
+            return self.__buildSimulationComponents(simulationInfo)
+        finally:
+            random.setstate(randomState)
+            np.random.set_state(npRandomState)
+
+    def __buildSimulationComponents(self,simulationInfo):
 
-            for comp in simulationInfo["system"]:
+        simulationBuffer = OrderedDict()
 
-                typ, name, param = self.__checkComponent(comp,"system",simulationBuffer)
+        ############## SYSTEM ##############
 
-                #Read simulationName
-                if typ == "simulationName":
-                    simulationName = param["simulationName"]
+        for comp in simulationInfo["system"]:
 
-                    #Check if other simulation with the same name has been already created
-                    if simulationName in self.simulations.keys():
-                        self.logger.error(f"[VLMP] Simulation with name \"{simulationName}\" already exists")
-                        raise Exception("Simulation already exists")
+            typ, name, param = self.__checkComponent(comp,"system",simulationBuffer)
 
-            #############################
+            #Read simulationName
+            if typ == "simulationName":
+                simulationName = param["simulationName"]
 
-            _ = self.__processSimulationPoolSection(simulationBuffer = simulationBuffer,
-                                                    simulationInfo   = simulationInfo,
-                                                    sectionName      = "system",
+        #############################
+
+        _ = self.__processSimulationPoolSection(simulationBuffer = simulationBuffer,
+                                                simulationInfo   = simulationInfo,
+                                                sectionName      = "system",
+                                                addToSimulationBuffer = True,
+                                                required = True,
+                                                unique   = False,
+                                                units    = None,
+                                                types    = None,
+                                                ensemble = None,
+                                                models   = None)
+
+        ############## UNITS ##############
+
+        units = self.__processSimulationPoolSection(simulationBuffer = simulationBuffer,
+                                                    simulationInfo = simulationInfo,
+                                                    sectionName    = "units",
                                                     addToSimulationBuffer = True,
                                                     required = True,
-                                                    unique   = False,
+                                                    unique   = True,
                                                     units    = None,
                                                     types    = None,
                                                     ensemble = None,
                                                     models   = None)
 
-            ############## UNITS ##############
-
-            units = self.__processSimulationPoolSection(simulationBuffer = simulationBuffer,
-                                                        simulationInfo = simulationInfo,
-                                                        sectionName    = "units",
-                                                        addToSimulationBuffer = True,
-                                                        required = True,
-                                                        unique   = True,
-                                                        units    = None,
-                                                        types    = None,
-                                                        ensemble = None,
-                                                        models   = None)
-
-            units = simulationBuffer[units[0]]
-
-            ############## TYPES ##############
-
-            types = self.__processSimulationPoolSection(simulationBuffer = simulationBuffer,
-                                                        simulationInfo = simulationInfo,
-                                                        sectionName    = "types",
-                                                        addToSimulationBuffer = True,
-                                                        required = True,
-                                                        unique   = True,
-                                                        units    = units,
-                                                        types    = None,
-                                                        ensemble = None,
-                                                        models   = None)
-
-            types = simulationBuffer[types[0]]
-
-            ############## ENSEMBLE ##############
-
-            ensemble = self.__processSimulationPoolSection(simulationBuffer = simulationBuffer,
-                                                           simulationInfo = simulationInfo,
-                                                           sectionName    = "ensemble",
-                                                           addToSimulationBuffer = True,
-                                                           required = True,
-                                                           unique   = True,
-                                                           units    = units,
-                                                           types    = types,
-                                                           ensemble = None,
-                                                           models   = None)
-
-            ensemble = simulationBuffer[ensemble[0]]
-
-            ############### MODEL ###############
-
-            models = self.__processSimulationPoolSection(simulationBuffer = simulationBuffer,
-                                                         simulationInfo = simulationInfo,
-                                                         sectionName    = "models",
-                                                         addToSimulationBuffer = True,
-                                                         required = True,
-                                                         unique   = False,
-                                                         units    = units,
-                                                         types    = types,
-                                                         ensemble = ensemble,
-                                                         models   = None)
-
-            #Set idOffset for each model
-            idOffset = 0
-            for mdl in models:
-                simulationBuffer[mdl].setIdOffset(idOffset)
-                ids = simulationBuffer[mdl].getLocalIds()
-                if len(ids) != 0:
-                    idOffset += max(ids) + 1
-
-            models = [simulationBuffer[model] for model in models]
-
-            ############### MODEL OPERATIONS ###############
-
-            _ = self.__processSimulationPoolSection(simulationBuffer = simulationBuffer,
-                                                    simulationInfo = simulationInfo,
-                                                    sectionName    = "modelOperations",
-                                                    addToSimulationBuffer = False,
-                                                    required = False,
-                                                    unique   = False,
-                                                    units    = units,
-                                                    types    = types,
-                                                    ensemble = ensemble,
-                                                    models   = models)
-
-            ############### MODEL EXTENSIONS ###############
+        units = simulationBuffer[units[0]]
 
-            _ = self.__processSimulationPoolSection(simulationBuffer = simulationBuffer,
-                                                    simulationInfo = simulationInfo,
-                                                    sectionName    = "modelExtensions",
-                                                    addToSimulationBuffer = True,
-                                                    required = False,
-                                                    unique   = False,
-                                                    units    = units,
-                                                    types    = types,
-                                                    ensemble = ensemble,
-                                                    models   = models)
+        ############## TYPES ##############
 
-            ############## INTEGRATOR ##############
-
-            _ = self.__processSimulationPoolSection(simulationBuffer = simulationBuffer,
+        types = self.__processSimulationPoolSection(simulationBuffer = simulationBuffer,
                                                     simulationInfo = simulationInfo,
-                                                    sectionName    = "integrators",
+                                                    sectionName    = "types",
                                                     addToSimulationBuffer = True,
                                                     required = True,
-                                                    unique   = False,
+                                                    unique   = True,
                                                     units    = units,
-                                                    types    = types,
-                                                    ensemble = ensemble,
-                                                    models   = models)
-
-            ############### SIMULATION STEPS ###############
+                                                    types    = None,
+                                                    ensemble = None,
+                                                    models   = None)
 
-            _ = self.__processSimulationPoolSection(simulationBuffer = simulationBuffer,
-                                                    simulationInfo = simulationInfo,
-                                                    sectionName    = "simulationSteps",
-                                                    addToSimulationBuffer = True,
-                                                    required = False,
-                                                    unique   = False,
-                                                    units    = units,
-                                                    types    = types,
-                                                    ensemble = ensemble,
-                                                    models   = models)
+        types = simulationBuffer[types[0]]
+
+        ############## ENSEMBLE ##############
+
+        ensemble = self.__processSimulationPoolSection(simulationBuffer = simulationBuffer,
+                                                       simulationInfo = simulationInfo,
+                                                       sectionName    = "ensemble",
+                                                       addToSimulationBuffer = True,
+                                                       required = True,
+                                                       unique   = True,
+                                                       units    = units,
+                                                       types    = types,
+                                                       ensemble = None,
+                                                       models   = None)
+
+        ensemble = simulationBuffer[ensemble[0]]
+
+        ############### MODEL ###############
+
+        models = self.__processSimulationPoolSection(simulationBuffer = simulationBuffer,
+                                                     simulationInfo = simulationInfo,
+                                                     sectionName    = "models",
+                                                     addToSimulationBuffer = True,
+                                                     required = True,
+                                                     unique   = False,
+                                                     units    = units,
+                                                     types    = types,
+                                                     ensemble = ensemble,
+                                                     models   = None)
+
+        #Set idOffset for each model
+        idOffset = 0
+        for mdl in models:
+            simulationBuffer[mdl].setIdOffset(idOffset)
+            ids = simulationBuffer[mdl].getLocalIds()
+            if len(ids) != 0:
+                idOffset += max(ids) + 1
+
+        models = [simulationBuffer[model] for model in models]
+
+        ############### MODEL OPERATIONS ###############
+
+        _ = self.__processSimulationPoolSection(simulationBuffer = simulationBuffer,
+                                                simulationInfo = simulationInfo,
+                                                sectionName    = "modelOperations",
+                                                addToSimulationBuffer = False,
+                                                required = False,
+                                                unique   = False,
+                                                units    = units,
+                                                types    = types,
+                                                ensemble = ensemble,
+                                                models   = models)
+
+        ############### MODEL EXTENSIONS ###############
+
+        _ = self.__processSimulationPoolSection(simulationBuffer = simulationBuffer,
+                                                simulationInfo = simulationInfo,
+                                                sectionName    = "modelExtensions",
+                                                addToSimulationBuffer = True,
+                                                required = False,
+                                                unique   = False,
+                                                units    = units,
+                                                types    = types,
+                                                ensemble = ensemble,
+                                                models   = models)
+
+        ############## INTEGRATOR ##############
+
+        _ = self.__processSimulationPoolSection(simulationBuffer = simulationBuffer,
+                                                simulationInfo = simulationInfo,
+                                                sectionName    = "integrators",
+                                                addToSimulationBuffer = True,
+                                                required = True,
+                                                unique   = False,
+                                                units    = units,
+                                                types    = types,
+                                                ensemble = ensemble,
+                                                models   = models)
+
+        ############### SIMULATION STEPS ###############
+
+        _ = self.__processSimulationPoolSection(simulationBuffer = simulationBuffer,
+                                                simulationInfo = simulationInfo,
+                                                sectionName    = "simulationSteps",
+                                                addToSimulationBuffer = True,
+                                                required = False,
+                                                unique   = False,
+                                                units    = units,
+                                                types    = types,
+                                                ensemble = ensemble,
+                                                models   = models)
 
-            ###############################################
+        ###############################################
 
-            #Merge all components into a single simulation
-            self.logger.debug("[VLMP] Merging components into a single simulation")
+        #Merge all components into a single simulation.
+        #Components hand over their data (it is not copied), they are not used after the merge
+        self.logger.debug("[VLMP] Merging components into a single simulation")
 
-            sim = None
+        def componentsSimulations():
             for componentName,component in simulationBuffer.items():
                 self.logger.debug(f"[VLMP] Merging component \"{componentName}\"")
-                if sim is None:
-                    sim = component.getSimulation(DEBUG_MODE)
+                if "handOver" in inspect.signature(component.getSimulation).parameters:
+                    yield component.getSimulation(DEBUG_MODE,handOver=True)
                 else:
-                    sim.append(component.getSimulation(DEBUG_MODE),mode="modelId")
-                self.logger.debug(f"[VLMP] Component \"{componentName}\" merged")
-            #Simulation creation finished
+                    yield component.getSimulation(DEBUG_MODE)
 
-            ###############################################
+        sim = mergeSimulations(componentsSimulations(),DEBUG_MODE)
+        #Simulation creation finished
 
-            #Store the simulation
-            self.simulationsInfo[simulationName] = copy.deepcopy(simulationInfo)
+        ###############################################
+
+        return simulationName,sim
+
+    def __createWorkersPool(self,workers):
+        return multiprocessing.Pool(processes=workers,
+                                    initializer=_initBuildWorker,
+                                    initargs=(self.additionalComponents,self.modelsCacheSize))
+
+    def __buildSimulationPool(self,simulationPool,cache = None,workersPool = None):
+
+        #Returns the list of (simulationName,simulation) of simulationPool, in pool order, and the number
+        #of simulations loaded from the cache. If a cache is given, simulations already built (same simulation
+        #info and same components sources) are loaded from the cache and only the rest are built.
+        #Only simulations with a seed component are cached (see simulationCache)
+        builtSimulations = [None]*len(simulationPool)
+        cacheKeys        = {}
+        if cache is not None:
+            for i,simulationInfo in enumerate(simulationPool):
+                if not cache.isCacheable(simulationInfo):
+                    continue
+                cacheKeys[i] = cache.getKey(simulationInfo)
+                sim = cache.load(cacheKeys[i],DEBUG_MODE)
+                if sim is not None:
+                    builtSimulations[i] = (self.__getSimulationName(simulationInfo),sim)
+
+            if len(cacheKeys) < len(simulationPool):
+                self.logger.debug(f"[VLMP] {len(simulationPool)-len(cacheKeys)} simulations without a seed component are not cached")
+
+        nLoaded = len(simulationPool)-builtSimulations.count(None)
+        toBuild = [i for i,built in enumerate(builtSimulations) if built is None]
+
+        #Build seeds are computed in pool order, before building, so they do not depend on the number of workers
+        buildSeeds = {i:self.__getBuildSeed(simulationPool[i]) for i in toBuild}
+
+        #Simulations are independent until they are set up, so they can be built in parallel.
+        #Results are returned in pool order.
+        if workersPool is None or len(toBuild) <= 1:
+            for i in toBuild:
+                builtSimulations[i] = self._buildSimulation(simulationPool[i],buildSeeds[i])
+        else:
+            built = workersPool.imap(_buildSimulationWorker,[(simulationPool[i],buildSeeds[i]) for i in toBuild])
+            for i,b in zip(toBuild,tqdm(built,total=len(toBuild),desc="Building simulation pool")):
+                builtSimulations[i] = b
+
+        for i in toBuild:
+            if i in cacheKeys:
+                cache.store(cacheKeys[i],builtSimulations[i][1])
+
+        return builtSimulations,nLoaded
+
+    def __getSimulationCache(self,cacheFolder):
+        if cacheFolder is None:
+            return None
+        return simulationCache(cacheFolder,[os.path.dirname(os.path.abspath(__file__)),
+                                            self.additionalComponents])
+
+    def loadSimulationPool(self,simulationPool:list,workers:int = 1,cacheFolder:str = None):
+
+        self.simulationsInfo = {}
+
+        if workers < 1:
+            self.logger.error("[VLMP] Number of workers must be at least 1, but %s was given",workers)
+            raise Exception("Invalid number of workers")
+
+        #Check simulation names before building, two simulations can not share a name
+        poolNames = set()
+        for simulationInfo in simulationPool:
+            simulationName = self.__getSimulationName(simulationInfo)
+
+            if simulationName in self.simulations.keys() or simulationName in poolNames:
+                self.logger.error(f"[VLMP] Simulation with name \"{simulationName}\" already exists")
+                raise Exception("Simulation already exists")
+            poolNames.add(simulationName)
+
+        cache = self.__getSimulationCache(cacheFolder)
+
+        if workers == 1:
+            builtSimulations,nLoaded = self.__buildSimulationPool(simulationPool,cache)
+        else:
+            self.logger.info(f"[VLMP] Building simulation pool using {workers} workers")
+            with self.__createWorkersPool(workers) as workersPool:
+                builtSimulations,nLoaded = self.__buildSimulationPool(simulationPool,cache,workersPool)
+
+        if cache is not None:
+            self.logger.info(f"[VLMP] Simulations loaded from cache: {nLoaded}/{len(simulationPool)}")
+
+        for simulationInfo,(simulationName,sim) in zip(simulationPool,builtSimulations):
+
+            #Store the simulation. The simulation info is not copied,
+            #the simulation pool must not be modified after it is loaded
+            self.simulationsInfo[simulationName] = simulationInfo
             self.simulations[simulationName]     = sim
 
         ###############################################
@@ -531,16 +730,12 @@ class VLMP:
         #Create default simulation set, all simulations in one set
         self.simulationSets = [list(self.simulations.keys())]
 
-    def distributeSimulationPool(self,*mode):
+    def __processDistributionMode(self,mode):
 
-        availableModes = ["none","one","upperLimit","size","property"]
+        #Check the distribution mode, returns its name and its parameter (if any)
 
-        #Check at least one simulations has been loaded
-        if len(self.simulations) == 0:
-            self.logger.error("[VLMP] No simulations loaded")
-            raise Exception("No simulations loaded")
+        availableModes = ["none","one","upperLimit","size","property","balanced"]
 
-        #Check mode
         if len(mode) == 0:
             self.logger.warning("[VLMP] No mode specified, using \"none\"")
             modeName = "none"
@@ -551,72 +746,90 @@ class VLMP:
         if modeName not in availableModes:
             self.logger.error("[VLMP] Distribute mode \"%s\" not available, available modes are: %s",modeName,availableModes)
             raise Exception("Distribute mode not available")
-        else:
-            #Switch to the selected mode
-            if modeName == "none":
-                pass
-            elif  modeName == "one":
-                self.simulationSets = [[i] for i in self.simulations.keys()]
-            elif modeName == "upperLimit":
-                self.logger.debug("[VLMP] Distributing simulation pool using upper limit")
-                availableScoringProperties = ["numberOfParticles"]
-
-                if len(mode) >= 2:
-                    scoringPropertyName = mode[1]
-                else:
-                    self.logger.error("[VLMP] No scoring property specified")
-                    raise Exception("No scoring property specified")
 
-                if scoringPropertyName not in availableScoringProperties:
-                    self.logger.error("[VLMP] Scoring property \"%s\" not available, available properties are: %s",
-                                      scoringPropertyName,availableScoringProperties)
-                    raise Exception("Scoring property not available")
-                else:
-                    #Switch to the selected scoring property
-                    if scoringPropertyName == "numberOfParticles":
-                        self.logger.debug("[VLMP] Distributing simulation pool using number of particles")
-                        if len(mode) >= 3:
-                            maxNumberOfParticles = mode[2]
-                        else:
-                            self.logger.error("[VLMP] No particle limit specified")
-                            raise Exception("No upper limit specified")
-
-                        #Distribute the simulation pool
-                        self.simulationSets = self.__distributeSimulationPoolByMaxNumberOfParticles(maxNumberOfParticles)
-                    #Scoring property switch finished
-            elif modeName == "size":
-                self.logger.debug("[VLMP] Distributing simulation pool using size")
-
-                if len(mode) >= 2:
-                    size = mode[1]
-                else:
-                    self.logger.error("[VLMP] No size specified")
-                    raise Exception("No size specified")
+        modeParameter = None
+        #Switch to the selected mode
+        if modeName == "upperLimit":
+            availableScoringProperties = list(scoringProperties.keys())
 
-                #Distribute the simulation pool
-                self.simulationSets = self.__distributeSimulationPoolBySize(size)
+            if len(mode) >= 2:
+                scoringPropertyName = mode[1]
+            else:
+                self.logger.error("[VLMP] No scoring property specified")
+                raise Exception("No scoring property specified")
 
-            elif modeName == "property":
-                self.logger.debug("[VLMP] Distributing simulation pool using property")
-
-                if len(mode) >= 2:
-                    propertyPath = mode[1]
-                    #Check if property path is valid is list of strings
-                    if not isinstance(propertyPath,list):
-                        self.logger.error("[VLMP] Property path must be a list of strings")
-                        raise Exception("Property path must be a list of strings")
-                    else:
-                        for property in propertyPath:
-                            if not isinstance(property,str):
-                                self.logger.error("[VLMP] Property path must be a list of strings")
-                                raise Exception("Property path must be a list of strings")
+            if scoringPropertyName not in availableScoringProperties:
+                self.logger.error("[VLMP] Scoring property \"%s\" not available, available properties are: %s",
+                                  scoringPropertyName,availableScoringProperties)
+                raise Exception("Scoring property not available")
+
+            if len(mode) >= 3:
+                modeParameter = (scoringPropertyName,mode[2])
+            else:
+                self.logger.error("[VLMP] No upper limit specified for scoring property \"%s\"",scoringPropertyName)
+                raise Exception("No upper limit specified")
+
+        elif modeName == "size":
+            if len(mode) >= 2:
+                modeParameter = mode[1]
+            else:
+                self.logger.error("[VLMP] No size specified")
+                raise Exception("No size specified")
+
+        elif modeName == "property":
+            if len(mode) >= 2:
+                modeParameter = mode[1]
+                #Check if property path is valid is list of strings
+                if not isinstance(modeParameter,list):
+                    self.logger.error("[VLMP] Property path must be a list of strings")
+                    raise Exception("Property path must be a list of strings")
                 else:
-                    self.logger.error("[VLMP] No property path specified")
-                    raise Exception("No scoring property specified")
+                    for property in modeParameter:
+                        if not isinstance(property,str):
+                            self.logger.error("[VLMP] Property path must be a list of strings")
+                            raise Exception("Property path must be a list of strings")
+            else:
+                self.logger.error("[VLMP] No property path specified")
+                raise Exception("No scoring property specified")
+
+        elif modeName == "balanced":
+            if len(mode) >= 2:
+                modeParameter = mode[1]
+                if not isinstance(modeParameter,int) or modeParameter < 1:
+                    self.logger.error("[VLMP] Number of sets must be a positive integer, but %s was given",modeParameter)
+                    raise Exception("Invalid number of sets")
+            else:
+                self.logger.error("[VLMP] No number of sets specified")
+                raise Exception("No number of sets specified")
+
+        return modeName,modeParameter
+
+    def distributeSimulationPool(self,*mode):
 
-                #Distribute the simulation pool
-                self.simulationSets = self.__distributeSimulationPoolByProperty(propertyPath)
+        #Check at least one simulations has been loaded
+        if len(self.simulations) == 0:
+            self.logger.error("[VLMP] No simulations loaded")
+            raise Exception("No simulations loaded")
 
+        modeName,modeParameter = self.__processDistributionMode(mode)
+
+        #Switch to the selected mode
+        if modeName == "none":
+            pass
+        elif  modeName == "one":
+            self.simulationSets = [[i] for i in self.simulations.keys()]
+        elif modeName == "upperLimit":
+            self.logger.debug("[VLMP] Distributing simulation pool using upper limit of \"%s\"",modeParameter[0])
+            self.simulationSets = self.__distributeSimulationPoolByUpperLimit(*modeParameter)
+        elif modeName == "size":
+            self.logger.debug("[VLMP] Distributing simulation pool using size")
+            self.simulationSets = self.__distributeSimulationPoolBySize(modeParameter)
+        elif modeName == "property":
+            self.logger.debug("[VLMP] Distributing simulation pool using property")
+            self.simulationSets = self.__distributeSimulationPoolByProperty(modeParameter)
+        elif modeName == "balanced":
+            self.logger.debug("[VLMP] Distributing simulation pool using estimated costs")
+            self.simulationSets = self.__distributeSimulationPoolBalanced(modeParameter)
 
         #Check all the simulations have been distributed.
         #simulationSets is a list of lists which contains the names of the simulations
@@ -630,21 +843,51 @@ class VLMP:
             self.logger.error("[VLMP] Simulation distribution failed")
             raise Exception("Simulation distribution failed")
 
-    def setUpSimulation(self, sessionName):
-        self.logger.debug("[VLMP] Setting up simulation")
+    def getSimulationPoolReport(self,scoringPropertiesNames:list = None):
 
-        if len(self.simulationSets) == 0:
-            self.logger.error("[VLMP] Simulation pool not distributed")
-            raise Exception("Simulation pool not distributed")
+        #Scores (see VLMP.utils.scoring) of each simulation and of each simulation set, so the
+        #distribution can be checked before the simulation is set up. The score of a set is the sum
+        #of the scores of its simulations, the aggregated simulation is not built.
 
-        ################################################
+        if len(self.simulations) == 0:
+            self.logger.error("[VLMP] No simulations loaded")
+            raise Exception("No simulations loaded")
+
+        if scoringPropertiesNames is None:
+            scoringPropertiesNames = list(scoringProperties.keys())
+
+        for scoringPropertyName in scoringPropertiesNames:
+            if scoringPropertyName not in scoringProperties.keys():
+                self.logger.error("[VLMP] Scoring property \"%s\" not available, available properties are: %s",
+                                  scoringPropertyName,list(scoringProperties.keys()))
+                raise Exception("Scoring property not available")
+
+        report = {"simulations":OrderedDict(),"simulationSets":[]}
+
+        for simName,sim in self.simulations.items():
+            report["simulations"][simName] = {prop:scoringProperties[prop](sim) for prop in scoringPropertiesNames}
+
+        for simSetIndex,simSet in enumerate(self.simulationSets):
+            setReport = {"name":f"simulationSet_{simSetIndex}","simulations":simSet.copy()}
+            for prop in scoringPropertiesNames:
+                setReport[prop] = sum([report["simulations"][simName][prop] for simName in simSet])
+            report["simulationSets"].append(setReport)
+
+            self.logger.info("[VLMP] Simulation set %d, %d simulations: %s",simSetIndex,len(simSet),
+                             ", ".join([f"{prop} {setReport[prop]:.4g}" for prop in scoringPropertiesNames]))
+
+        return report
+
+    ########################################
+
+    #Session writing functions
+
+    def __createSessionFolders(self,sessionName):
 
         #Create folder named sessionName
         if not os.path.exists(sessionName):
             os.makedirs(sessionName)
 
-        ################################################
-
         #Create folder sessionName/simulationSets
         if not os.path.exists(os.path.join(sessionName,"simulationSets")):
             os.makedirs(os.path.join(sessionName,"simulationSets"))
@@ -653,69 +896,120 @@ class VLMP:
         if not os.path.exists(os.path.join(sessionName,"results")):
             os.makedirs(os.path.join(sessionName,"results"))
 
+    def __createSimulationSetFolder(self,sessionName,simSetIndex):
+
+        #Create folder sessionName/simulationSets/simulationSet_i
+        simulationSetName   = f"simulationSet_{simSetIndex}"
+        simulationSetFolder = os.path.join(sessionName,"simulationSets",simulationSetName)
+
+        if not os.path.exists(simulationSetFolder):
+            os.makedirs(simulationSetFolder)
+
+        return simulationSetName,simulationSetFolder
+
+    def __writeSimulation(self,sessionName,simulationSetName,simName,sim,simulationInfo):
+
+        #Create a folder sessionName/simulationSets/simulationSetName/simulationName/,
+        #write the simulation on it and update its output files paths.
+        #Returns the entry of the simulation in the VLMP session file
+
+        simulationSetFolder    = os.path.join(sessionName,"simulationSets",simulationSetName)
+        simulationFolder       = os.path.join(sessionName,"simulationSets",simulationSetName,simName)
+        simulationResultFolder = os.path.join(sessionName,"results",simName)
+
+        if not os.path.exists(simulationFolder):
+            os.makedirs(simulationFolder)
+
+        if not os.path.islink(simulationResultFolder):
+            os.symlink(os.path.relpath(simulationFolder,
+                                       "/".join(simulationResultFolder.split("/")[:-1])),
+                       simulationResultFolder)
+
+        #Write simulation file into results folder
+        sim.write(os.path.join(simulationFolder,"simulation.json"))
+
+        #Relative path to the simulation folder
+        relativePath = os.path.relpath(simulationFolder,simulationSetFolder)
+
+        #Updating file path
+        def getValuesAndPaths(d, key, path=None):
+            """
+            Recursively search a nested dictionary
+            for all values associated with a given key,
+            along with the path to each value.
+            """
+            if path is None:
+                path = ()
+
+            values = []
+            for k, v in d.items():
+                new_path = path + (k,)
+                if k == key:
+                    values.append((v, new_path))
+                elif isinstance(v, dict):
+                    values.extend(getValuesAndPaths(v, key, new_path))
+
+            return values
+
+        outputFilePaths = getValuesAndPaths(sim,"outputFilePath")
+        for fName,fSimPath in outputFilePaths:
+            sim.setValue(fSimPath,os.path.join(relativePath,fName))
+
+        return [simName,
+                os.path.join(*simulationFolder.split("/")[1:]),
+                os.path.join(*simulationResultFolder.split("/")[1:]),
+                simulationInfo]
+
+    def __writeSimulationSet(self,sessionName,simSetIndex,aggregatedSimulation,simSet):
+
+        #Write aggregated simulation to file.
+        #Returns the entry of the simulation set in the VLMP session file
+
+        simulationSetName   = f"simulationSet_{simSetIndex}"
+        simulationSetFolder = os.path.join(sessionName,"simulationSets",simulationSetName)
+
+        aggregatedSimulation.write(os.path.join(simulationSetFolder,f"simulationSet_{simSetIndex}.json"))
+
+        #Relative path to the simulation folder
+        relativePath = os.path.relpath(simulationSetFolder,sessionName)
+        return [simulationSetName,
+                f"{relativePath}",
+                f"simulationSet_{simSetIndex}.json",
+                simSet.copy()]
+
+    def __writeSession(self,sessionName,VLMPsession):
+        with open(os.path.join(sessionName,"VLMPsession.json"),"w") as simSetsFile:
+            #Write simulation sets file using jsbeautifier
+            simSetsFile.write(jsbeautifier.beautify(json.dumps(VLMPsession)))
+
+    ########################################
+
+    def setUpSimulation(self, sessionName):
+        self.logger.debug("[VLMP] Setting up simulation")
+
+        if len(self.simulationSets) == 0:
+            self.logger.error("[VLMP] Simulation pool not distributed")
+            raise Exception("Simulation pool not distributed")
+
+        ################################################
+
+        self.__createSessionFolders(sessionName)
+
+        ################################################
+
         VLMPsession = {"name":sessionName}
         VLMPsession["simulations"] = []
         VLMPsession["simulationSets"] = []
         for simSetIndex,simSet in enumerate(self.simulationSets):
-            #Create folder sessionName/simulationSets/simulationSet_i
-            simulationSetName   = f"simulationSet_{simSetIndex}"
-            simulationSetFolder = os.path.join(sessionName,"simulationSets",simulationSetName)
 
-            if not os.path.exists(simulationSetFolder):
-                os.makedirs(simulationSetFolder)
+            simulationSetName,_ = self.__createSimulationSetFolder(sessionName,simSetIndex)
 
             #For each simulation in the simulation set.
             #Create a folder sessionName/simulationSets/simulationSetName/simulationName/
             for simName in simSet:
-
-                simulationFolder       = os.path.join(sessionName,"simulationSets",simulationSetName,simName)
-                simulationResultFolder = os.path.join(sessionName,"results",simName)
-
-                if not os.path.exists(simulationFolder):
-                    os.makedirs(simulationFolder)
-
-                if not os.path.islink(simulationResultFolder):
-                    os.symlink(os.path.relpath(simulationFolder,
-                                               "/".join(simulationResultFolder.split("/")[:-1])),
-                               simulationResultFolder)
-
-                #Update output files for each simulation in simSet
-                sim = self.simulations[simName]
-
-                #Write simulation file into results folder
-                sim.write(os.path.join(simulationFolder,"simulation.json"))
-
-                #Relative path to the simulation folder
-                relativePath = os.path.relpath(simulationFolder,simulationSetFolder)
-
-                VLMPsession["simulations"].append([simName,
-                                                   os.path.join(*simulationFolder.split("/")[1:]),
-                                                   os.path.join(*simulationResultFolder.split("/")[1:]),
-                                                   self.simulationsInfo[simName]])
-
-                #Updating file path
-                def getValuesAndPaths(d, key, path=None):
-                    """
-                    Recursively search a nested dictionary
-                    for all values associated with a given key,
-                    along with the path to each value.
-                    """
-                    if path is None:
-                        path = ()
-
-                    values = []
-                    for k, v in d.items():
-                        new_path = path + (k,)
-                        if k == key:
-                            values.append((v, new_path))
-                        elif isinstance(v, dict):
-                            values.extend(getValuesAndPaths(v, key, new_path))
-
-                    return values
-
-                outputFilePaths = getValuesAndPaths(sim,"outputFilePath")
-                for fName,fSimPath in outputFilePaths:
-                    sim.setValue(fSimPath,os.path.join(relativePath,fName))
+                VLMPsession["simulations"].append(self.__writeSimulation(sessionName,simulationSetName,simName,
+                                                                         self.simulations[simName],
+                                                                         self.simulationsInfo[simName]))
 
             ################################################
             #Aggregate simulations in simulation sets
@@ -726,20 +1020,153 @@ class VLMP:
             #Aggregated simulation is ready
             ################################################
 
-            ################################################
-            #Write aggregated simulation to file
+            VLMPsession["simulationSets"].append(self.__writeSimulationSet(sessionName,simSetIndex,aggregatedSimulation,simSet))
 
-            aggregatedSimulation.write(os.path.join(simulationSetFolder,f"simulationSet_{simSetIndex}.json"))
+        self.__writeSession(sessionName,VLMPsession)
 
-            #Relative path to the simulation folder
-            relativePath = os.path.relpath(simulationSetFolder,sessionName)
-            VLMPsession["simulationSets"].append([simulationSetName,
-                                                  f"{relativePath}",
-                                                  f"simulationSet_{simSetIndex}.json",
-                                                  simSet.copy()])
+        self.logger.debug("[VLMP] Simulation set up finished")
 
-        with open(os.path.join(sessionName,"VLMPsession.json"),"w") as simSetsFile:
-            #Write simulation sets file using jsbeautifier
-            simSetsFile.write(jsbeautifier.beautify(json.dumps(VLMPsession)))
+    def streamSimulationPool(self,simulationPool,sessionName,*mode,workers:int = 1,cacheFolder:str = None):
 
-        self.logger.debug("[VLMP] Simulation set up finished")
+        #Streaming version of loadSimulationPool + distributeSimulationPool + setUpSimulation.
+        #simulationPool can be any iterable (for example a generator). Each simulation is built,
+        #written to its simulation set folder, added to the aggregated simulation of its set and then dropped.
+        #Only the simulation names (and the simulation info, for VLMPsession.json) are kept.
+        #Sets of the modes "one", "size" and "upperLimit" are written as soon as they are complete.
+        #Sets of the modes "none" and "property" are written when the whole pool has been processed.
+
+        self.logger.debug("[VLMP] Streaming simulation pool")
+
+        if workers < 1:
+            self.logger.error("[VLMP] Number of workers must be at least 1, but %s was given",workers)
+            raise Exception("Invalid number of workers")
+
+        modeName,modeParameter = self.__processDistributionMode(mode)
+        if modeName == "balanced":
+            self.logger.error("[VLMP] Distribute mode \"balanced\" requires the whole simulation pool, it can not be used while streaming")
+            raise Exception("Distribute mode not available while streaming")
+        if modeName == "one":
+            modeName,modeParameter = "size",1
+
+        cache = self.__getSimulationCache(cacheFolder)
+
+        self.__createSessionFolders(sessionName)
+
+        self.simulationsInfo = {}
+
+        simulationSets = OrderedDict() #Open simulation sets, property value (or set index) -> set
+        closedSets     = {}
+
+        #Set of the sequential modes ("size" and "upperLimit") currently being filled
+        currentSet     = None
+        currentSetSize = 0
+
+        def openSet(key):
+            simSetIndex = len(simulationSets)+len(closedSets)
+            simulationSetName,_ = self.__createSimulationSetFolder(sessionName,simSetIndex)
+            simulationSets[key] = {"index":simSetIndex,"name":simulationSetName,
+                                   "simulations":[],"sessionEntries":[],
+                                   "aggregator":simulationSetAggregator()}
+            return simulationSets[key]
+
+        def closeSet(key):
+            simSet = simulationSets.pop(key)
+            self.logger.debug(f"[VLMP] Writing simulation set {simSet['index']}")
+            simSet["sessionEntry"] = self.__writeSimulationSet(sessionName,simSet["index"],
+                                                               simSet.pop("aggregator").getAggregatedSimulation(),
+                                                               simSet["simulations"])
+            closedSets[simSet["index"]] = simSet
+
+        def processSimulation(simulationInfo,simName,sim):
+            nonlocal currentSet,currentSetSize
+
+            if simName in self.simulations.keys() or simName in self.simulationsInfo.keys():
+                self.logger.error(f"[VLMP] Simulation with name \"{simName}\" already exists")
+                raise Exception("Simulation already exists")
+            self.simulationsInfo[simName] = simulationInfo
+
+            if modeName == "none":
+                key = 0
+            elif modeName == "property":
+                key = self.__getSimulationProperty(sim,modeParameter)
+            else:
+                if modeName == "upperLimit":
+                    scoringPropertyName,upperLimit = modeParameter
+                    simSize = scoringProperties[scoringPropertyName](sim)
+                else:
+                    simSize,upperLimit = 1,modeParameter
+                if currentSet is not None and currentSetSize + simSize > upperLimit:
+                    closeSet(currentSet)
+                    currentSet = None
+                if currentSet is None:
+                    currentSet     = len(simulationSets)+len(closedSets)
+                    currentSetSize = 0
+                currentSetSize += simSize
+                key = currentSet
+
+            simSet = simulationSets[key] if key in simulationSets else openSet(key)
+
+            simSet["simulations"].append(simName)
+            simSet["sessionEntries"].append(self.__writeSimulation(sessionName,simSet["name"],simName,sim,simulationInfo))
+            simSet["aggregator"].add(sim)
+
+        #Simulations are built in batches, only the simulations of the current batch are kept in memory
+        batchSize = 4*workers
+        nSimulations = 0
+        nLoaded      = 0
+
+        with (self.__createWorkersPool(workers) if workers > 1 else contextlib.nullcontext()) as workersPool:
+            poolIterator = iter(simulationPool)
+            while True:
+                batch = list(itertools.islice(poolIterator,batchSize))
+                if len(batch) == 0:
+                    break
+
+                builtSimulations,nBatchLoaded = self.__buildSimulationPool(batch,cache,workersPool)
+                for simulationInfo,(simName,sim) in zip(batch,builtSimulations):
+                    processSimulation(simulationInfo,simName,sim)
+
+                nSimulations += len(batch)
+                nLoaded      += nBatchLoaded
+                del builtSimulations
+
+        if cache is not None:
+            self.logger.info(f"[VLMP] Simulations loaded from cache: {nLoaded}/{nSimulations}")
+
+        if nSimulations == 0:
+            self.logger.error("[VLMP] No simulations loaded")
+            raise Exception("No simulations loaded")
+
+        for key in list(simulationSets.keys()):
+            closeSet(key)
+
+        #The session file lists the simulations grouped by simulation set
+        VLMPsession = {"name":sessionName}
+        VLMPsession["simulations"]    = []
+        VLMPsession["simulationSets"] = []
+        for simSetIndex in sorted(closedSets.keys()):
+            VLMPsession["simulations"]   += closedSets[simSetIndex]["sessionEntries"]
+            VLMPsession["simulationSets"].append(closedSets[simSetIndex]["sessionEntry"])
+
+        self.__writeSession(sessionName,VLMPsession)
+
+        self.simulationSets = [closedSets[simSetIndex]["simulations"] for simSetIndex in sorted(closedSets.keys())]
+
+        self.logger.debug("[VLMP] Simulation pool streamed")
+
+########################################
+
+#Parallel build workers
+
+_workerVLMP = None
+
+def _initBuildWorker(additionalComponents,modelsCacheSize):
+    global _workerVLMP
+
+    #Each simulation is built with its own build seed (see VLMP.__getBuildSeed),
+    #the random generators of the workers are not used otherwise
+    _workerVLMP = VLMP(additionalComponents,modelsCacheSize)
+
+def _buildSimulationWorker(simulationInfoAndBuildSeed):
+    simulationInfo,buildSeed = simulationInfoAndBuildSeed
+    return _workerVLMP._buildSimulation(simulationInfo,buildSeed)
@@ -1,18 +1,28 @@
 import logging
 
+import numpy as np
+
 ########################################################
 
-from ..utils.input import getLabelIndex
+from ..utils.exclusions import bondedExclusions
+from ..utils.tables import toColumn, getTableLength, getTableColumn, setTableValues
 
 class idsHandler:
 
+    # Columnar index of the particles of the current simulation (list of models).
+    # Global ids are mapped to (model index, local index) through numpy arrays,
+    # state, structure and types properties are stored as columns built on demand.
+
     _models     = None
 
     _id2model   = None
     _id2localId = None
 
-    def __getModelLocalId(self, i):
-        return idsHandler._id2model[i], idsHandler._id2localId[i]
+    _stateColumns     = None
+    _propertyColumns  = None
+    _structureColumns = None
+
+    _bondedExclusions = None
 
     def __init__(self,
                  models):
@@ -25,88 +35,116 @@ class idsHandler:
 
             idsHandler._models = models
 
-            N = sum([mdl.getNumberOfParticles() for mdl in idsHandler._models])
+            nParticles = [mdl.getNumberOfParticles() for mdl in idsHandler._models]
 
-            idsHandler._id2model   = [None]*N
-            idsHandler._id2localId = [None]*N
+            idsHandler._id2model   = np.repeat(np.arange(len(nParticles),dtype=int),nParticles)
+            idsHandler._id2localId = np.concatenate([np.zeros(0,dtype=int)]+[np.arange(n,dtype=int) for n in nParticles])
 
-            offset = 0
-            for mdlIndex,mdl in enumerate(idsHandler._models):
-                for i in range(mdl.getNumberOfParticles()):
-                    idsHandler._id2model[i+offset]   = mdlIndex
-                    idsHandler._id2localId[i+offset] = i
+            idsHandler._stateColumns     = {}
+            idsHandler._propertyColumns  = {}
+            idsHandler._structureColumns = {}
 
-                offset += mdl.getNumberOfParticles()
+            idsHandler._bondedExclusions = {}
 
             logger.debug("Done initializing idsHandler")
         else:
             logger.debug("idsHandler already initialized")
 
-    ######################## GETTERS #######################
+    ######################## COLUMNS #######################
 
-    def _getIdsProperty(self,globalIds,propertyName):
-        idsProperty = []
+    def __getStateColumn(self,mdlIndex,stateName):
+        key = (mdlIndex,stateName)
+        if key not in idsHandler._stateColumns:
+            state = idsHandler._models[mdlIndex].getState()
+            #The column is copied, it is modified in place (see _setIdsState) and
+            #columns of columnar tables can be shared with other models (see columnarTable.copy)
+            idsHandler._stateColumns[key] = np.array(getTableColumn(state,stateName))
 
-        for i in globalIds:
-            mdlIndex, localId = self.__getModelLocalId(i)
+        return idsHandler._stateColumns[key]
 
+    def __getPropertyColumn(self,mdlIndex,propertyName):
+        key = (mdlIndex,propertyName)
+        if key not in idsHandler._propertyColumns:
             mdl = idsHandler._models[mdlIndex]
 
-            typeIndex = getLabelIndex("type",mdl.getStructure()["labels"])
-            itype     = mdl.getStructure()["data"][localId][typeIndex]
+            structure = mdl.getStructure()
+            typeNames,typeCodes = np.unique(getTableColumn(structure,"type"),return_inverse=True)
 
-            idsProperty.append(mdl.getTypes().getTypes()[itype][propertyName])
+            #Types are looked up once per model, not once per particle
+            types = mdl.getTypes().getTypes()
+            propertyTable = toColumn([types[t][propertyName] for t in typeNames.tolist()])
 
-        return idsProperty
+            idsHandler._propertyColumns[key] = propertyTable[typeCodes]
 
-    def _getIdsState(self,globalIds,stateName):
-        idsState = []
+        return idsHandler._propertyColumns[key]
 
-        for i in globalIds:
-            mdlIndex, localId = self.__getModelLocalId(i)
+    def __getStructureColumn(self,structureName):
+        #Structure values (modelId, chainId, ...) of each model are shifted, so that
+        #values of different models never collide
+        if structureName not in idsHandler._structureColumns:
+            columns = [np.zeros(0,dtype=int)]
 
-            mdl = idsHandler._models[mdlIndex]
+            structOffset = 0
+            for mdl in idsHandler._models:
+                if mdl.getNumberOfParticles() == 0:
+                    continue
 
-            stateIndex = getLabelIndex(stateName,mdl.getState()["labels"])
-            stateValue = mdl.getState()["data"][localId][stateIndex]
+                structure = mdl.getStructure()
+                if structureName in structure["labels"]:
+                    column = np.asarray(getTableColumn(structure,structureName),dtype=int)
+                else:
+                    column = np.zeros(getTableLength(structure),dtype=int)
 
-            idsState.append(stateValue)
+                columns.append(column+structOffset)
+                structOffset += int(column.max())+1
 
-        return idsState
+            idsHandler._structureColumns[structureName] = np.concatenate(columns)
 
-    def _getIdsStructure(self,globalIds,structureName):
+        return idsHandler._structureColumns[structureName]
 
-        totalParticles = sum([mdl.getNumberOfParticles() for mdl in idsHandler._models])
+    def __gather(self,globalIds,getColumn):
+        ids = np.asarray(globalIds,dtype=int)
 
-        id2struct = [None]*totalParticles
-        structOffset = 0
-        for mdl in idsHandler._models:
-            structLabels = mdl.getStructure()["labels"]
-            for i in mdl.getGlobalIds():
-                mdlIndex, localId = self.__getModelLocalId(i)
-                mdl = idsHandler._models[mdlIndex]
+        mdlIndices = idsHandler._id2model[ids]
+        localIds   = idsHandler._id2localId[ids]
 
-                maxStruct = structOffset
-                if structureName in structLabels:
-                    structIndex  = getLabelIndex(structureName,structLabels)
-                    structValue  = mdl.getStructure()["data"][localId][structIndex]
+        blocks = []
+        for mdlIndex in np.unique(mdlIndices).tolist():
+            mask = (mdlIndices == mdlIndex)
+            blocks.append((mask,getColumn(mdlIndex)[localIds[mask]]))
 
-                    id2struct[i] = structValue+structOffset
-                else:
-                    id2struct[i] = structOffset
+        if len(blocks) == 1:
+            return blocks[0][1].tolist()
 
-                maxStruct = max(maxStruct,id2struct[i])
+        values = [None]*len(ids)
+        for mask,block in blocks:
+            for i,v in zip(np.flatnonzero(mask).tolist(),block.tolist()):
+                values[i] = v
+        return values
 
-            structOffset += maxStruct+1
+    ######################## GETTERS #######################
 
-        ########################################################
+    def _getIdsProperty(self,globalIds,propertyName):
+        if len(globalIds) == 0:
+            return []
+        return self.__gather(globalIds,lambda mdlIndex: self.__getPropertyColumn(mdlIndex,propertyName))
 
-        idsStructure = []
+    def _getIdsState(self,globalIds,stateName):
+        if len(globalIds) == 0:
+            return []
+        return self.__gather(globalIds,lambda mdlIndex: self.__getStateColumn(mdlIndex,stateName))
 
-        for i in globalIds:
-            idsStructure.append(id2struct[i])
+    def _getIdsStructure(self,globalIds,structureName):
+        if len(globalIds) == 0:
+            return []
+        return self.__getStructureColumn(structureName)[np.asarray(globalIds,dtype=int)].tolist()
 
-        return idsStructure
+    def _getBondedExclusions(self,excludedBonds):
+        #Exclusions only depend on the bonded topology of the models,
+        #they are built once and shared by all the components
+        if excludedBonds not in idsHandler._bondedExclusions:
+            idsHandler._bondedExclusions[excludedBonds] = bondedExclusions(idsHandler._models,excludedBonds)
+        return idsHandler._bondedExclusions[excludedBonds]
 
     ######################## SETTERS #######################
 
@@ -118,21 +156,39 @@ class idsHandler:
             logger.error(f"[ModelOperation] Number of ids and states ({stateName}) do not match")
             raise Exception(f"Number of ids and states do not match")
 
-        for i,s in zip(globalIds,states):
-            mdlIndex, localId = self.__getModelLocalId(i)
-            mdl = idsHandler._models[mdlIndex]
+        if len(globalIds) == 0:
+            return
+
+        ids    = np.asarray(globalIds,dtype=int)
+        states = toColumn(states)
+
+        mdlIndices = idsHandler._id2model[ids]
+        localIds   = idsHandler._id2localId[ids]
 
-            stateIndex = getLabelIndex(stateName,mdl.getState()["labels"])
+        for mdlIndex in np.unique(mdlIndices).tolist():
+            mask = (mdlIndices == mdlIndex)
 
-            #Check if state is valid
-            if type(s) != type(mdl.getState()["data"][localId][stateIndex]):
-                logger.error(f"[ModelOperation] State value {s} for state \"{stateName}\" is not valid."
-                             f" State value type is {type(s)} but should be {type(mdl.getState()['data'][localId][stateIndex])}")
+            column = self.__getStateColumn(mdlIndex,stateName)
+            values = states[mask]
+
+            #Check if states are valid
+            if values.shape[1:] != column.shape[1:]:
+                logger.error(f"[ModelOperation] State values for state \"{stateName}\" are not valid, length does not match."
+                             f" State shape is {column.shape[1:]} but {values.shape[1:]} was given")
+                raise Exception(f"State is not valid")
+
+            isNumeric = lambda arr: arr.dtype.kind in "biuf"
+            if isNumeric(column) != isNumeric(values):
+                logger.error(f"[ModelOperation] State values for state \"{stateName}\" are not valid."
+                             f" State values type is {values.dtype} but should be {column.dtype}")
                 raise Exception(f"State is not valid")
-            else:
-                if type(s) == list:
-                    if len(s) != len(mdl.getState()["data"][localId][stateIndex]):
-                        logger.error(f"[ModelOperation] State value {s} for state \"{stateName}\" is not valid, length does not match")
-                        raise Exception(f"State is not valid")
 
-                mdl.getState()["data"][localId][stateIndex] = s
+            if isNumeric(column) and column.dtype != np.result_type(column,values):
+                column = column.astype(np.result_type(column,values))
+                idsHandler._stateColumns[(mdlIndex,stateName)] = column
+
+            column[localIds[mask]] = values
+
+            #Write the new values back to the model state
+            state = idsHandler._models[mdlIndex].getState()
+            setTableValues(state,stateName,localIds[mask],values)
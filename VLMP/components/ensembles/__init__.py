@@ -7,6 +7,8 @@ import logging
 
 from pyUAMMD import simulation
 
+from ...utils.merge import wrapSimulation
+
 from ...utils.input import getLabelIndex
 
 class ensembleBase:
@@ -122,7 +124,7 @@ class ensembleBase:
 
     ########################################################
 
-    def getSimulation(self,DEBUG_MODE = False):
+    def getSimulation(self,DEBUG_MODE = False,handOver = False):
         labels = []
         data   = []
 
@@ -130,6 +132,15 @@ class ensembleBase:
             labels.append(l)
             data.append(self.getEnsembleComponent(l))
 
+        if handOver:
+            return wrapSimulation({"global":{"ensemble":{
+                                            "type":["Ensemble",self.getEnsembleName()],
+                                            "labels":labels,
+                                            "data":[data]
+                                                    }
+                                        }
+                                   },DEBUG_MODE)
+
         return simulation({"global":{"ensemble":{
                                         "type":["Ensemble",self.getEnsembleName()],
                                         "labels":copy.deepcopy(labels),
@@ -7,6 +7,8 @@ import logging
 
 from pyUAMMD import simulation
 
+from ...utils.merge import wrapSimulation
+
 class integratorBase:
 
     def __init__(self,
@@ -95,10 +97,13 @@ class integratorBase:
 
     ########################################################
 
-    def getSimulation(self,DEBUG_MODE = False):
+    def getSimulation(self,DEBUG_MODE = False,handOver = False):
         sim = {}
 
-        sim["integrator"] = {self._name:copy.deepcopy(self.getIntegrator())}
+        if handOver:
+            sim["integrator"] = {self._name:self.getIntegrator()}
+        else:
+            sim["integrator"] = {self._name:copy.deepcopy(self.getIntegrator())}
 
         sim["integrator"]["schedule"] = {
             "type":["Schedule","Integrator"],
@@ -106,6 +111,8 @@ class integratorBase:
             "data":[[1,self._name,self.getIntegrationSteps()]]
         }
 
+        if handOver:
+            return wrapSimulation(sim,DEBUG_MODE)
         return simulation(copy.deepcopy(sim),DEBUG_MODE)
 
 ############### IMPORT ALL INTEGRATORS ###############
@@ -15,6 +15,7 @@ class LennardJones(modelExtensionBase):
             "interactionMatrix": {"description": "Matrix of interaction parameters between different types of particles", "type": "list of lists", "default": null},
             "cutOffFactor": {"description": "Factor to multiply sigma to obtain the cut-off distance", "type": "float", "default": null},
             "addVerletList": {"description": "Whether to add a Verlet list for the interactions", "type": "bool", "default": true},
+            "excludedBonds": {"description": "Number of bonds to exclude from the interactions (see steric), requires addVerletList", "type": "int", "default": 0},
             "condition": {"description": "Condition for the interaction (e.g., 'inter', 'intra')", "type": "str", "default": "inter"}
         },
         "example": "
@@ -29,7 +30,7 @@ class LennardJones(modelExtensionBase):
     }
     """
 
-    availableParameters = {"interactionMatrix","cutOffFactor","addVerletList","condition"}
+    availableParameters = {"interactionMatrix","cutOffFactor","addVerletList","excludedBonds","condition"}
     requiredParameters  = {"interactionMatrix","cutOffFactor"}
     availableSelections = set()
     requiredSelections  = set()
@@ -50,10 +51,15 @@ class LennardJones(modelExtensionBase):
         cutOffFactor       = params.get("cutOffFactor")
         interactionMatrix  = params.get("interactionMatrix")
 
+        excludedBonds      = params.get("excludedBonds",0)
         addVerletList      = params.get("addVerletList",True)
 
         condition          = params.get("condition","inter")
 
+        if excludedBonds > 0 and addVerletList == False:
+            self.logger.error("[LennardJones] excludedBonds > 0 and addVerletList == False. This is not allowed. Exiting...")
+            raise Exception("Not compatible parameters.")
+
         extension = {}
 
         if addVerletList:
@@ -63,6 +69,9 @@ class LennardJones(modelExtensionBase):
             extension["nl"]["labels"]      = ["id","id_list"]
             extension["nl"]["data"]        = []
 
+            if excludedBonds > 0:
+                extension["nl"]["data"] = self.getBondedExclusions(excludedBonds).getData()
+
         extension[name] = {}
         extension[name]["type"] = ["NonBonded","GeneralLennardJonesType2"]
         extension[name]["parameters"] = {"cutOffFactor":cutOffFactor,"condition":condition}
@@ -31,6 +31,12 @@ class WCA(modelExtensionBase):
                 "description": "If True, a Verlet list will be created for the interactions.",
                 "type": "bool",
                 "default": true
+            },
+            "excludedBonds": {
+                "description": "Number of bonds to exclude from the WCA interactions (see steric).
+                                This option is only available if addVerletList is True.",
+                "type": "int",
+                "default": 0
             }
         },
         "selections": {
@@ -54,7 +60,7 @@ class WCA(modelExtensionBase):
     }
     """
 
-    availableParameters = {"cutOffFactor","epsilon","cutOffFactor","addVerletList","condition"}
+    availableParameters = {"cutOffFactor","epsilon","cutOffFactor","addVerletList","excludedBonds","condition"}
     requiredParameters  = set()
     availableSelections = set()
     requiredSelections  = set()
@@ -75,9 +81,14 @@ class WCA(modelExtensionBase):
         cutOffFactor  = params.get("cutOffFactor",2.5)
         epsilon       = params.get("epsilon",1.0)
 
+        excludedBonds = params.get("excludedBonds",0)
         addVerletList = params.get("addVerletList",True)
         condition     = params.get("condition","inter")
 
+        if excludedBonds > 0 and addVerletList == False:
+            self.logger.error("[WCA] excludedBonds > 0 and addVerletList == False. This is not allowed. Exiting...")
+            raise Exception("Not compatible parameters.")
+
         extension = {}
 
         if addVerletList:
@@ -87,6 +98,9 @@ class WCA(modelExtensionBase):
             extension["nl"]["labels"]      = ["id","id_list"]
             extension["nl"]["data"]        = []
 
+            if excludedBonds > 0:
+                extension["nl"]["data"] = self.getBondedExclusions(excludedBonds).getData()
+
         extension[name] = {}
         extension[name]["type"] = ["NonBonded","WCAType2"]
         extension[name]["parameters"] = {"cutOffFactor":cutOffFactor,"condition":condition}
@@ -7,6 +7,8 @@ import logging
 
 from pyUAMMD import simulation
 
+from ...utils.merge import wrapSimulation
+
 from .. import idsHandler
 
 from ...utils.selections import processSelections
@@ -179,9 +181,12 @@ class modelExtensionBase(idsHandler):
     def getIdsStructure(self,ids,structName):
         return self._getIdsStructure(ids,structName)
 
+    def getBondedExclusions(self,excludedBonds):
+        return self._getBondedExclusions(excludedBonds)
+
     ########################################################
 
-    def getSimulation(self,DEBUG_MODE = False):
+    def getSimulation(self,DEBUG_MODE = False,handOver = False):
 
         sim = {}
 
@@ -193,6 +198,8 @@ class modelExtensionBase(idsHandler):
                 sim["topology"]["forceField"][ext]["parameters"]["group"] = self.getName()
             sim["topology"]["forceField"]["group_"+self.getName()] = self._group
 
+        if handOver:
+            return wrapSimulation(sim,DEBUG_MODE)
         return simulation(copy.deepcopy(sim),DEBUG_MODE)
 
 ############### IMPORT ALL MODEL EXTENSIONS ###############
@@ -5,7 +5,6 @@ import logging
 import numpy as np
 
 from . import modelExtensionBase
-from ...utils.input import getLabelIndex
 
 class steric(modelExtensionBase):
     """
@@ -110,101 +109,11 @@ class steric(modelExtensionBase):
             extension["nl"]["type"]       =  ["VerletConditionalListSet", "nonExclIntra_nonExclInter"]
             extension["nl"]["parameters"] =  {}
 
-            exclusions = {}
-
-            if excludedBonds > 0:
-                #Add bond2
-                for mdl in self.getModels():
-                    for bondName,info in mdl.getForceField().items():
-                        type_ = info["type"][0]
-                        if type_ == "Bond2":
-                            index_i = getLabelIndex("id_i",info["labels"])
-                            index_j = getLabelIndex("id_j",info["labels"])
-
-                            for d in info["data"]:
-                                i = d[index_i]+mdl.getIdOffset()
-                                j = d[index_j]+mdl.getIdOffset()
-
-                                if i not in exclusions:
-                                    exclusions[i] = set()
-                                if j not in exclusions:
-                                    exclusions[j] = set()
-
-                                exclusions[i].add(j)
-                                exclusions[j].add(i)
-
-            if excludedBonds > 1:
-                #Add bond3
-                for mdl in self.getModels():
-                    for bondName,info in mdl.getForceField().items():
-                        type_ = info["type"][0]
-                        if type_ == "Bond3":
-                            index_i = getLabelIndex("id_i",info["labels"])
-                            index_j = getLabelIndex("id_j",info["labels"])
-                            index_k = getLabelIndex("id_k",info["labels"])
-
-                            for d in info["data"]:
-                                i = d[index_i]+mdl.getIdOffset()
-                                j = d[index_j]+mdl.getIdOffset()
-                                k = d[index_k]+mdl.getIdOffset()
-
-                                if i not in exclusions:
-                                    exclusions[i] = set()
-                                if j not in exclusions:
-                                    exclusions[j] = set()
-                                if k not in exclusions:
-                                    exclusions[k] = set()
-
-                                exclusions[i].add(j)
-                                exclusions[i].add(k)
-                                exclusions[j].add(i)
-                                exclusions[j].add(k)
-                                exclusions[k].add(i)
-                                exclusions[k].add(j)
-
-            if excludedBonds > 2:
-                #Add bond4
-                for mdl in self.getModels():
-                    for bondName,info in mdl.getForceField().items():
-                        type_ = info["type"][0]
-                        if type_ == "Bond4":
-                            index_i = getLabelIndex("id_i",info["labels"])
-                            index_j = getLabelIndex("id_j",info["labels"])
-                            index_k = getLabelIndex("id_k",info["labels"])
-                            index_l = getLabelIndex("id_l",info["labels"])
-
-                            for d in info["data"]:
-                                i = d[index_i]+mdl.getIdOffset()
-                                j = d[index_j]+mdl.getIdOffset()
-                                k = d[index_k]+mdl.getIdOffset()
-                                l = d[index_l]+mdl.getIdOffset()
-
-                                if i not in exclusions:
-                                    exclusions[i] = set()
-                                if j not in exclusions:
-                                    exclusions[j] = set()
-                                if k not in exclusions:
-                                    exclusions[k] = set()
-                                if l not in exclusions:
-                                    exclusions[l] = set()
-
-                                exclusions[i].add(j)
-                                exclusions[i].add(k)
-                                exclusions[i].add(l)
-                                exclusions[j].add(i)
-                                exclusions[j].add(k)
-                                exclusions[j].add(l)
-                                exclusions[k].add(i)
-                                exclusions[k].add(j)
-                                exclusions[k].add(l)
-                                exclusions[l].add(i)
-                                exclusions[l].add(j)
-                                exclusions[l].add(k)
-
             extension["nl"]["labels"]      = ["id","id_list"]
             extension["nl"]["data"]        = []
-            for i in exclusions:
-                extension["nl"]["data"].append([i,list(exclusions[i])])
+
+            if excludedBonds > 0:
+                extension["nl"]["data"] = self.getBondedExclusions(excludedBonds).getData()
 
         extension[name] = {}
         extension[name]["type"] = ["NonBonded","WCAType2"]
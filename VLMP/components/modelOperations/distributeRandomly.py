@@ -9,7 +9,7 @@ from . import modelOperationBase
 
 from ...utils.selections import splitStateAccordingStructure
 from ...utils.input import getSubParameters
-from ...utils.geometry import distributeRandomlyGeneratorChecker
+from ...utils.geometry import distributeRandomlySets
 
 from scipy.spatial.transform import Rotation
 
@@ -31,6 +31,11 @@ class distributeRandomly(modelOperationBase):
                 "type": "int",
                 "default": 0
             },
+            "batchSize": {
+                "description": "Number of random placements checked at once when avoiding clashes.",
+                "type": "int",
+                "default": 1
+            },
             "randomRotation": {
                 "description": "Whether to apply random rotations to the particles.",
                 "type": "bool",
@@ -55,7 +60,7 @@ class distributeRandomly(modelOperationBase):
     }
     """
 
-    availableParameters = {"mode","avoidClashes","randomRotation"}
+    availableParameters = {"mode","avoidClashes","batchSize","randomRotation"}
     requiredParameters  = set()
     availableSelections = {"selection"}
     requiredSelections  = {"selection"}
@@ -65,33 +70,12 @@ class distributeRandomly(modelOperationBase):
                                high = [ self.boxX, self.boxY, self.boxZ])
         return mp
 
-    def __boxCheckDistance(self,p1,p2,r1,r2):
-        # Check if the distance between two points is larger than the sum of the radius
-        # of the particles, taking into account the periodicity of the box
-
-        # Calculate the distance between the two points
-        dr = p1-p2
-        # Apply mic periodicity
-        dr[0] = dr[0] - math.floor(dr[0]/self.box[0]+0.5)*self.box[0]
-        dr[1] = dr[1] - math.floor(dr[1]/self.box[1]+0.5)*self.box[1]
-        dr[2] = dr[2] - math.floor(dr[2]/self.box[2]+0.5)*self.box[2]
-
-        d = np.linalg.norm(dr)
-
-        # Check if the distance is larger than the sum of the radius
-        if d > 1.05*(r1+r2):
-            return True
-
-        return False
-
     def __randomSpherePoint(self):
         # Generate a random point in a sphere
         # of center self.center and radius self.radius
 
-        maxRad = np.max([np.max(r) for r in self.modelsRads])
-
         # Generate random radius
-        rho = (self.radius-maxRad)*(random.random() ** (1/3))
+        rho = (self.radius-self.maxRad)*(random.random() ** (1/3))
 
         # Generate random angles
         theta = math.acos(2 * random.random() - 1)  # Polar angle
@@ -106,19 +90,6 @@ class distributeRandomly(modelOperationBase):
 
         return mp
 
-    def __sphereCheckDistance(self,p1,p2,r1,r2):
-        # Check if the distance between two points is larger than the sum of the radius
-        # of the particles
-
-        # Calculate the distance between the two points
-        d = np.linalg.norm(p1-p2)
-
-        # Check if the distance is larger than the sum of the radius
-        if d > 1.05*(r1+r2):
-            return True
-
-        return False
-
     def __init__(self,name,**params):
         super().__init__(_type = self.__class__.__name__,
                          _name = name,
@@ -141,7 +112,7 @@ class distributeRandomly(modelOperationBase):
             self.boxX,self.boxY,self.boxZ = [b/2.0 for b in self.box]
 
             self.getRandomPoint = self.__randomBoxPoint
-            self.checkDistance  = self.__boxCheckDistance
+            self.periodic       = True
 
         elif self.mode == "sphere":
 
@@ -180,13 +151,14 @@ class distributeRandomly(modelOperationBase):
                 raise Exception("Sphere outside box")
 
             self.getRandomPoint = self.__randomSpherePoint
-            self.checkDistance  = self.__sphereCheckDistance
+            self.periodic       = False
 
         else:
             self.logger.error(f"Mode {self.mode} not recognized, available modes are 'box' and 'sphere'")
             raise Exception(f"Mode not recognized")
 
         avoidClashes = params.get("avoidClashes",0)
+        batchSize    = params.get("batchSize",1)
 
         ############################################################
 
@@ -202,6 +174,8 @@ class distributeRandomly(modelOperationBase):
         self.modelsRads = splitStateAccordingStructure(state=rads,
                                                        structure=mods)
 
+        self.maxRad = np.max([np.max(r) for r in self.modelsRads])
+
         if self.randomRotation:
             for i in range(len(self.modelsPos)):
 
@@ -232,11 +206,13 @@ class distributeRandomly(modelOperationBase):
 
             newPositions = [p for mp in newPositions for p in mp]
         else:
-            newPositions = distributeRandomlyGeneratorChecker(self.box,
-                                                              self.modelsPos,self.modelsRads,
-                                                              self.getRandomPoint,self.checkDistance,
-                                                              avoidClashes,
-                                                              1.05)
+            newPositions = distributeRandomlySets(self.box,
+                                                  self.modelsPos,self.modelsRads,
+                                                  self.getRandomPoint,
+                                                  avoidClashes,
+                                                  1.05,
+                                                  periodic=self.periodic,
+                                                  batchSize=batchSize)
 
         self.setIdsState(selectedIds,"position",newPositions)
 
@@ -90,64 +90,77 @@ class setContactDistance(modelOperationBase):
         # Compute the vector between the centers
         centersVec = mobCenter-refCenter
         if inv:
-            for i in range(mobilePos.shape[0]):
-                mobilePos[i] = mobCenter-2.0*centersVec
+            mobilePos[:] = mobCenter-2.0*centersVec
             centersVec = -centersVec
         centersVec = centersVec/np.linalg.norm(centersVec)
 
-        stepSize = res
-        prevDist = None
-        while True:
+        # The reference does not move, its tree is built once
+        referenceTree = cKDTree(referencePos)
 
-            minDst,minDstIndex = cKDTree(referencePos).query(mobilePos, 1)
-
-            ############################################################
-
-            mobileClosestIndex = np.argmin(minDst)
-            mobileClosestDst   = minDst[mobileClosestIndex]
-
-            mobileClosestPos = mobilePos[mobileClosestIndex]
-            mobileClosestRad = mobileRads[mobileClosestIndex]
-
-            ############################################################
+        def contactDistance(t):
+            # Contact distance when the mobile selection is translated t along centersVec.
+            # It is the distance between the closest pair of particles minus their radii
+            minDst,minDstIndex = referenceTree.query(mobilePos + t*centersVec, 1)
 
+            mobileClosestIndex    = np.argmin(minDst)
             referenceClosestIndex = minDstIndex[mobileClosestIndex]
-            referenceClosestDst   = minDst[mobileClosestIndex]
-
-            referenceClosestPos = referencePos[referenceClosestIndex]
-            referenceClosestRad = referenceRads[referenceClosestIndex]
-
-            ############################################################
-
-            currentDst = mobileClosestDst - (mobileClosestRad + referenceClosestRad)
-
-            if np.abs(currentDst-dst) < res:
-                break
-
-            if prevDist is not None:
-                if np.abs(currentDst-dst) > np.abs(prevDist-dst):
-                    stepSize = stepSize/2
-
-            if (currentDst < dst):
-                for i in range(mobilePos.shape[0]):
-                    mobilePos[i] = mobilePos[i] + centersVec * stepSize
-                prevDist = currentDst
-
-            if (currentDst > dst):
-                for i in range(mobilePos.shape[0]):
-                    mobilePos[i] = mobilePos[i] - centersVec * stepSize
-                prevDist = currentDst
-
-        newPos = []
-        for i in range(len(mobileIds)):
-            newPos.append(list(mobilePos[i]))
-
-        self.setIdsState(mobileIds,"position",newPos)
-
-
-
-
-
-
-
 
+            return minDst[mobileClosestIndex] - (mobileRads[mobileClosestIndex] + referenceRads[referenceClosestIndex])
+
+        # Find an interval [tLow,tHigh] such that contactDistance(tLow) < dst < contactDistance(tHigh),
+        # then solve by bisection. The cost is logarithmic in the initial gap over the resolution.
+
+        t = 0.0
+        currentDst = contactDistance(t)
+
+        maxIterations = 1000
+        iterations    = 0
+
+        tLow,tHigh = None,None
+        if np.abs(currentDst-dst) < res:
+            pass
+        elif currentDst < dst:
+            # Move away from the reference, doubling the step
+            tLow = t
+            step = res
+            while tHigh is None:
+                t += step
+                currentDst = contactDistance(t)
+                if currentDst < dst:
+                    tLow = t
+                else:
+                    tHigh = t
+                step *= 2.0
+        else:
+            # Move towards the reference. The closest distance can not decrease more than the translation,
+            # so moving (currentDst-dst) never crosses the target (conservative advancement)
+            tHigh = t
+            while tLow is None and np.abs(currentDst-dst) >= res:
+                t -= max(currentDst-dst,0.5*res)
+                currentDst = contactDistance(t)
+                if currentDst > dst:
+                    tHigh = t
+                else:
+                    tLow = t
+
+                iterations += 1
+                if iterations > maxIterations:
+                    self.logger.error(f"[setContactDistance] Contact distance {dst} could not be reached")
+                    raise Exception("Contact distance not reached")
+
+        while np.abs(currentDst-dst) >= res:
+            t = 0.5*(tLow+tHigh)
+            currentDst = contactDistance(t)
+            if currentDst < dst:
+                tLow = t
+            else:
+                tHigh = t
+
+            iterations += 1
+            if iterations > maxIterations:
+                self.logger.error(f"[setContactDistance] Contact distance {dst} could not be reached")
+                raise Exception("Contact distance not reached")
+
+        mobilePos = mobilePos + t*centersVec
+
+        self.setIdsState(mobileIds,"position",mobilePos.tolist())
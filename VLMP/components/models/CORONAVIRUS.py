@@ -2,14 +2,11 @@ import sys, os
 import json
 
 import copy
-import itertools
 
 import logging
 
 import random
 
-from scipy.spatial import cKDTree
-
 import numpy as np
 import orthopoly
 
@@ -19,6 +16,8 @@ from ...utils.input import getLabelIndex
 
 from ...utils.geometry import quaternionFromVectors
 from ...utils.geometry import getEz
+from ...utils.geometry import randomSequentialAddition
+from ...utils.geometry import getPairsWithinCutOff
 
 from scipy.spatial.transform import Rotation as R
 
@@ -66,6 +65,9 @@ class CORONAVIRUS(modelBase):
         "nSpikes":{"description":"Number of spike proteins to add to the vesicle surface.",
                    "type":"int",
                    "default":0},
+        "spikesMaxTries":{"description":"Maximum number of tries to add each spike. By default there is no limit, an error is raised only when the surface is saturated (no lipid can hold a new spike).",
+                          "type":"int",
+                          "default":null},
         "epsilonLipids_kT":{"description":"Energy parameter for lipid-lipid interactions in kT units.",
                             "type":"float",
                             "default":5.0},
@@ -155,6 +157,7 @@ class CORONAVIRUS(modelBase):
                            "vesicleRadius",
                            "center",
                            "nSpikes",
+                           "spikesMaxTries",
                            "epsilonLipids_kT",
                            "muLipids","chiLipids",
                            "thetaLipids",
@@ -207,6 +210,8 @@ class CORONAVIRUS(modelBase):
 
         self.nSpikes     = params.get("nSpikes",0)
 
+        self.spikesMaxTries = params.get("spikesMaxTries",None)
+
         self.epsilonLipids = params.get("epsilonLipids_kT",5.0)
         self.muLipids      = params.get("muLipids",3.0)
         self.chiLipids     = params.get("chiLipids",7.0)
@@ -297,12 +302,26 @@ class CORONAVIRUS(modelBase):
 
         return r
 
+    def __spikesReport(self,reason):
+        self.logger.error(f"[CORONAVIRUS] Spike {self.addedSpikes+1} could not be added ({reason}). "
+                          f"Added spikes: {self.addedSpikes}/{self.nSpikes}, tries: {self.spikesTries}, "
+                          f"lipids available for new spikes: {self.nLipids-len(self.unavailableLipids)}/{self.nLipids}. "
+                          f"Reduce nSpikes or increase nLipids/vesicleRadius")
+        raise Exception("Spikes could not be added")
+
+    def __getSpikeCandidate(self,lipidId):
+        # Spike template rotated to the orientation of the lipid and placed at its position
+        v1 = self.spikeTemplatePositions[-2]-self.spikeTemplatePositions[-1]
+        v2 = getEz(self.lipidsOrientations[lipidId])
+
+        q0,q1,q2,q3=quaternionFromVectors(v1,v2)
+        rot = R.from_quat(np.asarray([q1,q2,q3,q0]))
+
+        return rot.apply(self.spikeTemplatePositions)+self.lipidsPositions[lipidId]
+
     def __addSpike(self):
         #Last spike bead is removed, it is considred to be a lipid
 
-        added = False
-
-        spikeCoordTemplate     = self.spikeModel["coordinates"]
         spikeStructureTemplate = self.spikeModel["structure"]
 
         spikeBondsTemplate       = self.spikeModel["bonds"]
@@ -311,48 +330,45 @@ class CORONAVIRUS(modelBase):
 
         offSet = self.lipidsPositions.shape[0]+self.spikePositions.shape[0]
 
-        #Add positions
-        while(not added):
+        spikeRadii = [self.proteinMaxRadius]*self.spikeTemplatePositions.shape[0]
+
+        #Spikes are only added, so a lipid whose spike clashes (or that already holds a spike)
+        #can not hold a new spike. These lipids are not checked again and, when all of them
+        #are unavailable, the surface is saturated.
+        tries = 0
+        while True:
+            if len(self.unavailableLipids) == self.nLipids:
+                self.__spikesReport("the surface is saturated")
+            if self.spikesMaxTries is not None and tries >= self.spikesMaxTries:
+                self.__spikesReport(f"maximum number of tries ({self.spikesMaxTries}) reached")
+
             self.logger.debug(f"[CORONAVIRUS] Trying to add the spike {self.addedSpikes+1}")
 
             # Select random lipid
             lipidId = random.randint(0,self.nLipids-1)
 
-            # Load spike positions
-            posIndex = getLabelIndex("positions",spikeCoordTemplate["labels"])
-            currentSpikePositions = np.asarray([x[posIndex] for x in spikeCoordTemplate["data"]])
-
-            # Aling spike
-            currentSpikePositions = currentSpikePositions-currentSpikePositions[-1]
-
-            v1 = currentSpikePositions[-2]-currentSpikePositions[-1]
-            v2 = getEz(self.lipidsOrientations[lipidId])
-
-            q0,q1,q2,q3=quaternionFromVectors(v1,v2)
-            rot = R.from_quat(np.asarray([q1,q2,q3,q0]))
-
-            currentSpikePositions = rot.apply(currentSpikePositions)
-            currentSpikePositions = currentSpikePositions+self.lipidsPositions[lipidId]
+            tries            += 1
+            self.spikesTries += 1
 
-            # Check if spike clash
+            if lipidId in self.unavailableLipids:
+                continue
+            self.unavailableLipids.add(lipidId)
 
-            if self.spikePositions.any():
-                minDst,minDstIndex = cKDTree(self.spikePositions).query(currentSpikePositions, 1)
-                minDst = np.amin(minDst)
-            else:
-                minDst = np.inf
+            currentSpikePositions = self.__getSpikeCandidate(lipidId)
 
-            if minDst > 1.5*(2.0*self.proteinMaxRadius):
+            # Check if spike clash, the distance to the added spikes has to be larger than 1.5*(2.0*self.proteinMaxRadius)
+            if self.spikesAdder.getValidCandidates([currentSpikePositions],spikeRadii)[0]:
                 #Remove last
                 currentSpikePositions = currentSpikePositions[:-1]
 
                 self.spikePositions   = np.append(self.spikePositions,currentSpikePositions,axis=0)
+                self.spikesAdder.add(currentSpikePositions,spikeRadii[:-1])
 
                 orientation = quaternionFromVectors(np.asarray([0.0,0.0,1.0]),currentSpikePositions[-1])
                 orientation = orientation*np.ones((currentSpikePositions.shape[0],1))
 
                 self.spikeOrientations = np.append(self.spikeOrientations,orientation,axis=0)
-                added = True
+                break
 
         ##Add ids
         idIndex   = getLabelIndex("id"  ,spikeStructureTemplate["labels"])
@@ -468,6 +484,10 @@ class CORONAVIRUS(modelBase):
             self.logger.debug(f"[CORONAVIRUS] Adding spike {n+1}/{self.nSpikes}")
             self.__addSpike()
 
+        if self.nSpikes > 0:
+            self.logger.info(f"[CORONAVIRUS] Added {self.addedSpikes} spikes in {self.spikesTries} tries, "
+                             f"lipids available for new spikes: {self.nLipids-len(self.unavailableLipids)}/{self.nLipids}")
+
         self.logger.debug(f"[CORONAVIRUS] SpikeIds shape:{self.spikeIds.shape}")
         self.logger.debug(f"[CORONAVIRUS] SpikeTypes shape:{self.spikeTypes.shape}")
         self.logger.debug(f"[CORONAVIRUS] SpikePositions shape:{self.spikePositions.shape}")
@@ -561,31 +581,42 @@ class CORONAVIRUS(modelBase):
 
         ##############################################################
 
-        for c1,c2 in itertools.combinations(coord,r=2):
-            if(c1[id_index]==c2[id_index]):
+        # Template beads closer than the cut-off are bonded (ENM). Pairs are given by a radius query,
+        # sorted as they appear in the template
+        ids       = [int(c[id_index][1::]) for c in coord]
+        positions = np.asarray([c[pos_index] for c in coord],dtype=float)
+
+        cutOff = self.model["spike"]["parameters"]["bonds"]["bondsProtProt"]["cutOff"]
+
+        pairs,distances = getPairsWithinCutOff(positions,cutOff)
+
+        for (n1,n2),r0 in zip(pairs.tolist(),distances.tolist()):
+            if(coord[n1][id_index]==coord[n2][id_index]):
                 continue
 
-            id1 = int(c1[id_index][1::])
-            id2 = int(c2[id_index][1::])
+            id1 = ids[n1]
+            id2 = ids[n2]
 
             if id1 in avoidIds:
                 continue
             if id2 in avoidIds:
                 continue
 
-            p1 = np.asarray(c1[pos_index])
-            p2 = np.asarray(c2[pos_index])
-
-            r0 = np.linalg.norm(p1-p2)
-
-            if r0 < self.model["spike"]["parameters"]["bonds"]["bondsProtProt"]["cutOff"]:
-                self.spikeModel["bonds"]["data"].append([id1,id2,r0])
+            self.spikeModel["bonds"]["data"].append([id1,id2,r0])
 
         #########################
 
         self.proteinMaxRadius = self.__getProteinMaxRadius()
 
+        # Spike template, aligned so that its last bead (which is replaced by a lipid) is at the origin
+        posIndex = getLabelIndex("positions",self.spikeModel["coordinates"]["labels"])
+        self.spikeTemplatePositions = np.asarray([x[posIndex] for x in self.spikeModel["coordinates"]["data"]])
+        self.spikeTemplatePositions = self.spikeTemplatePositions-self.spikeTemplatePositions[-1]
+
         self.addedSpikes  = 0
+        self.spikesTries  = 0
+
+        self.unavailableLipids = set()
 
         self.spikeIds          = np.empty((0,1),dtype=int)
         self.spikeTypes        = np.empty((0,1),dtype=int)
@@ -593,6 +624,10 @@ class CORONAVIRUS(modelBase):
         self.spikePositions    = np.empty((0,3))
         self.spikeOrientations = np.empty((0,4))
 
+        self.spikesAdder = randomSequentialAddition(None,self.proteinMaxRadius,
+                                                    radiusFactor=1.5,
+                                                    periodic=[False,False,False])
+
         self.bonds        = []
         self.angLipidProt = []
         self.angProt      = []
@@ -6,6 +6,7 @@ import logging
 from . import modelBase
 from ...utils.geometry import getEx
 from ...utils.geometry import boxChecker,platesChecker
+from ...utils.geometry import randomSequentialAddition
 
 from ...utils.input import getSubParameters
 
@@ -16,7 +17,6 @@ import random
 import orthopoly
 
 import numpy as np
-from scipy.spatial import cKDTree
 
 from pyquaternion import Quaternion
 
@@ -131,40 +131,35 @@ class HELIX(modelBase):
                 raise Exception(f"Parameter not available")
 
     def __generateRandomPositions(self):
-        monomersPositions    = []
         monomersOrientations = []
 
         boxX,boxY,boxZ = [b/2.0 for b in self.box]
 
-        n=1
-        while(n<=self.nMonomers):
-            self.logger.debug(f"[HELIX] Trying to add monomer {n}")
-
+        def randomPosition():
             #We take into account the monomer radius for avoiding problems with PBC
             x=np.random.uniform(low=-boxX + self.monomerRadius, high=boxX - self.monomerRadius)
             y=np.random.uniform(low=-boxY + self.monomerRadius, high=boxY - self.monomerRadius)
             z=np.random.uniform(low=-boxZ + self.monomerRadius, high=boxZ - self.monomerRadius)
 
-            currentMonomerPosition = np.asarray([x,y,z])
+            return np.asarray([x,y,z])
 
-            if not self.checker.check([x,y,z]):
-                continue
+        #Monomers are accepted if the distance to all the others is larger than 1.5*(2.0*monomerRadius)
+        monomersAdder = randomSequentialAddition(self.box,self.monomerRadius,
+                                                 radiusFactor=1.5,
+                                                 periodic=[False,False,False],
+                                                 checker=self.checker)
 
-            if monomersPositions:
-                minDst,minDstIndex = cKDTree(monomersPositions).query(currentMonomerPosition, 1)
-            else:
-                minDst = np.inf
+        for n in range(1,self.nMonomers+1):
+            self.logger.debug(f"[HELIX] Trying to add monomer {n}")
 
-            if minDst > 1.5*(2.0*self.monomerRadius):
-                monomersPositions.append(currentMonomerPosition)
-                q=Quaternion.random()
-                q0,q1,q2,q3 = q
-                monomersOrientations.append(np.asarray([q0,q1,q2,q3]))
-                self.logger.debug(f"[HELIX] Added monomer {n}")
-                n=n+1
+            monomersAdder.tryAdd(randomPosition,[self.monomerRadius])
 
+            q=Quaternion.random()
+            q0,q1,q2,q3 = q
+            monomersOrientations.append(np.asarray([q0,q1,q2,q3]))
+            self.logger.debug(f"[HELIX] Added monomer {n}")
 
-        return np.asarray(monomersPositions),np.asarray(monomersOrientations)
+        return monomersAdder.getPositions().copy(),np.asarray(monomersOrientations)
 
     def __generateLine(self):
         monomersPositions    = []
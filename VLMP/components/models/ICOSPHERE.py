@@ -1,12 +1,15 @@
 from VLMP.components.models import modelBase
 
 import os
-
-import json
+import io
 
 import numpy as np
 import icosphere
 
+from ...utils.cache import getCacheFolder, fileLock, atomicWrite
+from ...utils.tables import columnarTable, categoricalColumn
+from ...utils.exclusions import exclusionsList
+
 class ICOSPHERE(modelBase):
     """
     {"author": "Pablo Ibáñez-Freire",
@@ -89,130 +92,132 @@ class ICOSPHERE(modelBase):
     requiredParameters  = {"particleName"}
     definedSelections   = set()
 
-    def __loadData(self,name):
+    _cacheVersion = 2
 
-        try:
+    def __getCachePath(self):
+        folder = getCacheFolder("ICOSPHERE")
+        return os.path.join(folder,f"ICOSPHERE_v{self._cacheVersion}_res{self.resolution}.npz")
+
+    def __loadTopology(self,cachePath):
 
-            with open(self.modelData,"r") as f:
-                data = json.load(f)
-        except:
-            self.logger.warning("[ICOSPHERE] Error opening model data from {} (loading)".format(self.modelData))
+        if not os.path.isfile(cachePath):
             return None
 
         try:
-            d = data[str(self.resolution)][name].copy()
-        except:
-            self.logger.warning("[ICOSPHERE] Error loading {} from model data".format(name))
+            with np.load(cachePath) as data:
+                topology = {name:data[name] for name in data.files}
+        except Exception as e:
+            self.logger.warning(f"[ICOSPHERE] Error loading topology from cache {cachePath} ({e}), it will be regenerated")
             return None
 
-        return d
+        return topology
 
-    def __saveToData(self,d,name):
+    def __saveTopology(self,cachePath,topology):
 
         try:
-            with open(self.modelData,"r") as f:
-                data = json.load(f)
-        except:
-            self.logger.warning("[ICOSPHERE] Error opening model data from {} (saving)".format(self.modelData))
-            return
-
-        try:
-            if str(self.resolution) not in data:
-                data[str(self.resolution)] = {}
-            data[str(self.resolution)][name] = d.copy()
-
-            with open(self.modelData,"w") as f:
-                json.dump(data,f)
-        except:
-            self.logger.warning("[ICOSPHERE] Error saving model data to {}".format(self.modelData))
-            return
-
-        return
+            buffer = io.BytesIO()
+            np.savez(buffer,**topology)
+            atomicWrite(cachePath,buffer.getvalue())
+        except Exception as e:
+            self.logger.warning(f"[ICOSPHERE] Error saving topology to cache {cachePath} ({e})")
 
     def __generateBonds(self,faces):
 
-        bonds = self.__loadData("bonds")
-
-        if bonds is None:
-            bonds = set()
-            for face in faces:
-                bonds.add(tuple(sorted([int(face[0]),int(face[1])])))
-                bonds.add(tuple(sorted([int(face[1]),int(face[2])])))
-                bonds.add(tuple(sorted([int(face[2]),int(face[0])])))
-            bonds = list(bonds)
-
-            self.__saveToData(bonds,"bonds")
+        bonds = set()
+        for face in faces:
+            bonds.add(tuple(sorted([int(face[0]),int(face[1])])))
+            bonds.add(tuple(sorted([int(face[1]),int(face[2])])))
+            bonds.add(tuple(sorted([int(face[2]),int(face[0])])))
+        bonds = list(bonds)
 
-        return bonds.copy()
+        return np.asarray(bonds,dtype=np.int64).reshape(-1,2)
 
     def __generateDihedrals(self,faces):
 
-        dihedrals = self.__loadData("dihedrals")
-
-        if dihedrals is None:
-
-            dihedrals = []
-
-            # List all pairs of faces that share an edge
-            facesPairs = set()
-            for i in range(len(faces)):
-                for j in range(i+1,len(faces)):
-                    if len(set(faces[i]).intersection(set(faces[j]))) == 2:
-                        facesPairs.add((i,j))
+        faces = np.asarray(faces,dtype=np.int64)
+        nFaces = faces.shape[0]
+        nVertices = int(faces.max())+1
 
-            for facePair in facesPairs:
-                face1 = faces[facePair[0]]
-                face2 = faces[facePair[1]]
+        # Build the edge -> faces map. Each edge (sorted pair of vertices) is keyed by a single integer,
+        # after sorting the keys the two faces sharing an edge are contiguous.
+        edges = np.sort(faces[:,[0,1,1,2,2,0]].reshape(-1,2),axis=1)
+        edgesKeys  = edges[:,0]*nVertices+edges[:,1]
+        edgesFaces = np.repeat(np.arange(nFaces),3)
 
-                common = set(face1).intersection(set(face2))
+        order = np.argsort(edgesKeys,kind="stable")
+        edgesKeys  = edgesKeys[order]
+        edgesFaces = edgesFaces[order]
 
-                if len(common) == 2:
-                    face1Id = list(set(face1).difference(common))[0]
-                    face2Id = list(set(face2).difference(common))[0]
+        if len(edgesKeys)%2 != 0 or np.any(edgesKeys[0::2] != edgesKeys[1::2]):
+            self.logger.error("[ICOSPHERE] Some edges are not shared by exactly two faces")
+            raise Exception("Faces do not share an edge")
 
-                    i = int(face1Id)
-                    j = int(common.pop())
-                    k = int(common.pop())
-                    l = int(face2Id)
+        # Each edge gives a dihedral: the vertex of the first face not in the edge, the edge
+        # and the vertex of the second face not in the edge. Dihedrals are sorted by faces.
+        edges       = np.stack([edgesKeys[0::2]//nVertices,edgesKeys[0::2]%nVertices],axis=1)
+        facesPairs  = np.sort(np.stack([edgesFaces[0::2],edgesFaces[1::2]],axis=1),axis=1)
 
-                    dihedrals.append([i,j,k,l])
-                else:
-                    self.log("Faces do not share an edge, faces: {} {}".format(face1,face2))
-                    raise Exception("Faces do not share an edge")
+        order       = np.lexsort((facesPairs[:,1],facesPairs[:,0]))
+        edges       = edges[order]
+        facesPairs  = facesPairs[order]
 
-            self.__saveToData(dihedrals,"dihedrals")
+        edgesSum  = edges.sum(axis=1)
+        dihedrals = np.stack([faces[facesPairs[:,0]].sum(axis=1) - edgesSum,
+                              edges[:,0],
+                              edges[:,1],
+                              faces[facesPairs[:,1]].sum(axis=1) - edgesSum],axis=1)
 
-        return dihedrals.copy()
+        return dihedrals.astype(np.int64).reshape(-1,4)
 
     def __generateExclusions(self,bonds):
 
-        exclusions = self.__loadData("exclusions")
+        # Exclusions are stored in CSR format: for the particle exclusionsIds[n],
+        # the excluded particles are exclusionsList[exclusionsOffsets[n]:exclusionsOffsets[n+1]]
+        pairs = np.concatenate([bonds,bonds[:,::-1]])
+        pairs = np.unique(pairs,axis=0)
 
-        if exclusions is None:
+        exclusionsIds,counts = np.unique(pairs[:,0],return_counts=True)
+        exclusionsOffsets = np.concatenate([[0],np.cumsum(counts)])
 
-            exclusionsTmp = {}
+        return {"exclusionsIds":exclusionsIds,
+                "exclusionsOffsets":exclusionsOffsets,
+                "exclusionsList":pairs[:,1]}
 
-            for bnd in bonds:
-                i,j = bnd
-                exclusionsTmp[i] = []
-                exclusionsTmp[j] = []
-            for bnd in bonds:
-                i,j = bnd
-                exclusionsTmp[i].append(j)
-                exclusionsTmp[j].append(i)
+    def __getTopology(self,faces):
+        """
+        Bonds, dihedrals and exclusions only depend on the resolution. They are stored
+        in the user cache folder (see VLMP.utils.cache.getCacheFolder).
+        """
 
-            exclusionsTmp = {i:sorted(list(set(data))) for i,data in exclusionsTmp.items()}
-
-            exclusions = []
-            for i,excl in exclusionsTmp.items():
-                exclusions.append([i,excl.copy()])
-
-            #Sort according i
-            exclusions = sorted(exclusions,key=lambda x: x[0])
-
-            self.__saveToData(exclusions,"exclusions")
-
-        return exclusions.copy()
+        try:
+            cachePath = self.__getCachePath()
+        except Exception as e:
+            self.logger.warning(f"[ICOSPHERE] Cache folder not available ({e}), topology will not be cached")
+            cachePath = None
+
+        if cachePath is not None:
+            topology = self.__loadTopology(cachePath)
+            if topology is not None:
+                return topology
+
+        def generate():
+            bonds = self.__generateBonds(faces)
+            topology = {"bonds":bonds,
+                        "dihedrals":self.__generateDihedrals(faces)}
+            topology.update(self.__generateExclusions(bonds))
+            return topology
+
+        if cachePath is None:
+            return generate()
+
+        with fileLock(cachePath+".lock"):
+            # Another process could have generated the topology while waiting for the lock
+            topology = self.__loadTopology(cachePath)
+            if topology is None:
+                topology = generate()
+                self.__saveTopology(cachePath,topology)
+
+        return topology
 
     def __init__(self,name,**params):
         super().__init__(_type = self.__class__.__name__,
@@ -224,11 +229,6 @@ class ICOSPHERE(modelBase):
 
         ############################################################
 
-        self.modelData = "./data/ICOSPHERE.json"
-        self.modelData = os.path.join(os.path.dirname(os.path.realpath(__file__)),self.modelData)
-
-        ############################################################
-
         particleName = params["particleName"]
 
         particleMass   = params.get("particleMass",1.0)
@@ -256,64 +256,50 @@ class ICOSPHERE(modelBase):
         vertices,faces = icosphere.icosphere(nu = self.resolution)
 
         #Update the vertices
-        for i in range(len(vertices)):
-            vertices[i] = radius*vertices[i]+position
-
-        state = {}
-        state["labels"] = ["id","position"]
+        vertices = radius*vertices+position
+        nVertices = len(vertices)
 
-        state["data"] = []
-        for i,vertex in enumerate(vertices):
-            x,y,z = vertex
-            state["data"].append([i,[x,y,z]])
+        state = columnarTable(["id","position"],
+                              [np.arange(nVertices),vertices])
 
-        structure = {}
-        structure["labels"] = ["id","type"]
-
-        structure["data"] = []
-        for i,face in enumerate(vertices):
-            structure["data"].append([i,particleName])
+        structure = columnarTable(["id","type"],
+                                  [np.arange(nVertices),categoricalColumn([particleName],np.zeros(nVertices,dtype=int))])
 
         forceField = {}
 
-        forceField["bonds"] = {}
-        forceField["bonds"]["type"]       = ["Bond2","Harmonic"]
-        forceField["bonds"]["labels"]     = ["id_i","id_j","r0","K"]
-        forceField["bonds"]["parameters"] = {}
-        forceField["bonds"]["data"]       = []
+        topology = self.__getTopology(faces)
 
-        bonds = self.__generateBonds(faces)
+        bonds = topology["bonds"]
+        dst   = vertices[bonds[:,0]]-vertices[bonds[:,1]]
+        dst   = np.sqrt(np.einsum("ij,ij->i",dst,dst))
 
-        for bond in bonds:
-            dst = np.linalg.norm(vertices[bond[0]]-vertices[bond[1]])
-            forceField["bonds"]["data"].append([bond[0],bond[1],dst,Kb])
+        forceField["bonds"] = columnarTable(["id_i","id_j","r0","K"],
+                                            [bonds[:,0],bonds[:,1],dst,np.full(len(bonds),Kb)],
+                                            type = ["Bond2","Harmonic"],
+                                            parameters = {})
 
         if Kd > 0.0:
 
-            forceField["dihedrals"] = {}
-            forceField["dihedrals"]["type"]       = ["Bond4","Dihedral"]
-            forceField["dihedrals"]["labels"]     = ["id_i","id_j","id_k","id_l","phi0","K","n"]
-            forceField["dihedrals"]["parameters"] = {}
-            forceField["dihedrals"]["data"]       = []
-
-            dihedrals = self.__generateDihedrals(faces)
+            dihedrals = topology["dihedrals"]
+            nDihedrals = len(dihedrals)
 
-            for dihedral in dihedrals:
-                i,j,k,l = dihedral
-                forceField["dihedrals"]["data"].append([i,j,k,l,0.0,Kd,1])
+            forceField["dihedrals"] = columnarTable(["id_i","id_j","id_k","id_l","phi0","K","n"],
+                                                    [dihedrals[:,0],dihedrals[:,1],dihedrals[:,2],dihedrals[:,3],
+                                                     np.zeros(nDihedrals),np.full(nDihedrals,Kd),np.ones(nDihedrals,dtype=int)],
+                                                    type = ["Bond4","Dihedral"],
+                                                    parameters = {})
 
         if steric:
 
-            exclusions = self.__generateExclusions(bonds)
+            exclusions = exclusionsList(topology["exclusionsIds"],
+                                        topology["exclusionsOffsets"],
+                                        topology["exclusionsList"])
 
             forceField["verletList"] = {}
             forceField["verletList"]["type"]       = ["VerletConditionalListSet", "nonExclIntra_nonExclInter"]
             forceField["verletList"]["parameters"] = {"cutOffVerletFactor":1.2}
             forceField["verletList"]["labels"]     = ["id","id_list"]
-            forceField["verletList"]["data"]       = []
-
-            for i,excl in exclusions:
-                forceField["verletList"]["data"].append([i,excl])
+            forceField["verletList"]["data"]       = exclusions.getData()
 
             forceField["steric"] = {}
             forceField["steric"]["type"] = ["NonBonded", "WCAType2"]
@@ -8,6 +8,8 @@ import numpy as np
 
 from . import modelBase
 
+from ...utils.exclusions import bandedExclusions
+
 from pyGrained.utils.data import getData
 
 class IDP(modelBase):
@@ -186,15 +188,7 @@ class IDP(modelBase):
 
         # Non bonded
 
-        exclusions = {}
-        for i in range(len(sequence)):
-            for j in range(i+1,len(sequence)):
-                if np.abs(i-j) <= EXCLUSION_DST:
-                    exclusions.setdefault(i,[]).append(j)
-                    exclusions.setdefault(j,[]).append(i)
-
-        for exc in exclusions:
-            exclusions[exc] = sorted(list(set(exclusions[exc])))
+        exclusions = bandedExclusions(len(sequence),EXCLUSION_DST)
 
         #NL
         forcefield["nl"] = {}
@@ -204,8 +198,7 @@ class IDP(modelBase):
         forcefield["nl"]["data"] = []
 
         if EXCLUSION_DST != 0:
-            for i in range(len(sequence)):
-                forcefield["nl"]["data"].append([i,exclusions[i]])
+            forcefield["nl"]["data"] = exclusions.getData()
 
         # HYDROPHOBIC
         forcefield["hydrophobic"] = {}
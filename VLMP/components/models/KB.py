@@ -5,6 +5,8 @@ import copy
 import logging
 
 from . import modelBase
+from ...utils.cache import getCoarseGrainedModel
+from ...utils.pdb   import getPDBResolver
 
 import pyGrained.models.AlphaCarbon as proteinModel
 
@@ -96,33 +98,33 @@ class KB(modelBase):
         #Check if PDB is a file or a PDB ID.
         #PDB is considered a file if it has a .pdb or .pqr extension.
         #If it is a file, it is loaded as a PDB file.
-        #If it is a PDB ID, PDB file is downloaded from the RCSB PDB database.
+        #If it is a PDB ID, PDB file is taken from the local PDB store or fetched (see pdbResolver).
 
-        if params["PDB"].split(".")[-1] in ["pdb","pqr"]:
-            inputPDBfilePath = params["PDB"]
-        else:
-            raise NotImplementedError("PDB ID download not implemented yet.")
+        inputPDBfilePath = getPDBResolver().resolve(params["PDB"])
 
         kbParams = {"SASA":params.get("SASA",False),
                     "centerInput":params.get("centerInput",True),
                     "aggregateChains":params.get("aggregateChains",True),
                     "parameters": copy.deepcopy(params)}
 
-        kb = proteinModel.KaranicolasBrooks(name = name,
-                                            inputPDBfilePath = inputPDBfilePath,
-                                            params = kbParams)
+        #The coarse grained model is only computed once for each protein and parameters (see getCoarseGrainedModel)
+        cgModel = getCoarseGrainedModel("KB",inputPDBfilePath,
+                                        {par:params[par] for par in self.availableParameters if par in params},
+                                        lambda: proteinModel.KaranicolasBrooks(name = name,
+                                                                               inputPDBfilePath = inputPDBfilePath,
+                                                                               params = kbParams))
 
         ########################################################
 
         types = self.getTypes()
-        modelTypes = kb.getTypes()
+        modelTypes = cgModel["types"]
 
         for _,t in modelTypes.items():
             types.addType(**t)
 
-        self.setState(kb.getState())
-        self.setStructure(kb.getStructure())
-        self.setForceField(kb.getForceField())
+        self.setState(cgModel["state"])
+        self.setStructure(cgModel["structure"])
+        self.setForceField(cgModel["forceField"])
 
 
     def processSelection(self,selectionType,selectionOptions):
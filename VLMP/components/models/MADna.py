@@ -4,7 +4,6 @@ import json
 
 import logging
 
-import itertools
 
 from . import modelBase
 from ...utils.input import getSubParameters
@@ -302,6 +301,38 @@ class MADna(modelBase):
 
         return list(set(indices))
 
+    def __topologySelection(self,basePairIndex,type,strand=[1,2]):
+        #Equivalent to _processSelection for the selections used in the topology generation,
+        #but indices are looked up in the structure table instead of scanning the whole structure.
+
+        if not isinstance(type,list):
+            type = [type]
+        if not isinstance(strand,list):
+            strand = [strand]
+
+        if basePairIndex > self.seqLen or basePairIndex == 0:
+            self.logger.error(f"[MADna] Base pair has to be a number between 1 and {self.seqLen}. But is:{basePairIndex}")
+            raise Exception("Base pair index out of range")
+
+        typeSel = []
+        for t in type:
+            if t == "B":
+                typeSel += ["A","C","G","T"]
+            else:
+                typeSel.append(t)
+
+        indices = []
+        for s in strand:
+            for t in typeSel:
+                index = self.structureTable.get((basePairIndex,s,t))
+                if index is not None:
+                    indices.append(index)
+
+        #Same order as _processSelection, which scans the structure in insertion order
+        indices = sorted(set(indices),key=self.structureRank.get)
+
+        return list(set(indices))
+
     def __generateCoordinatesAndTopology(self):
 
         self.coordinates = np.zeros((self.nAtoms,3))
@@ -345,6 +376,13 @@ class MADna(modelBase):
             info.update({"index":index})
             info.update({"basePairType":self.seq[self.structure[index]["basePairIndex"]-1]})
 
+        #Table (basePairIndex,strand,type) -> index, used by __topologySelection
+        self.structureTable = {}
+        self.structureRank  = {}
+        for rank,(index,info) in enumerate(self.structure.items()):
+            self.structureTable[(info["basePairIndex"],info["strand"],info["type"])] = index
+            self.structureRank[index] = rank
+
         #for index,info in self.structure.items():
         #    print(index,info)
 
@@ -372,8 +410,7 @@ class MADna(modelBase):
         pf = self.coordinates[self.nAtoms//2+3]
 
         trans = 0.5*(p0 + pf)
-        for i in range(0,self.nAtoms):
-            self.coordinates[i] -= trans
+        self.coordinates -= trans
 
 
         ############# COORDINATES GENERATION ENDS #############
@@ -392,16 +429,16 @@ class MADna(modelBase):
         for bp in basePairsList:
             t = self.seq[bp-1]
             ##SB
-            i,j = self._processSelection(**{"basePairIndex":bp,"type":["S",t],"strand":1})
+            i,j = self.__topologySelection(**{"basePairIndex":bp,"type":["S",t],"strand":1})
             bType = "SB/{}".format(t)
             self.bonds.append({"i":i,"j":j,"type":bType})
 
-            i,j = self._processSelection(**{"basePairIndex":bp,"type":["S",self.model["PAIRS"][t]],"strand":2})
+            i,j = self.__topologySelection(**{"basePairIndex":bp,"type":["S",self.model["PAIRS"][t]],"strand":2})
             bType = "SB/{}".format(self.model["PAIRS"][t])
             self.bonds.append({"i":j,"j":i,"type":bType})#Note index inverted!!
 
             ##BB-inter strand
-            i,j = self._processSelection(**{"basePairIndex":bp,"type":[t,self.model["PAIRS"][t]]})
+            i,j = self.__topologySelection(**{"basePairIndex":bp,"type":[t,self.model["PAIRS"][t]]})
             bType = "BB-inter/{}{}".format(t,self.model["PAIRS"][t])
             self.bonds.append({"i":i,"j":j,"type":bType})
 
@@ -409,8 +446,8 @@ class MADna(modelBase):
             bp5,bp3 = bpp
             t5,t3 = self.seq[bp5-1],self.seq[bp3-1]
 
-            i = self._processSelection(**{"basePairIndex":bp5,"type":"S","strand":1})
-            j = self._processSelection(**{"basePairIndex":bp3,"type":"P","strand":1})
+            i = self.__topologySelection(**{"basePairIndex":bp5,"type":"S","strand":1})
+            j = self.__topologySelection(**{"basePairIndex":bp3,"type":"P","strand":1})
             if len(i)==1 and len(j)==1:
                 i=i[0]
                 j=j[0]
@@ -420,8 +457,8 @@ class MADna(modelBase):
                 bType = "SP/{}{}".format(t5,t3)
                 self.bonds.append({"i":i,"j":j,"type":bType})
 
-            i = self._processSelection(**{"basePairIndex":bp5,"type":"S","strand":2})
-            j = self._processSelection(**{"basePairIndex":bp5,"type":"P","strand":2})
+            i = self.__topologySelection(**{"basePairIndex":bp5,"type":"S","strand":2})
+            j = self.__topologySelection(**{"basePairIndex":bp5,"type":"P","strand":2})
             if len(i)==1 and len(j)==1:
                 i=i[0]
                 j=j[0]
@@ -433,8 +470,8 @@ class MADna(modelBase):
 
             #########################################################################
 
-            i = self._processSelection(**{"basePairIndex":bp3,"type":"P","strand":1})
-            j = self._processSelection(**{"basePairIndex":bp3,"type":"S","strand":1})
+            i = self.__topologySelection(**{"basePairIndex":bp3,"type":"P","strand":1})
+            j = self.__topologySelection(**{"basePairIndex":bp3,"type":"S","strand":1})
             if len(i)==1 and len(j)==1:
                 i=i[0]
                 j=j[0]
@@ -444,8 +481,8 @@ class MADna(modelBase):
                 bType = "PS/{}{}".format(t5,t3)
                 self.bonds.append({"i":i,"j":j,"type":bType})
 
-            i = self._processSelection(**{"basePairIndex":bp5,"type":"P","strand":2})
-            j = self._processSelection(**{"basePairIndex":bp3,"type":"S","strand":2})
+            i = self.__topologySelection(**{"basePairIndex":bp5,"type":"P","strand":2})
+            j = self.__topologySelection(**{"basePairIndex":bp3,"type":"S","strand":2})
             if len(i)==1 and len(j)==1:
                 i=i[0]
                 j=j[0]
@@ -458,8 +495,8 @@ class MADna(modelBase):
             ########################################################################
 
             #5BB3-intra strand
-            i = self._processSelection(**{"basePairIndex":bp5,"type":"B","strand":1})
-            j = self._processSelection(**{"basePairIndex":bp3,"type":"B","strand":1})
+            i = self.__topologySelection(**{"basePairIndex":bp5,"type":"B","strand":1})
+            j = self.__topologySelection(**{"basePairIndex":bp3,"type":"B","strand":1})
             if len(i)==1 and len(j)==1:
                 i=i[0]
                 j=j[0]
@@ -468,8 +505,8 @@ class MADna(modelBase):
                 self.bonds.append({"i":i,"j":j,"type":bType})
 
             #5BB3-intra strand
-            i = self._processSelection(**{"basePairIndex":bp5,"type":"B","strand":2})
-            j = self._processSelection(**{"basePairIndex":bp3,"type":"B","strand":2})
+            i = self.__topologySelection(**{"basePairIndex":bp5,"type":"B","strand":2})
+            j = self.__topologySelection(**{"basePairIndex":bp3,"type":"B","strand":2})
             if len(i)==1 and len(j)==1:
                 i=i[0]
                 j=j[0]
@@ -483,16 +520,16 @@ class MADna(modelBase):
         for bp in basePairsList:
             t = self.seq[bp-1]
             ##SBB
-            i, = self._processSelection(**{"basePairIndex":bp,"type":"S","strand":1})
-            j, = self._processSelection(**{"basePairIndex":bp,"type":"B","strand":1})
-            k, = self._processSelection(**{"basePairIndex":bp,"type":"B","strand":2})
+            i, = self.__topologySelection(**{"basePairIndex":bp,"type":"S","strand":1})
+            j, = self.__topologySelection(**{"basePairIndex":bp,"type":"B","strand":1})
+            k, = self.__topologySelection(**{"basePairIndex":bp,"type":"B","strand":2})
 
             aType = "SBB/{}{}".format(t,self.model["PAIRS"][t])
             self.angles.append({"i":i,"j":j,"k":k,"type":aType})
 
-            i, = self._processSelection(**{"basePairIndex":bp,"type":"B","strand":1})
-            j, = self._processSelection(**{"basePairIndex":bp,"type":"B","strand":2})
-            k, = self._processSelection(**{"basePairIndex":bp,"type":"S","strand":2})
+            i, = self.__topologySelection(**{"basePairIndex":bp,"type":"B","strand":1})
+            j, = self.__topologySelection(**{"basePairIndex":bp,"type":"B","strand":2})
+            k, = self.__topologySelection(**{"basePairIndex":bp,"type":"S","strand":2})
 
             aType = "SBB/{}{}".format(self.model["PAIRS"][t],t)
             self.angles.append({"i":k,"j":j,"k":i,"type":aType})#Note index inverted!!
@@ -506,9 +543,9 @@ class MADna(modelBase):
 
             ########################################################################
 
-            i = self._processSelection(**{"basePairIndex":bp5,"type":"S","strand":1})
-            j = self._processSelection(**{"basePairIndex":bp3,"type":"P","strand":1})
-            k = self._processSelection(**{"basePairIndex":bp3,"type":"S","strand":1})
+            i = self.__topologySelection(**{"basePairIndex":bp5,"type":"S","strand":1})
+            j = self.__topologySelection(**{"basePairIndex":bp3,"type":"P","strand":1})
+            k = self.__topologySelection(**{"basePairIndex":bp3,"type":"S","strand":1})
 
             if len(i)==1 and len(j)==1 and len(k)==1:
                 i = i[0]
@@ -517,9 +554,9 @@ class MADna(modelBase):
                 aType = "SPS/{}{}".format(t5,t3)
                 self.angles.append({"i":i,"j":j,"k":k,"type":aType})
 
-            i = self._processSelection(**{"basePairIndex":bp5,"type":"S","strand":2})
-            j = self._processSelection(**{"basePairIndex":bp5,"type":"P","strand":2})
-            k = self._processSelection(**{"basePairIndex":bp3,"type":"S","strand":2})
+            i = self.__topologySelection(**{"basePairIndex":bp5,"type":"S","strand":2})
+            j = self.__topologySelection(**{"basePairIndex":bp5,"type":"P","strand":2})
+            k = self.__topologySelection(**{"basePairIndex":bp3,"type":"S","strand":2})
 
             if len(i)==1 and len(j)==1 and len(k)==1:
                 i = i[0]
@@ -531,9 +568,9 @@ class MADna(modelBase):
 
             ########################################################################
 
-            i = self._processSelection(**{"basePairIndex":bp3,"type":"P","strand":1})
-            j = self._processSelection(**{"basePairIndex":bp5,"type":"S","strand":1})
-            k = self._processSelection(**{"basePairIndex":bp5,"type":"B","strand":1})
+            i = self.__topologySelection(**{"basePairIndex":bp3,"type":"P","strand":1})
+            j = self.__topologySelection(**{"basePairIndex":bp5,"type":"S","strand":1})
+            k = self.__topologySelection(**{"basePairIndex":bp5,"type":"B","strand":1})
 
             if len(i)==1 and len(j)==1 and len(k)==1:
                 i = i[0]
@@ -542,9 +579,9 @@ class MADna(modelBase):
                 aType = "3PSB5/{}{}".format(t5,t3)
                 self.angles.append({"i":i,"j":j,"k":k,"type":aType})
 
-            i = self._processSelection(**{"basePairIndex":bp5,"type":"P","strand":2})
-            j = self._processSelection(**{"basePairIndex":bp3,"type":"S","strand":2})
-            k = self._processSelection(**{"basePairIndex":bp3,"type":"B","strand":2})
+            i = self.__topologySelection(**{"basePairIndex":bp5,"type":"P","strand":2})
+            j = self.__topologySelection(**{"basePairIndex":bp3,"type":"S","strand":2})
+            k = self.__topologySelection(**{"basePairIndex":bp3,"type":"B","strand":2})
 
             if len(i)==1 and len(j)==1 and len(k)==1:
                 i = i[0]
@@ -555,9 +592,9 @@ class MADna(modelBase):
 
             ########################################################################
 
-            i = self._processSelection(**{"basePairIndex":bp3,"type":"P","strand":1})
-            j = self._processSelection(**{"basePairIndex":bp3,"type":"S","strand":1})
-            k = self._processSelection(**{"basePairIndex":bp3,"type":"B","strand":1})
+            i = self.__topologySelection(**{"basePairIndex":bp3,"type":"P","strand":1})
+            j = self.__topologySelection(**{"basePairIndex":bp3,"type":"S","strand":1})
+            k = self.__topologySelection(**{"basePairIndex":bp3,"type":"B","strand":1})
 
             if len(i)==1 and len(j)==1 and len(k)==1:
                 i = i[0]
@@ -566,9 +603,9 @@ class MADna(modelBase):
                 aType = "5PSB3/{}{}".format(t5,t3)
                 self.angles.append({"i":i,"j":j,"k":k,"type":aType})
 
-            i = self._processSelection(**{"basePairIndex":bp5,"type":"P","strand":2})
-            j = self._processSelection(**{"basePairIndex":bp5,"type":"S","strand":2})
-            k = self._processSelection(**{"basePairIndex":bp5,"type":"B","strand":2})
+            i = self.__topologySelection(**{"basePairIndex":bp5,"type":"P","strand":2})
+            j = self.__topologySelection(**{"basePairIndex":bp5,"type":"S","strand":2})
+            k = self.__topologySelection(**{"basePairIndex":bp5,"type":"B","strand":2})
 
             if len(i)==1 and len(j)==1 and len(k)==1:
                 i = i[0]
@@ -584,10 +621,10 @@ class MADna(modelBase):
             t5,t3 = self.seq[bp5-1],self.seq[bp3-1]
 
             #PSBB53
-            i = self._processSelection(**{"basePairIndex":bp3,"type":"P","strand":1})
-            j = self._processSelection(**{"basePairIndex":bp3,"type":"S","strand":1})
-            k = self._processSelection(**{"basePairIndex":bp3,"type":"B","strand":1})
-            l = self._processSelection(**{"basePairIndex":bp3,"type":"B","strand":2})
+            i = self.__topologySelection(**{"basePairIndex":bp3,"type":"P","strand":1})
+            j = self.__topologySelection(**{"basePairIndex":bp3,"type":"S","strand":1})
+            k = self.__topologySelection(**{"basePairIndex":bp3,"type":"B","strand":1})
+            l = self.__topologySelection(**{"basePairIndex":bp3,"type":"B","strand":2})
 
             if len(i)==1 and len(j)==1 and len(k)==1 and len(l)==1:
                 i = i[0]
@@ -599,10 +636,10 @@ class MADna(modelBase):
                 self.dihedrals.append({"i":i,"j":j,"k":k,"l":l,"type":dType})
 
             ##PSBB53
-            i = self._processSelection(**{"basePairIndex":bp5,"type":"P","strand":2})
-            j = self._processSelection(**{"basePairIndex":bp5,"type":"S","strand":2})
-            k = self._processSelection(**{"basePairIndex":bp5,"type":"B","strand":2})
-            l = self._processSelection(**{"basePairIndex":bp5,"type":"B","strand":1})
+            i = self.__topologySelection(**{"basePairIndex":bp5,"type":"P","strand":2})
+            j = self.__topologySelection(**{"basePairIndex":bp5,"type":"S","strand":2})
+            k = self.__topologySelection(**{"basePairIndex":bp5,"type":"B","strand":2})
+            l = self.__topologySelection(**{"basePairIndex":bp5,"type":"B","strand":1})
 
             if len(i)==1 and len(j)==1 and len(k)==1 and len(l)==1:
                 i = i[0]
@@ -616,10 +653,10 @@ class MADna(modelBase):
             ########################################################################
 
             ###PSBB35
-            i = self._processSelection(**{"basePairIndex":bp3,"type":"P","strand":1})
-            j = self._processSelection(**{"basePairIndex":bp5,"type":"S","strand":1})
-            k = self._processSelection(**{"basePairIndex":bp5,"type":"B","strand":1})
-            l = self._processSelection(**{"basePairIndex":bp5,"type":"B","strand":2})
+            i = self.__topologySelection(**{"basePairIndex":bp3,"type":"P","strand":1})
+            j = self.__topologySelection(**{"basePairIndex":bp5,"type":"S","strand":1})
+            k = self.__topologySelection(**{"basePairIndex":bp5,"type":"B","strand":1})
+            l = self.__topologySelection(**{"basePairIndex":bp5,"type":"B","strand":2})
 
             if len(i)==1 and len(j)==1 and len(k)==1 and len(l)==1:
                 i = i[0]
@@ -631,10 +668,10 @@ class MADna(modelBase):
                 self.dihedrals.append({"i":i,"j":j,"k":k,"l":l,"type":dType})
 
             ###PSBB35
-            i = self._processSelection(**{"basePairIndex":bp5,"type":"P","strand":2})
-            j = self._processSelection(**{"basePairIndex":bp3,"type":"S","strand":2})
-            k = self._processSelection(**{"basePairIndex":bp3,"type":"B","strand":2})
-            l = self._processSelection(**{"basePairIndex":bp3,"type":"B","strand":1})
+            i = self.__topologySelection(**{"basePairIndex":bp5,"type":"P","strand":2})
+            j = self.__topologySelection(**{"basePairIndex":bp3,"type":"S","strand":2})
+            k = self.__topologySelection(**{"basePairIndex":bp3,"type":"B","strand":2})
+            l = self.__topologySelection(**{"basePairIndex":bp3,"type":"B","strand":1})
 
             if len(i)==1 and len(j)==1 and len(k)==1 and len(l)==1:
                 i = i[0]
@@ -649,10 +686,10 @@ class MADna(modelBase):
 
             ##SPSP
             if bp3+1 <= self.seqLen:
-                i = self._processSelection(**{"basePairIndex":bp5,"type":"S","strand":1})
-                j = self._processSelection(**{"basePairIndex":bp3,"type":"P","strand":1})
-                k = self._processSelection(**{"basePairIndex":bp3,"type":"S","strand":1})
-                l = self._processSelection(**{"basePairIndex":bp3+1,"type":"P","strand":1})
+                i = self.__topologySelection(**{"basePairIndex":bp5,"type":"S","strand":1})
+                j = self.__topologySelection(**{"basePairIndex":bp3,"type":"P","strand":1})
+                k = self.__topologySelection(**{"basePairIndex":bp3,"type":"S","strand":1})
+                l = self.__topologySelection(**{"basePairIndex":bp3+1,"type":"P","strand":1})
 
                 if len(i)==1 and len(j)==1 and len(k)==1 and len(l)==1:
                     i = i[0]
@@ -665,10 +702,10 @@ class MADna(modelBase):
 
             ##SPSP
             if bp5-1 >= 1:
-                i = self._processSelection(**{"basePairIndex":bp3  ,"type":"S","strand":2})
-                j = self._processSelection(**{"basePairIndex":bp5  ,"type":"P","strand":2})
-                k = self._processSelection(**{"basePairIndex":bp5  ,"type":"S","strand":2})
-                l = self._processSelection(**{"basePairIndex":bp5-1,"type":"P","strand":2})
+                i = self.__topologySelection(**{"basePairIndex":bp3  ,"type":"S","strand":2})
+                j = self.__topologySelection(**{"basePairIndex":bp5  ,"type":"P","strand":2})
+                k = self.__topologySelection(**{"basePairIndex":bp5  ,"type":"S","strand":2})
+                l = self.__topologySelection(**{"basePairIndex":bp5-1,"type":"P","strand":2})
 
                 if len(i)==1 and len(j)==1 and len(k)==1 and len(l)==1:
                     i = i[0]
@@ -682,10 +719,10 @@ class MADna(modelBase):
             ########################################################################
 
             ##PSPS
-            i = self._processSelection(**{"basePairIndex":bp5,"type":"P","strand":1})
-            j = self._processSelection(**{"basePairIndex":bp5,"type":"S","strand":1})
-            k = self._processSelection(**{"basePairIndex":bp3,"type":"P","strand":1})
-            l = self._processSelection(**{"basePairIndex":bp3,"type":"S","strand":1})
+            i = self.__topologySelection(**{"basePairIndex":bp5,"type":"P","strand":1})
+            j = self.__topologySelection(**{"basePairIndex":bp5,"type":"S","strand":1})
+            k = self.__topologySelection(**{"basePairIndex":bp3,"type":"P","strand":1})
+            l = self.__topologySelection(**{"basePairIndex":bp3,"type":"S","strand":1})
 
             if len(i)==1 and len(j)==1 and len(k)==1 and len(l)==1:
                 i = i[0]
@@ -697,10 +734,10 @@ class MADna(modelBase):
                 self.dihedrals.append({"i":i,"j":j,"k":k,"l":l,"type":dType})
 
             ##PSPS
-            i = self._processSelection(**{"basePairIndex":bp3,"type":"P","strand":2})
-            j = self._processSelection(**{"basePairIndex":bp3,"type":"S","strand":2})
-            k = self._processSelection(**{"basePairIndex":bp5,"type":"P","strand":2})
-            l = self._processSelection(**{"basePairIndex":bp5,"type":"S","strand":2})
+            i = self.__topologySelection(**{"basePairIndex":bp3,"type":"P","strand":2})
+            j = self.__topologySelection(**{"basePairIndex":bp3,"type":"S","strand":2})
+            k = self.__topologySelection(**{"basePairIndex":bp5,"type":"P","strand":2})
+            l = self.__topologySelection(**{"basePairIndex":bp5,"type":"S","strand":2})
 
             if len(i)==1 and len(j)==1 and len(k)==1 and len(l)==1:
                 i = i[0]
@@ -714,10 +751,10 @@ class MADna(modelBase):
             ########################################################################
 
             ##SPSB53
-            i = self._processSelection(**{"basePairIndex":bp5,"type":"S","strand":1})
-            j = self._processSelection(**{"basePairIndex":bp3,"type":"P","strand":1})
-            k = self._processSelection(**{"basePairIndex":bp3,"type":"S","strand":1})
-            l = self._processSelection(**{"basePairIndex":bp3,"type":"B","strand":1})
+            i = self.__topologySelection(**{"basePairIndex":bp5,"type":"S","strand":1})
+            j = self.__topologySelection(**{"basePairIndex":bp3,"type":"P","strand":1})
+            k = self.__topologySelection(**{"basePairIndex":bp3,"type":"S","strand":1})
+            l = self.__topologySelection(**{"basePairIndex":bp3,"type":"B","strand":1})
 
             if len(i)==1 and len(j)==1 and len(k)==1 and len(l)==1:
                 i = i[0]
@@ -729,10 +766,10 @@ class MADna(modelBase):
                 self.dihedrals.append({"i":i,"j":j,"k":k,"l":l,"type":dType})
 
             ##SPSB53
-            i = self._processSelection(**{"basePairIndex":bp3,"type":"S","strand":2})
-            j = self._processSelection(**{"basePairIndex":bp5,"type":"P","strand":2})
-            k = self._processSelection(**{"basePairIndex":bp5,"type":"S","strand":2})
-            l = self._processSelection(**{"basePairIndex":bp5,"type":"B","strand":2})
+            i = self.__topologySelection(**{"basePairIndex":bp3,"type":"S","strand":2})
+            j = self.__topologySelection(**{"basePairIndex":bp5,"type":"P","strand":2})
+            k = self.__topologySelection(**{"basePairIndex":bp5,"type":"S","strand":2})
+            l = self.__topologySelection(**{"basePairIndex":bp5,"type":"B","strand":2})
 
             if len(i)==1 and len(j)==1 and len(k)==1 and len(l)==1:
                 i = i[0]
@@ -746,10 +783,10 @@ class MADna(modelBase):
             ########################################################################
 
             ##SPSB35
-            i = self._processSelection(**{"basePairIndex":bp5,"type":"B","strand":1})
-            j = self._processSelection(**{"basePairIndex":bp5,"type":"S","strand":1})
-            k = self._processSelection(**{"basePairIndex":bp3,"type":"P","strand":1})
-            l = self._processSelection(**{"basePairIndex":bp3,"type":"S","strand":1})
+            i = self.__topologySelection(**{"basePairIndex":bp5,"type":"B","strand":1})
+            j = self.__topologySelection(**{"basePairIndex":bp5,"type":"S","strand":1})
+            k = self.__topologySelection(**{"basePairIndex":bp3,"type":"P","strand":1})
+            l = self.__topologySelection(**{"basePairIndex":bp3,"type":"S","strand":1})
 
             if len(i)==1 and len(j)==1 and len(k)==1 and len(l)==1:
                 i = i[0]
@@ -761,10 +798,10 @@ class MADna(modelBase):
                 self.dihedrals.append({"i":i,"j":j,"k":k,"l":l,"type":dType})
 
             ##SPSB35
-            i = self._processSelection(**{"basePairIndex":bp3,"type":"B","strand":2})
-            j = self._processSelection(**{"basePairIndex":bp3,"type":"S","strand":2})
-            k = self._processSelection(**{"basePairIndex":bp5,"type":"P","strand":2})
-            l = self._processSelection(**{"basePairIndex":bp5,"type":"S","strand":2})
+            i = self.__topologySelection(**{"basePairIndex":bp3,"type":"B","strand":2})
+            j = self.__topologySelection(**{"basePairIndex":bp3,"type":"S","strand":2})
+            k = self.__topologySelection(**{"basePairIndex":bp5,"type":"P","strand":2})
+            l = self.__topologySelection(**{"basePairIndex":bp5,"type":"S","strand":2})
 
             if len(i)==1 and len(j)==1 and len(k)==1 and len(l)==1:
                 i = i[0]
@@ -816,8 +853,8 @@ class MADna(modelBase):
         state  = {}
         state["labels"] = ["id","position"]
         state["data"]   = []
-        for i,pos in enumerate(self.coordinates):
-            state["data"].append([i,[pos[0],pos[1],pos[2]]])
+        for i,pos in enumerate(self.coordinates.tolist()):
+            state["data"].append([i,pos])
 
         struct = {}
         struct["labels"] = ["id","type","resId","chainId"]
@@ -915,8 +952,24 @@ class MADna(modelBase):
 
             phosphateIndex_basePair = []
             for bp in range(self.seqLen):
-                index = self._processSelection(**{"basePairIndex":bp+1,"type":"P"})
+                index = self.__topologySelection(**{"basePairIndex":bp+1,"type":"P"})
                 phosphateIndex_basePair+=[[i,bp+1] for i in index]
+            phosphateIndex_basePair = np.asarray(phosphateIndex_basePair,dtype=int).reshape(-1,2)
+
+            #Phosphates are sorted by base pair, so the partners of each phosphate (those
+            #after it closer than madnafast_n base pairs) are a contiguous band of the list.
+            #Pairs are generated in the same order as itertools.combinations
+            phosphateIndex = phosphateIndex_basePair[:,0]
+            phosphateBP    = phosphateIndex_basePair[:,1]
+
+            first = np.arange(len(phosphateBP))
+            last  = np.searchsorted(phosphateBP,phosphateBP+madnafast_n,side="left")
+            nPartners = np.maximum(last - first - 1,0)
+
+            ph1 = np.repeat(first,nPartners)
+            ph2 = ph1 + 1 + (np.arange(len(ph1)) - np.repeat(np.cumsum(nPartners)-nPartners,nPartners))
+
+            phosphatePairs = np.stack([phosphateIndex[ph1],phosphateIndex[ph2]],axis=1)
 
             forceField["BONDS_DH"] = {}
             forceField["BONDS_DH"]["type"]       = ["Bond2", "DebyeHuckel"]
@@ -926,9 +979,8 @@ class MADna(modelBase):
 
             chgProduct = self.model["TYPES"]["P"]["charge"]
             chgProduct = chgProduct*chgProduct
-            for ph1,ph2 in itertools.combinations(phosphateIndex_basePair,2):
-                if(abs(ph1[1]-ph2[1])<madnafast_n):
-                    forceField["BONDS_DH"]["data"].append([ph1[0],ph2[0],chgProduct,self.dielectricConstant,self.debyeLength,cutOff])
+            for i,j in phosphatePairs.tolist():
+                forceField["BONDS_DH"]["data"].append([i,j,chgProduct,self.dielectricConstant,self.debyeLength,cutOff])
 
         ##################### VARIANT END #####################
         #######################################################
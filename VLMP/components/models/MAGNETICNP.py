@@ -5,6 +5,8 @@ import numpy as np
 
 from icosphere import icosphere
 
+from ...utils.tables import columnarTable, categoricalColumn
+
 class MAGNETICNP(modelBase):
     """
     {"author": "P. Palacios-Alonso",
@@ -199,30 +201,22 @@ class MAGNETICNP(modelBase):
         types = self.getTypes()
         types.addType(name = partName)
 
-        state = {}
+        ids = np.arange(nParticles)
+
+        magnetization = np.zeros((nParticles,4))
+        magnetization[:,2] = 1.0
+        magnetization[:,3] = magneticMoment
+
+        labels  = ["id", "radius", "position", "direction", "magnetization"]
+        columns = [ids, hydrodynamicRadius, np.zeros((nParticles,3),dtype=int), directions, magnetization]
         if anisotropyMean is not None:
-            state["labels"] = ["id", "radius", "position", "direction", "magnetization", "anisotropy"]
-            state["data"]   = []
-            for i in range(nParticles):
-                state["data"].append([i,
-                                      hydrodynamicRadius[i],
-                                      [0,0,0], directions[i].tolist(),
-                                      [0,0,1,magneticMoment[i]],
-                                      anisotropy[i]])
-        else:
-            state["labels"] = ["id", "radius", "position", "direction", "magnetization"]
-            state["data"] = []
-            for i in range(nParticles):
-                state["data"].append([i,
-                                      hydrodynamicRadius[i],
-                                      [0,0,0], directions[i].tolist(),
-                                      [0,0,1,magneticMoment[i]]])
-        structure = {}
-        structure["labels"] = ["id","type"]
-        structure["data"] = []
-        for i in range(nParticles):
-            structure["data"].append([i,partName])
+            labels.append("anisotropy")
+            columns.append(anisotropy)
+
+        state = columnarTable(labels,columns)
 
+        structure = columnarTable(["id","type"],
+                                  [ids,categoricalColumn([partName],np.zeros(nParticles,dtype=int))])
 
         #Generate forceField
 
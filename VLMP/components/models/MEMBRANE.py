@@ -5,8 +5,11 @@ import copy
 import logging
 import random
 
+import numpy as np
+
 from . import modelBase
 from ...utils.input import getLabelIndex
+from ...utils.tables import columnarTable, categoricalColumn
 
 class MEMBRANE(modelBase):
     """
@@ -155,91 +158,73 @@ class MEMBRANE(modelBase):
         lipidZ["DPPC"][3] = lipidZ["DPPC"][2] + lipidsTypes["DPPC"]["bonds"]["T1_T2"]["r0"]
         lipidZ["DPPC"][4] = lipidZ["DPPC"][3] + lipidsTypes["DPPC"]["bonds"]["T2_T3"]["r0"]
 
-        #Generate state
-        state = {}
-        state["labels"] = ["id","position"]
-        state["data"]   = []
-
-        #Generate structure
-        structure = {}
-        structure["labels"] = ["id","type","modelId"]
-        structure["data"]   = []
-
-        forceField = {}
-        forceField["bond"] = {}
-        forceField["bond"]["type"]       = ["Bond2", "Harmonic"]
-        forceField["bond"]["labels"]     = ["id_i", "id_j", "K", "r0"]
-        forceField["bond"]["data"]       = []
-
-        forceField["angle"] = {}
-        forceField["angle"]["type"]       = ["Bond3", "HarmonicAngular"]
-        forceField["angle"]["labels"]     = ["id_i", "id_j", "id_k", "K", "theta0"]
-        forceField["angle"]["data"]       = []
-
-
-        index = 0
-        lipidId = 0
-        for i in range(int(nLipidsX)):
-            for j in range(int(nLipidsY)):
+        # The lattice is built in bulk. Lipids are ordered by x, y and leaflet (upper first),
+        # each lipid has the beads of lipidsBase, in that order
+        nX = int(nLipidsX)
+        nY = int(nLipidsY)
 
-                for leaflet in range(2):
+        nLipids = 2*nX*nY
+        nBeads  = len(lipidsBase)
 
-                    selectedLipid = random.choices(availableLipids,
-                                                   weights=lipidsPercentage)[0]
+        # All the lipid species are drawn at once
+        lipidSpecies = np.asarray(random.choices(range(len(availableLipids)),
+                                                 weights=lipidsPercentage,
+                                                 k=nLipids),dtype=int).reshape(-1)
 
-                    for k,t in enumerate(lipidsBase):
+        lipidI  = np.repeat(np.arange(nX),2*nY)
+        lipidJ  = np.tile(np.repeat(np.arange(nY),2),nX)
+        leaflet = np.tile([0,1],nX*nY)
 
-                        beadType = f"{selectedLipid}_{t}"
+        #Generate state
+        # The last tail particles is placed at z = sigmaT/2.0+zSpacing
+        templateZ = np.asarray([lipidZ[l] for l in availableLipids],dtype=float).reshape(-1,nBeads)
 
-                        # The last tail particles is placed at z = sigmaT/2.0+zSpacing
-                        x = i*dx + dx/2.0 - box[0]/2.0
-                        y = j*dy + dy/2.0 - box[1]/2.0
-                        if leaflet == 0: # Upper leaflet
-                            z =   lipidZ[selectedLipid][k]
-                        else: # Lower leaflet
-                            z = - lipidZ[selectedLipid][k]
+        positions = np.empty((nLipids,nBeads,3))
+        positions[:,:,0] = (lipidI*dx + dx/2.0 - box[0]/2.0)[:,np.newaxis]
+        positions[:,:,1] = (lipidJ*dy + dy/2.0 - box[1]/2.0)[:,np.newaxis]
+        positions[:,:,2] = np.where(leaflet == 0,1.0,-1.0)[:,np.newaxis]*templateZ[lipidSpecies] # Upper leaflet: z, lower leaflet: -z
 
-                        state["data"].append([index,[x,y,z]])
-                        structure["data"].append([index,beadType,lipidId])
+        ids = np.arange(nLipids*nBeads)
 
-                        index += 1
+        state = columnarTable(["id","position"],
+                              [ids,positions.reshape(-1,3)])
 
-                    H1 = index-1
-                    H2 = index-2
-                    T1 = index-3
-                    T2 = index-4
-                    T3 = index-5
+        #Generate structure
+        beadTypes = [f"{l}_{t}" for l in availableLipids for t in lipidsBase]
+        typeCodes = (lipidSpecies[:,np.newaxis]*nBeads + np.arange(nBeads)).reshape(-1)
 
-                    # Bonds
-                    kH1_H2 = lipidsTypes[selectedLipid]["bonds"]["H1_H2"]["K"]
-                    kH2_T1 = lipidsTypes[selectedLipid]["bonds"]["H2_T1"]["K"]
-                    kT1_T2 = lipidsTypes[selectedLipid]["bonds"]["T1_T2"]["K"]
-                    kT2_T3 = lipidsTypes[selectedLipid]["bonds"]["T2_T3"]["K"]
+        structure = columnarTable(["id","type","modelId"],
+                                  [ids,categoricalColumn(beadTypes,typeCodes),np.repeat(np.arange(nLipids),nBeads)])
 
-                    b0_H1_H2 = lipidsTypes[selectedLipid]["bonds"]["H1_H2"]["r0"]
-                    b0_H2_T1 = lipidsTypes[selectedLipid]["bonds"]["H2_T1"]["r0"]
-                    b0_T1_T2 = lipidsTypes[selectedLipid]["bonds"]["T1_T2"]["r0"]
-                    b0_T2_T3 = lipidsTypes[selectedLipid]["bonds"]["T2_T3"]["r0"]
+        #Generate bonds and angles, the per species templates are broadcasted to all the lipids
+        firstBead = np.arange(nLipids)*nBeads
 
-                    forceField["bond"]["data"].append([H1,H2,kH1_H2,b0_H1_H2])
-                    forceField["bond"]["data"].append([H2,T1,kH2_T1,b0_H2_T1])
-                    forceField["bond"]["data"].append([T1,T2,kT1_T2,b0_T1_T2])
-                    forceField["bond"]["data"].append([T2,T3,kT2_T3,b0_T2_T3])
+        bondNames  = ["H1_H2","H2_T1","T1_T2","T2_T3"]
+        angleNames = ["H1_H2_T1","H2_T1_T2","T1_T2_T3"]
 
-                    kH1_H2_T1 = lipidsTypes[selectedLipid]["angles"]["H1_H2_T1"]["K"]
-                    kH2_T1_T2 = lipidsTypes[selectedLipid]["angles"]["H2_T1_T2"]["K"]
-                    kT1_T2_T3 = lipidsTypes[selectedLipid]["angles"]["T1_T2_T3"]["K"]
+        def templateIds(names):
+            offsets = np.asarray([[lipidsBase.index(b) for b in name.split("_")] for name in names])
+            return (firstBead[:,np.newaxis,np.newaxis] + offsets[np.newaxis]).reshape(-1,offsets.shape[1])
 
-                    theta0_H1_H2_T1 = lipidsTypes[selectedLipid]["angles"]["H1_H2_T1"]["theta0"]
-                    theta0_H2_T1_T2 = lipidsTypes[selectedLipid]["angles"]["H2_T1_T2"]["theta0"]
-                    theta0_T1_T2_T3 = lipidsTypes[selectedLipid]["angles"]["T1_T2_T3"]["theta0"]
+        def templateValues(interaction,names,value):
+            values = np.asarray([[lipidsTypes[l][interaction][name][value] for name in names] for l in availableLipids])
+            return values[lipidSpecies].reshape(-1)
 
-                    # Angles
-                    forceField["angle"]["data"].append([H1,H2,T1,kH1_H2_T1,theta0_H1_H2_T1])
-                    forceField["angle"]["data"].append([H2,T1,T2,kH2_T1_T2,theta0_H2_T1_T2])
-                    forceField["angle"]["data"].append([T1,T2,T3,kT1_T2_T3,theta0_T1_T2_T3])
+        bonds  = templateIds(bondNames)
+        angles = templateIds(angleNames)
 
-                    lipidId += 1
+        forceField = {}
+        forceField["bond"] = columnarTable(["id_i", "id_j", "K", "r0"],
+                                           [bonds[:,0],bonds[:,1],
+                                            templateValues("bonds",bondNames,"K"),
+                                            templateValues("bonds",bondNames,"r0")],
+                                           type = ["Bond2", "Harmonic"])
+
+        forceField["angle"] = columnarTable(["id_i", "id_j", "id_k", "K", "theta0"],
+                                            [angles[:,0],angles[:,1],angles[:,2],
+                                             templateValues("angles",angleNames,"K"),
+                                             templateValues("angles",angleNames,"theta0")],
+                                            type = ["Bond3", "HarmonicAngular"])
 
         forceField["verletList"] = {}
         forceField["verletList"]["type"]       = ["VerletConditionalListSet", "intra_inter"]
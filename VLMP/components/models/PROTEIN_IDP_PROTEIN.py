@@ -13,6 +13,8 @@ from scipy.spatial import KDTree
 
 from ..types import basic
 
+from ...utils.exclusions import exclusionsFromData, exclusionsFromPairs
+
 from . import modelBase
 
 from . import IDP # intrinsic disorder protein model
@@ -76,7 +78,7 @@ class PROTEIN_IDP_PROTEIN(modelBase):
 
         return copy.deepcopy(protSim)
 
-    def __addConnection(self,forceField,ids_conn_start,ids_conn_end):
+    def __addConnection(self,forceField,nlExclusions,ids_conn_start,ids_conn_end):
 
         # 0-1 2-3
 
@@ -139,19 +141,9 @@ class PROTEIN_IDP_PROTEIN(modelBase):
             self.logger.error("No Bond4 IDP entry found in forcefield")
             raise RuntimeError("Entry not found")
 
-        nlIdIndex     = forceField["nl"]["labels"].index("id")
-        nlIdListIndex = forceField["nl"]["labels"].index("id_list")
+        pairs = [[k,j] for k in exclusions for j in exclusions[k]]
 
-        for k in exclusions:
-            found = False
-            for excl in forceField["nl"]["data"]:
-                if k == excl[nlIdIndex]:
-                    excl[nlIdListIndex].extend(exclusions[k])
-                    excl[nlIdListIndex] = list(set(excl[nlIdListIndex]))
-                    found = True
-                    break
-            if not found:
-                forceField["nl"]["data"].append([k,exclusions[k]])
+        return nlExclusions.merge(exclusionsFromPairs(pairs,symmetric=False))
 
     def __fixProteinPos(self,sim,IDPids,PDBids,modeIDP,modePDB,maxTries):
 
@@ -362,7 +354,10 @@ class PROTEIN_IDP_PROTEIN(modelBase):
                                           "typeGroup2":sorted(list(PRTN_types))}
 
         forceField["nl"]["labels"]     = labels
-        forceField["nl"]["data"]       = data
+        forceField["nl"]["data"]       = []
+
+        # Exclusions are handled in CSR format, they are converted to the "id","id_list" layout at the end
+        nlExclusions = exclusionsFromData(data)
 
         ############################################################
         # Add connections between IDP and PROT
@@ -383,7 +378,7 @@ class PROTEIN_IDP_PROTEIN(modelBase):
                 # PDB1_conn == "end"
                 ids     = [IDP_len+PDB1len-1,IDP_len+PDB1len]
 
-            self.__addConnection(forceField,ids,IDP_start)
+            nlExclusions = self.__addConnection(forceField,nlExclusions,ids,IDP_start)
             PDBids = [i for i in range(IDP_len, IDP_len+PDB1len+1)]
             self.__fixProteinPos(sim,IDPids,PDBids,"start",PDB1_conn,maxTries)
 
@@ -400,10 +395,12 @@ class PROTEIN_IDP_PROTEIN(modelBase):
                 # PDB2_conn == "end"
                 ids     = [PDB1offset+PDB2len,PDB1offset+PDB2len-1]
 
-            self.__addConnection(forceField,IDP_end,ids)
+            nlExclusions = self.__addConnection(forceField,nlExclusions,IDP_end,ids)
             PDBids = [i for i in range(PDB1offset, PDB1offset+PDB2len+1)]
             self.__fixProteinPos(sim,IDPids,PDBids,"end",PDB2_conn,maxTries)
 
+        forceField["nl"]["data"] = nlExclusions.getData()
+
         ############################################################
 
         self.setState(copy.deepcopy(sim["state"]))
@@ -6,6 +6,8 @@ import logging
 
 from ... import DEBUG_MODE
 from . import modelBase
+from ...utils.cache import getCoarseGrainedModel
+from ...utils.pdb   import getPDBResolver
 
 import pyGrained.models.SBCG as proteinModel
 
@@ -103,34 +105,34 @@ class SBCG(modelBase):
         #Check if PDB is a file or a PDB ID.
         #PDB is considered a file if it has a .pdb or .pqr extension.
         #If it is a file, it is loaded as a PDB file.
-        #If it is a PDB ID, PDB file is downloaded from the RCSB PDB database.
+        #If it is a PDB ID, PDB file is taken from the local PDB store or fetched (see pdbResolver).
 
-        if params["PDB"].split(".")[-1] in ["pdb","pqr"]:
-            inputPDBfilePath = params["PDB"]
-        else:
-            raise NotImplementedError("PDB ID download not implemented yet.")
+        inputPDBfilePath = getPDBResolver().resolve(params["PDB"])
 
         sbcgParams = {"SASA":params.get("SASA",True),
                       "centerInput":params.get("centerInput",True),
                       "aggregateChains":params.get("aggregateChains",True),
                       "parameters": copy.deepcopy(params)}
 
-        sbcg = proteinModel.SBCG(name = name,
-                                 inputPDBfilePath = inputPDBfilePath,
-                                 params = sbcgParams,
-                                 debug = DEBUG_MODE)
+        #The coarse grained model is only computed once for each protein and parameters (see getCoarseGrainedModel)
+        cgModel = getCoarseGrainedModel("SBCG",inputPDBfilePath,
+                                        {par:params[par] for par in self.availableParameters if par in params},
+                                        lambda: proteinModel.SBCG(name = name,
+                                                                  inputPDBfilePath = inputPDBfilePath,
+                                                                  params = sbcgParams,
+                                                                  debug = DEBUG_MODE))
 
         ########################################################
 
         types = self.getTypes()
-        modelTypes = sbcg.getTypes()
+        modelTypes = cgModel["types"]
 
         for _,t in modelTypes.items():
             types.addType(**t)
 
-        self.setState(sbcg.getState())
-        self.setStructure(sbcg.getStructure())
-        self.setForceField(sbcg.getForceField())
+        self.setState(cgModel["state"])
+        self.setStructure(cgModel["structure"])
+        self.setForceField(cgModel["forceField"])
 
 
     def processSelection(self,selectionType,selectionOptions):
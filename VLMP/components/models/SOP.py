@@ -5,6 +5,8 @@ import copy
 import logging
 
 from . import modelBase
+from ...utils.cache import getCoarseGrainedModel
+from ...utils.pdb   import getPDBResolver
 from ...utils.input import getLabelIndex
 
 import pyGrained.models.AlphaCarbon as proteinModel
@@ -101,34 +103,34 @@ class SOP(modelBase):
         #Check if PDB is a file or a PDB ID.
         #PDB is considered a file if it has a .pdb or .pqr extension.
         #If it is a file, it is loaded as a PDB file.
-        #If it is a PDB ID, PDB file is downloaded from the RCSB PDB database.
+        #If it is a PDB ID, PDB file is taken from the local PDB store or fetched (see pdbResolver).
 
-        if params["PDB"].split(".")[-1] in ["pdb","pqr"]:
-            inputPDBfilePath = params["PDB"]
-        else:
-            raise NotImplementedError("PDB ID download not implemented yet.")
+        inputPDBfilePath = getPDBResolver().resolve(params["PDB"])
 
         sopParams = {"SASA":params.get("SASA",False),
                      "centerInput":params.get("centerInput",True),
                      "aggregateChains":params.get("aggregateChains",True),
                      "parameters": copy.deepcopy(params)}
 
-        sop = proteinModel.SelfOrganizedPolymer(name = name,
-                                                inputPDBfilePath = inputPDBfilePath,
-                                                params = sopParams)
+        #The coarse grained model is only computed once for each protein and parameters (see getCoarseGrainedModel)
+        cgModel = getCoarseGrainedModel("SOP",inputPDBfilePath,
+                                        {par:params[par] for par in self.availableParameters if par in params},
+                                        lambda: proteinModel.SelfOrganizedPolymer(name = name,
+                                                                                  inputPDBfilePath = inputPDBfilePath,
+                                                                                  params = sopParams))
 
         ########################################################
 
         types = self.getTypes()
-        modelTypes = sop.getTypes()
+        modelTypes = cgModel["types"]
 
         for _,t in modelTypes.items():
             types.addType(**t)
 
         #Set model
-        self.setState(sop.getState())
-        self.setStructure(sop.getStructure())
-        self.setForceField(sop.getForceField())
+        self.setState(cgModel["state"])
+        self.setStructure(cgModel["structure"])
+        self.setForceField(cgModel["forceField"])
 
 
     def processSelection(self,selectionType,selectionOptions):
@@ -1,10 +1,12 @@
 from VLMP.components.models import modelBase
 
 import numpy as np
-from scipy.spatial import cKDTree
 
 from icosphere import icosphere
 
+from ...utils.geometry import randomSequentialAddition, getPairsWithinCutOff
+from ...utils.tables import columnarTable, categoricalColumn
+
 class SPHEREMULTIBLOB(modelBase):
     """
     {"author": "Pablo Ibáñez-Freire and Pablo Palacios-Alonso",
@@ -216,58 +218,33 @@ class SPHEREMULTIBLOB(modelBase):
 
         return pos, edgeLength
 
-    def __applyPBC(self, positions, box_size):
-        """
-        Create periodic images of the system.
-
-        Parameters:
-        positions (np.ndarray): Array of positions of shape (N, D) where N is the number of points and D is the dimensionality.
-        box_size (float): The size of the periodic box.
-
-        Returns:
-        np.ndarray: Array of replicated positions considering periodic boundary conditions.
-        """
-        shifts = np.array([-1, 0, 1])
-        offsets = np.array(np.meshgrid(shifts, shifts, shifts)).T.reshape(-1, 3)
-
-        replicated_positions = []
-        for offset in offsets:
-            replicated_positions.append(positions + offset * box_size)
+    def __bondsTemplate(self, pos, edgeLength):
+        # Bonds of a single sphere, pairs of particles closer than 1.75*edgeLength
+        return getPairsWithinCutOff(pos[:self.sphN],1.75*edgeLength)
 
-        return np.vstack(replicated_positions)
-
-    def __computeNewPosition(self, sphPositions,X,Y,Z, radius,
+    def __computeNewPosition(self, spheresAdder,X,Y,Z, radius,
                              heightMean, heightStd, heightReference,
                              ntries):
 
-        newPosition = []
-        count = 0
-        while count<ntries:
-            if heightStd > 0.0:
-                height = np.random.normal(heightMean,heightStd)
-            else:
-                height = heightMean
-            height += heightReference
-            if height > Z - radius or height < -Z + radius:
-                continue
-
-            x = np.random.uniform(-X,X)
-            y = np.random.uniform(-Y,Y)
-            center = [x,y,height]
-
-            if len(sphPositions)>0:
-                sphPositionsPBC = self.__applyPBC(sphPositions, 2*X)
-                tree = cKDTree(sphPositionsPBC)
-                minDst, minDstIndex = tree.query(center, k=1)
-            else:
-                minDst = np.inf
+        def randomCenter():
+            while True:
+                if heightStd > 0.0:
+                    height = np.random.normal(heightMean,heightStd)
+                else:
+                    height = heightMean
+                height += heightReference
+                if height > Z - radius or height < -Z + radius:
+                    continue
 
-            if minDst > 2.0*radius*1.05:
-                newPosition = center
-                break
-            count+=1
+                x = np.random.uniform(-X,X)
+                y = np.random.uniform(-Y,Y)
+                return np.asarray([x,y,height])
 
-        return newPosition
+        newPosition,_ = spheresAdder.tryAdd(randomCenter,[radius],nMaxTries=ntries)
+
+        if newPosition is None:
+            return []
+        return newPosition.tolist()
 
 
     def __init__(self,name,**params):
@@ -324,11 +301,16 @@ class SPHEREMULTIBLOB(modelBase):
 
         ############################################################
 
+        #Spheres are periodic in x and y, the distance between centers has to be larger than 2.0*radius*1.05
+        spheresAdder = randomSequentialAddition(box,radiusOfSphere,
+                                                radiusFactor=1.05,
+                                                periodic=[True,True,False])
+
         sphPositions = []
         i            = 0
         tries        = 0
         while i < numberOfSpheres:
-            newPosition = self.__computeNewPosition(sphPositions,X,Y,Z, radiusOfSphere,
+            newPosition = self.__computeNewPosition(spheresAdder,X,Y,Z, radiusOfSphere,
                                                     heightMean, heightStd, heightReference,
                                                     self.maxTries*100*(i+1))
 
@@ -336,6 +318,7 @@ class SPHEREMULTIBLOB(modelBase):
                 sphPositions.append(newPosition)
                 i+=1
             else:
+                spheresAdder.clear()
                 sphPositions = []
                 i            = 0
                 tries       += 1
@@ -344,26 +327,20 @@ class SPHEREMULTIBLOB(modelBase):
             print("Unable to find a correct configuration adshfdsoafjidosajfidoajfidosj")
             raise ValueError("The number of spheres is too high for the box size")
 
-        # Generate spheres
+        # Generate spheres. All the spheres share the same geometry, the positions
+        # and bonds of a single sphere are computed once and replicated with the ids offsets
+
+        sphPos, edgeLength = self.__sphere(radiusOfSphere)
+
+        nSphere = len(sphPos) #Particles per sphere
+        nTotal  = numberOfSpheres*nSphere
 
-        state = {}
-        state["labels"]=["id","position"]
-        state["data"]  =[]
+        positions = (sphPos[np.newaxis,:,:] + np.asarray(sphPositions,dtype=float).reshape(-1,1,3)).reshape(-1,3)
 
-        idCounter = 0
-        sph2ids = []
-        sph2pos = []
-        for center in sphPositions:
-            pos, edgeLength = self.__sphere(radiusOfSphere)
-            pos += center
-            ids = []
-            for p in pos:
-                state["data"].append([idCounter,list(p)])
-                ids.append(idCounter)
-                idCounter += 1
-            sph2ids.append(ids.copy())
-            sph2pos.append(pos.copy())
+        ids       = np.arange(nTotal)
+        sphOffset = np.arange(numberOfSpheres)*nSphere
 
+        state = columnarTable(["id","position"],[ids,positions])
 
         particleMass   = params.get("particleMass",1.0)
         particleRadius = params["particleRadius"]
@@ -377,61 +354,52 @@ class SPHEREMULTIBLOB(modelBase):
                       radius = particleRadius,
                       charge = particleCharge)
 
+        structure = columnarTable(["id", "type", "modelId"],
+                                  [ids,categoricalColumn([particleName],np.zeros(nTotal,dtype=int)),np.repeat(np.arange(numberOfSpheres),nSphere)])
 
-        structure = {}
-        structure["labels"] = ["id", "type", "modelId"]
-        structure["data"]   = []
-
-        for i in range(numberOfSpheres):
-            for j in sph2ids[i]:
-                structure["data"].append([j,particleName,i])
+        bondsPairs, bondsR0 = self.__bondsTemplate(sphPos, edgeLength)
+        nBonds = numberOfSpheres*len(bondsPairs)
 
         forceField = {}
-        forceField["BondPair"] = {}
-        forceField["BondPair"]["parameters"] = {}
-        forceField["BondPair"]["type"] = ["Bond2", "Harmonic"]
-        forceField["BondPair"]["labels"] = ["id_i", "id_j", "K", "r0"]
-        forceField["BondPair"]["data"] = []
-
-        bonds = []
-        for i in range(numberOfSpheres):
-            for n in range(self.sphN):
-                for m in range(n + 1, self.sphN):
-                    pn = sph2pos[i][n]
-                    pm = sph2pos[i][m]
-
-                    dst = np.linalg.norm(pn - pm)
-
-                    if dst < 1.75 * edgeLength:
-                        bonds.append([sph2ids[i][n], sph2ids[i][m], K, dst])
-
-        for i,j,k,r0 in bonds:
-            forceField["BondPair"]["data"].append([i,j,k,r0])
-
-        forceField["BondTether"] = {}
-        forceField["BondTether"]["parameters"] = {}
-        forceField["BondTether"]["type"]   = ["Bond1", "FixedHarmonic"]
-        forceField["BondTether"]["labels"] = ["id_i", "K", "r0", "position"]
-        forceField["BondTether"]["data"]   = []
+        forceField["BondPair"] = columnarTable(["id_i", "id_j", "K", "r0"],
+                                               [(sphOffset[:,np.newaxis] + bondsPairs[np.newaxis,:,0]).reshape(-1),
+                                                (sphOffset[:,np.newaxis] + bondsPairs[np.newaxis,:,1]).reshape(-1),
+                                                np.full(nBonds,K),
+                                                np.tile(bondsR0,numberOfSpheres)],
+                                               parameters = {},
+                                               type       = ["Bond2", "Harmonic"])
+
         ############################################################
-        print(Ktethers)
+
+        tethersIds       = np.zeros(0,dtype=int)
+        tethersLength    = np.zeros(0)
+        tethersPositions = np.zeros((0,3))
         if Ktethers > 0:
-            bondsTethers = []
-            for i in range(numberOfSpheres):
-                for n in range(self.sphN):
-                    pn = sph2pos[i][n]
-                    height = pn[2]-heightReference
-                    if height > heightTethersThreshold:
-                        tetherLength = height/np.sin(thetaTethers)
-                        for j in range(tethersPerBlob):
-                            phi     = 2*np.pi*j/tethersPerBlob
-                            xtether = pn[0] + tetherLength * np.cos(phi) * np.sin(thetaTethers)
-                            ytether = pn[1] + tetherLength * np.sin(phi) * np.sin(thetaTethers)
-                            posTether = [xtether, ytether, -Z]
-                            bondsTethers.append([sph2ids[i][n], Ktethers, tetherLength, posTether])
-
-            for i,k,r0,p in bondsTethers:
-                forceField["BondTether"]["data"].append([i,k,r0, p])
+            # Each particle (of the sphere surface) higher than the threshold is tethered to
+            # tethersPerBlob points of the bottom of the box, distributed around it
+            sphIds = (sphOffset[:,np.newaxis] + np.arange(self.sphN)[np.newaxis,:]).reshape(-1)
+            pn     = positions[sphIds]
+
+            tethered = (pn[:,2]-heightReference) > heightTethersThreshold
+            sphIds   = sphIds[tethered]
+            pn       = pn[tethered]
+
+            sinTheta     = np.sin(thetaTethers)
+            tetherLength = (pn[:,2]-heightReference)/sinTheta
+
+            cosPhi = np.asarray([np.cos(2*np.pi*j/tethersPerBlob) for j in range(tethersPerBlob)])
+            sinPhi = np.asarray([np.sin(2*np.pi*j/tethersPerBlob) for j in range(tethersPerBlob)])
+
+            tethersIds       = np.repeat(sphIds,tethersPerBlob)
+            tethersLength    = np.repeat(tetherLength,tethersPerBlob)
+            tethersPositions = np.full((len(tethersIds),3),-Z)
+            tethersPositions[:,0] = (pn[:,0,np.newaxis] + tetherLength[:,np.newaxis] * cosPhi[np.newaxis,:] * sinTheta).reshape(-1)
+            tethersPositions[:,1] = (pn[:,1,np.newaxis] + tetherLength[:,np.newaxis] * sinPhi[np.newaxis,:] * sinTheta).reshape(-1)
+
+        forceField["BondTether"] = columnarTable(["id_i", "K", "r0", "position"],
+                                                 [tethersIds,np.full(len(tethersIds),Ktethers),tethersLength,tethersPositions],
+                                                 parameters = {},
+                                                 type       = ["Bond1", "FixedHarmonic"])
 
         self.setState(state)
         self.setStructure(structure)
@@ -5,6 +5,7 @@ import logging
 import numpy as np
 
 from VLMP.components.models import modelBase
+from ...utils.tables import columnarTable, categoricalColumn
 
 class STERIC_LAMBDA_SOLVATION(modelBase):
     """
@@ -160,21 +161,15 @@ class STERIC_LAMBDA_SOLVATION(modelBase):
                       radius = particleRadius,
                       charge = particleCharge)
 
-        state = {}
-        state["labels"] = ["id","position"]
-        state["data"]   = []
-        for i in range(N):
-            self.logger.debug(f"Adding particle {i+1}/{N} ...")
-            x = np.random.uniform(xMin,xMax)
-            y = np.random.uniform(yMin,yMax)
-            z = np.random.uniform(zMin,zMax)
-            state["data"].append([i,[x,y,z]])
-
-        structure = {}
-        structure["labels"] = ["id","type"]
-        structure["data"]   = []
-        for i in range(N):
-            structure["data"].append([i,particleName])
+        # Positions are drawn at once, in the same order (x,y,z for each particle) as one particle at a time
+        positions = np.random.uniform([xMin,yMin,zMin],[xMax,yMax,zMax],size=(N,3))
+
+        ids = np.arange(N)
+
+        state = columnarTable(["id","position"],[ids,positions])
+
+        structure = columnarTable(["id","type"],
+                                  [ids,categoricalColumn([particleName],np.zeros(N,dtype=int))])
 
         ############################################################
 
@@ -6,6 +6,8 @@ from . import modelBase
 
 import numpy as np
 
+from ...utils.tables import columnarTable, categoricalColumn
+
 class WLC(modelBase):
     """
     {"author": "Pablo Ibáñez-Freire",
@@ -105,39 +107,34 @@ class WLC(modelBase):
         types.addType(name=typeName,mass=mass,radius=radius)
 
         #Generate positions, a line along the z axis
-        state = {}
-        state["labels"] = ["id","position"]
-        state["data"]   = []
-        for i in range(self.N):
-            state["data"].append([i, [0.0,0.0,i*b-0.5*(self.N-1)*b]])
+        ids = np.arange(self.N)
+
+        positions = np.zeros((self.N,3))
+        positions[:,2] = ids*b-0.5*(self.N-1)*b
+
+        state = columnarTable(["id","position"],[ids,positions])
 
         #Generate structure
-        structure = {}
-        structure["labels"] = ["id","type"]
-        structure["data"]   = []
-        for i in range(self.N):
-            structure["data"].append([i,typeName])
+        structure = columnarTable(["id","type"],
+                                  [ids,categoricalColumn([typeName],np.zeros(self.N,dtype=int))])
 
         #Generate forceField
         forceField = {}
 
-        forceField["bonds_wlc"] = {}
-        forceField["bonds_wlc"]["type"]       = ["Bond2","Harmonic"]
-        forceField["bonds_wlc"]["parameters"] = {}
-        forceField["bonds_wlc"]["labels"]     = ["id_i","id_j","K","r0"]
-        forceField["bonds_wlc"]["data"]       = []
-
-        for i in range(self.N-1):
-            forceField["bonds_wlc"]["data"].append([i,i+1,Kb,b])
+        nBonds  = max(self.N-1,0)
+        nAngles = max(self.N-2,0)
 
-        forceField["angles_wlc"] = {}
-        forceField["angles_wlc"]["type"]       = ["Bond3","KratkyPorod"]
-        forceField["angles_wlc"]["parameters"] = {}
-        forceField["angles_wlc"]["labels"]     = ["id_i","id_j","id_k","K"]
-        forceField["angles_wlc"]["data"]       = []
+        forceField["bonds_wlc"] = columnarTable(["id_i","id_j","K","r0"],
+                                                [ids[:nBonds],ids[:nBonds]+1,
+                                                 np.full(nBonds,Kb),np.full(nBonds,b)],
+                                                type       = ["Bond2","Harmonic"],
+                                                parameters = {})
 
-        for i in range(self.N-2):
-            forceField["angles_wlc"]["data"].append([i,i+1,i+2,Ka])
+        forceField["angles_wlc"] = columnarTable(["id_i","id_j","id_k","K"],
+                                                 [ids[:nAngles],ids[:nAngles]+1,ids[:nAngles]+2,
+                                                  np.full(nAngles,Ka)],
+                                                 type       = ["Bond3","KratkyPorod"],
+                                                 parameters = {})
 
         ########################################################
 
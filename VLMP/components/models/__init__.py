@@ -6,9 +6,11 @@ import logging
 ################ MODEL INTERFACE ################
 
 import abc
+import numpy as np
 from pyUAMMD import simulation
 
-from ...utils.input import getLabelIndex
+from ...utils.tables import getTableLength, getTableColumn, tableToDict, copyTable
+from ...utils.merge  import wrapSimulation
 
 class modelBase(metaclass=abc.ABCMeta):
 
@@ -63,6 +65,11 @@ class modelBase(metaclass=abc.ABCMeta):
         self._structure  = None
         self._forceField = None
 
+        #Lazily built indexes, reset when state or structure are set
+        self._localIds         = None
+        self._sortedLocalIds   = None
+        self._structureIndexes = {}
+
     ########################################################
 
     def getName(self):
@@ -84,12 +91,20 @@ class modelBase(metaclass=abc.ABCMeta):
 
     ########################################################
 
+    # State, structure and force field entries can be given in the pyUAMMD layout
+    # ({"labels":[...],"data":[...]}) or as columnar tables (see VLMP.utils.tables)
+
     def setState(self,state):
         self._state = state
 
+        self._localIds       = None
+        self._sortedLocalIds = None
+
     def setStructure(self,structure):
         self._structure = structure
 
+        self._structureIndexes = {}
+
     def setForceField(self,forceField):
         self._forceField = forceField
 
@@ -116,16 +131,77 @@ class modelBase(metaclass=abc.ABCMeta):
     def getNumberOfParticles(self):
         if self._state is None:
             return 0
-        return len(self.getState()["data"])
+        return getTableLength(self.getState())
+
+    def __buildLocalIds(self):
+        if self._localIds is None:
+            self._localIds       = getTableColumn(self.getState(),"id").tolist()
+            self._sortedLocalIds = np.sort(np.asarray(self._localIds,dtype=int))
 
     def getLocalIds(self):
         if self._state is None:
             return []
-        ids = []
-        idIndex = getLabelIndex("id",self.getState()["labels"])
-        for entry in self.getState()["data"]:
-            ids.append(entry[idIndex])
-        return ids
+        self.__buildLocalIds()
+        return self._localIds.copy()
+
+    def hasLocalIds(self,ids):
+        """ Check if all the given ids are local ids of the model """
+        if len(ids) == 0:
+            return True
+        if self._state is None:
+            return False
+        self.__buildLocalIds()
+
+        ids = np.asarray(ids,dtype=int)
+        pos = np.searchsorted(self._sortedLocalIds,ids).clip(0,len(self._sortedLocalIds)-1)
+        return bool(np.all(self._sortedLocalIds[pos] == ids))
+
+    def getStructureIndex(self,structureName):
+        """ Inverted index of the structure entry structureName.
+        Maps each value to the (sorted) list of the structure rows with that value """
+        if structureName not in self._structureIndexes:
+            column = getTableColumn(self.getStructure(),structureName).tolist()
+
+            index = {}
+            for row,value in enumerate(column):
+                index.setdefault(value,[]).append(row)
+            self._structureIndexes[structureName] = index
+
+        return self._structureIndexes[structureName]
+
+    def clone(self,units,types,ensemble):
+        """
+        Copy of the model, which uses the given units, types and ensemble. State, structure and force field
+        are copied (columnar tables are copied on write), the rest of the attributes are deep copied.
+        """
+
+        model = self.__class__.__new__(self.__class__)
+
+        #Copies of the shared objects, references to them (in any attribute) are replaced by their copies
+        memo = {id(self._units):units,
+                id(self._types):types,
+                id(self._ensemble):ensemble,
+                id(self.logger):self.logger}
+
+        if self._state is not None:
+            memo[id(self._state)] = copyTable(self._state)
+        if self._structure is not None:
+            memo[id(self._structure)] = copyTable(self._structure)
+        if self._forceField is not None:
+            forceField = {}
+            for entryName,entry in self._forceField.items():
+                forceField[entryName] = memo[id(entry)] = copyTable(entry)
+            memo[id(self._forceField)] = forceField
+
+        model.__dict__.update(copy.deepcopy(self.__dict__,memo))
+
+        model._idOffset = None
+
+        model._localIds         = None
+        model._sortedLocalIds   = None
+        model._structureIndexes = {}
+
+        return model
 
     def setIdOffset(self,offset):
         self._idOffset = offset
@@ -144,22 +220,27 @@ class modelBase(metaclass=abc.ABCMeta):
 
     ########################################################
 
-    def getSimulation(self,DEBUG_MODE = False):
+    def getSimulation(self,DEBUG_MODE = False,handOver = False):
 
-        # Create simulation
+        # Create simulation. Tables are copied (and columnar tables materialized)
+        # to the pyUAMMD layout, so the simulation does not share data with the model.
+        # If handOver is True tables are not copied, the model hands them over to the simulation
+        # and it must not be used afterwards
 
         sim = {}
 
         if self._state is not None:
-            sim["state"]  = self.getState()
+            sim["state"]  = tableToDict(self.getState(),handOver)
 
         sim["topology"] = {}
         if self._structure is not None:
-            sim["topology"]["structure"]  = self.getStructure()
+            sim["topology"]["structure"]  = tableToDict(self.getStructure(),handOver)
         if self._forceField is not None:
-            sim["topology"]["forceField"] = self.getForceField()
+            sim["topology"]["forceField"] = {entryName:tableToDict(entry,handOver) for entryName,entry in self.getForceField().items()}
 
-        return simulation(copy.deepcopy(sim),DEBUG_MODE)
+        if handOver:
+            return wrapSimulation(sim,DEBUG_MODE)
+        return simulation(sim,DEBUG_MODE)
 
     @classmethod
     def __subclasshook__(cls, subclass):
@@ -7,6 +7,8 @@ import logging
 
 from pyUAMMD import simulation
 
+from ...utils.merge import wrapSimulation
+
 from .. import idsHandler
 
 from ...utils.selections import processSelections
@@ -182,7 +184,7 @@ class simulationStepBase(idsHandler):
 
     ########################################################
 
-    def getSimulation(self,DEBUG_MODE = False):
+    def getSimulation(self,DEBUG_MODE = False,handOver = False):
 
         simulationStep = {"simulationStep":self.getSimulationStep()}
 
@@ -191,6 +193,8 @@ class simulationStepBase(idsHandler):
                 simulationStep["simulationStep"][sim]["parameters"]["group"] = self.getName()
             simulationStep["simulationStep"]["group"+self.getName()] = self._group
 
+        if handOver:
+            return wrapSimulation(simulationStep,DEBUG_MODE)
         return simulation(copy.deepcopy(simulationStep),DEBUG_MODE)
 
 ############### IMPORT ALL SIMULATION STEPS ###############
@@ -7,6 +7,8 @@ import logging
 
 from pyUAMMD import simulation
 
+from ...utils.merge import wrapSimulation
+
 class systemBase:
 
     def __init__(self,
@@ -68,7 +70,9 @@ class systemBase:
 
     ########################################################
 
-    def getSimulation(self,DEBUG_MODE = False):
+    def getSimulation(self,DEBUG_MODE = False,handOver = False):
+        if handOver:
+            return wrapSimulation({"system":self.getSystem()},DEBUG_MODE)
         return simulation({"system":copy.deepcopy(self.getSystem())},DEBUG_MODE)
 
 ############### IMPORT ALL SYSTEMS ###############
@@ -7,6 +7,8 @@ import logging
 
 from pyUAMMD import simulation
 
+from ...utils.merge import wrapSimulation
+
 class typesBase:
 
     def __init__(self,
@@ -83,6 +85,12 @@ class typesBase:
 
         return copy.deepcopy(types)
 
+    def getDeclaredTypes(self):
+        """ List of the declared types (in declaration order), each one as a dictionary of components """
+        if self._typesDecl is None:
+            return []
+        return copy.deepcopy(self._typesDecl)
+
     def setTypesName(self, typesUAMMD):
         self._typesUAMMD = typesUAMMD
 
@@ -149,7 +157,7 @@ class typesBase:
 
     ########################################################
 
-    def getSimulation(self,DEBUG_MODE = False):
+    def getSimulation(self,DEBUG_MODE = False,handOver = False):
 
         labels = [comp for comp in self.getTypesComponents().keys()]
 
@@ -162,6 +170,11 @@ class typesBase:
             for types in self._typesDecl:
                 data.append([types[comp] for comp in labels])
 
+        if handOver:
+            return wrapSimulation({"global":{"types":{
+                                         "type":["Types",self.getTypesName()],
+                                         "labels":labels,
+                                         "data":data}}},DEBUG_MODE)
         return simulation({"global":{"types":{
                                      "type":["Types",self.getTypesName()],
                                      "labels":copy.deepcopy(labels),
@@ -7,6 +7,8 @@ import logging
 
 from pyUAMMD import simulation
 
+from ...utils.merge import wrapSimulation
+
 class unitsBase:
 
     def __init__(self,
@@ -86,7 +88,9 @@ class unitsBase:
 
     ########################################################
 
-    def getSimulation(self,DEBUG_MODE = False):
+    def getSimulation(self,DEBUG_MODE = False,handOver = False):
+        if handOver:
+            return wrapSimulation({"global":{"units":{"type":["Units",self.getUnitsName()]}}},DEBUG_MODE)
         return simulation({"global":{"units":{"type":["Units",self.getUnitsName()]}}},DEBUG_MODE)
 
 ############### IMPORT ALL UNITS ###############
@@ -0,0 +1,372 @@
+import os
+import glob
+
+import logging
+
+import json
+import zlib
+import pickle
+import hashlib
+
+import contextlib
+import random
+
+from collections import OrderedDict
+
+import numpy as np
+
+from pyUAMMD import simulation
+
+def hashObject(obj):
+    """
+    Stable hash of a JSON-like object. Dictionaries are hashed with sorted keys,
+    so two objects with the same content have the same hash.
+    """
+
+    def normalize(o):
+        if hasattr(o,"tolist"):
+            return o.tolist()
+        return str(o)
+
+    objStr = json.dumps(obj,sort_keys=True,default=normalize)
+    return hashlib.sha256(objStr.encode("utf-8")).hexdigest()
+
+def getPackageVersion(pkg):
+    """ Installed version of the package pkg, "none" if it is not installed """
+
+    try:
+        import importlib.metadata as metadata
+    except ImportError:
+        #Python < 3.8
+        import pkg_resources
+        try:
+            return pkg_resources.get_distribution(pkg).version
+        except pkg_resources.DistributionNotFound:
+            return "none"
+
+    try:
+        return metadata.version(pkg)
+    except metadata.PackageNotFoundError:
+        return "none"
+
+def hashSources(folders,packages=[]):
+    """
+    Hash the content of all the source (.py) and data (.json) files found in folders,
+    together with the version of the given packages.
+    """
+
+    sha = hashlib.sha256()
+
+    for folder in folders:
+        if folder is None or not os.path.isdir(folder):
+            continue
+        files  = glob.glob(os.path.join(folder,"**","*.py"),recursive=True)
+        files += glob.glob(os.path.join(folder,"**","*.json"),recursive=True)
+        for f in sorted(files):
+            sha.update(os.path.relpath(f,folder).encode("utf-8"))
+            with open(f,"rb") as fl:
+                sha.update(fl.read())
+
+    for pkg in packages:
+        sha.update(f"{pkg}={getPackageVersion(pkg)}".encode("utf-8"))
+
+    return sha.hexdigest()
+
+def atomicWrite(filePath,data):
+    """
+    Write bytes to filePath. Data is written to a temporary file which is then renamed,
+    so readers (or concurrent writers) never see a partially written file.
+    """
+
+    folder = os.path.dirname(filePath)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder,exist_ok=True)
+
+    tmpPath = f"{filePath}.{os.getpid()}.tmp"
+    with open(tmpPath,"wb") as f:
+        f.write(data)
+    os.replace(tmpPath,filePath)
+
+def getCacheFolder(*subFolders):
+    """
+    User level cache folder for VLMP. It is taken from the VLMP_CACHE_DIR environment variable,
+    if defined, or from $XDG_CACHE_HOME/VLMP (~/.cache/VLMP by default). The folder is created if needed.
+    """
+
+    folder = os.environ.get("VLMP_CACHE_DIR",None)
+    if folder is None:
+        xdgCache = os.environ.get("XDG_CACHE_HOME",os.path.join(os.path.expanduser("~"),".cache"))
+        folder = os.path.join(xdgCache,"VLMP")
+
+    folder = os.path.join(folder,*subFolders)
+    os.makedirs(folder,exist_ok=True)
+
+    return folder
+
+@contextlib.contextmanager
+def fileLock(lockPath):
+    """
+    Exclusive inter-process lock based on fcntl. On platforms without fcntl
+    the lock is a no-op, writes are still atomic (see atomicWrite).
+    """
+
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+
+    with open(lockPath,"a") as f:
+        fcntl.flock(f,fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f,fcntl.LOCK_UN)
+
+class simulationCache:
+    """
+    Content-addressed on-disk cache of built simulations.
+    Each entry is keyed by the hash of the simulation info (which includes the seed),
+    the content of the files it refers to (PDB files, model files, ...) and the version of the sources used to build it.
+    Only simulations with a seed component are cached, the others are built with different random numbers in each run.
+    """
+
+    def __init__(self,cacheFolder,sourcesFolders,sourcesPackages=["pyUAMMD","pyGrained"]):
+
+        self.logger = logging.getLogger("VLMP")
+
+        self.cacheFolder = cacheFolder
+        if not os.path.isdir(self.cacheFolder):
+            self.logger.info(f"[SimulationCache] Creating cache folder \"{self.cacheFolder}\"")
+            os.makedirs(self.cacheFolder,exist_ok=True)
+
+        self.sourcesVersion = hashSources(sourcesFolders,sourcesPackages)
+
+        self.logger.debug(f"[SimulationCache] Using cache folder \"{self.cacheFolder}\", sources version {self.sourcesVersion}")
+
+    def __getPath(self,key):
+        return os.path.join(self.cacheFolder,key[:2],key+".pkl")
+
+    def __getInputFilesHashes(self,simulationInfo):
+
+        from ..pdb import getPDBResolver
+
+        #Files referred by the simulation info: any string which is the path of an existing file.
+        #(PDB IDs are not included, the files of the local PDB store are not modified)
+        def getFiles(obj):
+            if isinstance(obj,dict):
+                for v in obj.values():
+                    yield from getFiles(v)
+            elif isinstance(obj,list):
+                for v in obj:
+                    yield from getFiles(v)
+            elif isinstance(obj,str) and os.path.isfile(obj):
+                yield obj
+
+        return {f:getPDBResolver().getHash(f) for f in sorted(set(getFiles(simulationInfo)))}
+
+    def isCacheable(self,simulationInfo):
+        seedComponents = [component for component in simulationInfo.get("system",[]) if component["type"] == "seed"]
+        return len(seedComponents) > 0
+
+    def getKey(self,simulationInfo):
+        return hashObject({"simulationInfo":simulationInfo,
+                           "inputFiles":self.__getInputFilesHashes(simulationInfo),
+                           "sourcesVersion":self.sourcesVersion})
+
+    def load(self,key,DEBUG_MODE = False):
+
+        path = self.__getPath(key)
+        if not os.path.isfile(path):
+            return None
+
+        try:
+            with open(path,"rb") as f:
+                sim = pickle.load(f)
+        except Exception as e:
+            self.logger.warning(f"[SimulationCache] Error reading cache entry \"{path}\" ({e}), it will be rebuilt")
+            return None
+
+        return simulation(sim,DEBUG_MODE)
+
+    def store(self,key,sim):
+        atomicWrite(self.__getPath(key),pickle.dumps(sim.sim,protocol=pickle.HIGHEST_PROTOCOL))
+
+# Coarse grained proteins (pyGrained). Increase the version if the stored data changes
+_coarseGrainedCacheVersion = 2
+# Entries used by the current process (pickled), the least recently used are dropped
+_coarseGrainedModels        = OrderedDict()
+_coarseGrainedModelsMaxSize = 16
+
+def _storeCoarseGrainedModel(key,cgModelPickle):
+    _coarseGrainedModels[key] = cgModelPickle
+    _coarseGrainedModels.move_to_end(key)
+    while len(_coarseGrainedModels) > _coarseGrainedModelsMaxSize:
+        _coarseGrainedModels.popitem(last=False)
+
+def _loadCoarseGrainedModel(cachePath):
+
+    logger = logging.getLogger("VLMP")
+
+    if not os.path.isfile(cachePath):
+        return None
+
+    try:
+        with open(cachePath,"rb") as f:
+            return zlib.decompress(f.read())
+    except Exception as e:
+        logger.warning(f"[CoarseGrainedCache] Error reading cache entry \"{cachePath}\" ({e}), it will be rebuilt")
+        return None
+
+def getCoarseGrainedModel(modelType,inputPDBfilePath,params,build):
+    """
+    Coarse grained representation of a protein: {"types","state","structure","forceField"}.
+    build() is called to create the pyGrained model if it is not found in the user cache folder
+    (see getCacheFolder). Entries are keyed by the content of the PDB file, the model type, the model
+    parameters (except the PDB path) and the pyGrained version. Entries are compressed pickles,
+    written atomically under a file lock, so concurrent builds of the same protein coarse grain it once.
+    The entries used by the process are also kept in memory, each call returns a new copy.
+    build() is called with its own random seed, the global random generators are not modified.
+    """
+
+    from ..pdb import getPDBResolver
+
+    logger = logging.getLogger("VLMP")
+
+    parameters = {k:v for k,v in params.items() if k != "PDB"}
+
+    def generate():
+        #Some models (for example SBCG) use random numbers. The model is built with the random generators
+        #seeded from the model type and parameters and their state is restored afterwards. So the build does
+        #not depend on the simulation seed and the random numbers used by the rest of the simulation do not
+        #depend on whether the model is found in the cache.
+        randomState = _getRandomState()
+        buildSeed   = int(hashObject({"modelType":modelType,"parameters":parameters})[:8],16)
+        random.seed(buildSeed)
+        np.random.seed(buildSeed)
+        try:
+            model = build()
+        finally:
+            _setRandomState(randomState)
+
+        return pickle.dumps({"types":model.getTypes(),
+                             "state":model.getState(),
+                             "structure":model.getStructure(),
+                             "forceField":model.getForceField()},protocol=pickle.HIGHEST_PROTOCOL)
+
+    try:
+        key = hashObject({"modelType":modelType,
+                          "PDB":getPDBResolver().getHash(inputPDBfilePath),
+                          "parameters":parameters,
+                          "pyGrained":getPackageVersion("pyGrained")})
+
+        folder    = getCacheFolder("coarseGrained",modelType)
+        cachePath = os.path.join(folder,f"{modelType}_v{_coarseGrainedCacheVersion}_{key}.pkl.z")
+    except Exception as e:
+        logger.warning(f"[CoarseGrainedCache] Cache not available ({e}), {modelType} model will not be cached")
+        return pickle.loads(generate())
+
+    if key in _coarseGrainedModels:
+        _coarseGrainedModels.move_to_end(key)
+        return pickle.loads(_coarseGrainedModels[key])
+
+    cgModelPickle = _loadCoarseGrainedModel(cachePath)
+    if cgModelPickle is not None:
+        logger.debug(f"[CoarseGrainedCache] Loaded {modelType} model from \"{cachePath}\"")
+    else:
+        with fileLock(cachePath+".lock"):
+            # Another process could have built the model while waiting for the lock
+            cgModelPickle = _loadCoarseGrainedModel(cachePath)
+            if cgModelPickle is None:
+                cgModelPickle = generate()
+                try:
+                    atomicWrite(cachePath,zlib.compress(cgModelPickle,1))
+                except Exception as e:
+                    logger.warning(f"[CoarseGrainedCache] Error writing cache entry \"{cachePath}\" ({e})")
+
+    _storeCoarseGrainedModel(key,cgModelPickle)
+
+    return pickle.loads(cgModelPickle)
+
+def _getRandomState():
+    return random.getstate(),np.random.get_state()
+
+def _setRandomState(randomState):
+    random.setstate(randomState[0])
+    np.random.set_state(randomState[1])
+
+def _equalRandomStates(randomState1,randomState2):
+    (pyState1,npState1),(pyState2,npState2) = randomState1,randomState2
+    if pyState1 != pyState2:
+        return False
+    return (npState1[0] == npState2[0] and np.array_equal(npState1[1],npState2[1]) and
+            tuple(npState1[2:]) == tuple(npState2[2:]))
+
+class modelsCache:
+    """
+    In-memory cache of built models. Models are keyed by their class, name and parameters
+    and by the units, types (declared so far) and ensemble they are built with.
+    A cached model is reused through a clone (see modelBase.clone), the types declared
+    by the model are declared again.
+
+    Models whose construction does not use the (global) random generators are reused for any random state.
+    Otherwise, a model is only reused if the random state is the same as when it was built (for example
+    when the simulation is seeded), and the random state after its construction is restored.
+    The least recently used models are dropped when more than maxSize models are stored (0 disables the cache).
+    """
+
+    def __init__(self,maxSize = 0):
+
+        self.logger = logging.getLogger("VLMP")
+
+        self.maxSize = maxSize
+        self.models  = OrderedDict()
+
+    def getKey(self,modelClass,name,units,types,ensemble,params):
+        return hashObject({"class":f"{modelClass.__module__}.{modelClass.__qualname__}",
+                           "name":name,
+                           "parameters":params,
+                           "units":[units.getType(),units.getUnitsName()],
+                           "types":[types.getType(),types.getTypesComponents(),types.getDeclaredTypes()],
+                           "ensemble":[ensemble.getType(),ensemble.getEnsembleComponents()]})
+
+    def build(self,modelClass,name,units,types,ensemble,params):
+
+        if self.maxSize < 1:
+            return modelClass(name=name,units=units,types=types,ensemble=ensemble,**params)
+
+        key = self.getKey(modelClass,name,units,types,ensemble,params)
+
+        cached = self.models.get(key,None)
+        if cached is not None:
+            if not cached["usesRandom"] or _equalRandomStates(cached["randomStateIn"],_getRandomState()):
+                self.logger.debug(f"[ModelsCache] Reusing model \"{name}\" ({modelClass.__name__})")
+                self.models.move_to_end(key)
+
+                for typeDecl in cached["addedTypes"]:
+                    types.addType(**typeDecl)
+                if cached["usesRandom"]:
+                    _setRandomState(cached["randomStateOut"])
+
+                return cached["model"].clone(units,types,ensemble)
+
+        declaredTypes = len(types.getDeclaredTypes())
+        randomStateIn = _getRandomState()
+
+        model = modelClass(name=name,units=units,types=types,ensemble=ensemble,**params)
+
+        randomStateOut = _getRandomState()
+        usesRandom     = not _equalRandomStates(randomStateIn,randomStateOut)
+
+        #The cached model is a clone, the built model is used (and can be modified) by the simulation
+        self.models[key] = {"model":model.clone(units,types,ensemble),
+                            "addedTypes":types.getDeclaredTypes()[declaredTypes:],
+                            "usesRandom":usesRandom,
+                            "randomStateIn":randomStateIn if usesRandom else None,
+                            "randomStateOut":randomStateOut if usesRandom else None}
+        self.models.move_to_end(key)
+
+        while len(self.models) > self.maxSize:
+            self.models.popitem(last=False)
+
+        return model
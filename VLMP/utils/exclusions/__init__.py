@@ -0,0 +1,160 @@
+import logging
+
+import numpy as np
+from scipy import sparse
+
+from ..tables import getTableLength, getTableColumn
+
+class exclusionsList:
+    """
+    Exclusions stored in CSR format. For the particle ids[n] the excluded particles are
+    indices[offsets[n]:offsets[n+1]]. Ids are sorted and each exclusion list is sorted and
+    without repetitions. The ["id","id_list"] layout used by the neighbour lists is only
+    generated when getData is called.
+    """
+
+    def __init__(self,ids=None,offsets=None,indices=None):
+
+        self.logger = logging.getLogger("VLMP")
+
+        if ids is None:
+            ids     = np.empty(0,dtype=np.int64)
+            offsets = np.zeros(1,dtype=np.int64)
+            indices = np.empty(0,dtype=np.int64)
+
+        self.ids     = np.asarray(ids,dtype=np.int64)
+        self.offsets = np.asarray(offsets,dtype=np.int64)
+        self.indices = np.asarray(indices,dtype=np.int64)
+
+        if len(self.offsets) != len(self.ids)+1 or self.offsets[-1] != len(self.indices):
+            self.logger.error("[ExclusionsList] Inconsistent CSR arrays")
+            raise Exception("Inconsistent exclusions list")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def getPairs(self):
+        """ Returns all the (id,excludedId) pairs as a (n,2) array """
+        counts = np.diff(self.offsets)
+        return np.stack([np.repeat(self.ids,counts),self.indices],axis=1)
+
+    def getExclusions(self,i):
+        n = np.searchsorted(self.ids,i)
+        if n == len(self.ids) or self.ids[n] != i:
+            return []
+        return self.indices[self.offsets[n]:self.offsets[n+1]].tolist()
+
+    def merge(self,other):
+        """ Returns a new exclusionsList with the union of both lists """
+        pairs = np.concatenate([self.getPairs(),other.getPairs()])
+        return exclusionsFromPairs(pairs,symmetric=False)
+
+    def getData(self):
+        """ Exclusions in the ["id","id_list"] layout """
+        ids     = self.ids.tolist()
+        offsets = self.offsets.tolist()
+        indices = self.indices.tolist()
+        return [[i,indices[offsets[n]:offsets[n+1]]] for n,i in enumerate(ids)]
+
+def exclusionsFromPairs(pairs,symmetric=True):
+    """
+    Build the exclusions from a (n,2) array of pairs. If symmetric is True,
+    each pair (i,j) also adds the exclusion (j,i).
+    """
+
+    pairs = np.asarray(pairs,dtype=np.int64).reshape(-1,2)
+    if symmetric:
+        pairs = np.concatenate([pairs,pairs[:,::-1]])
+
+    if len(pairs) == 0:
+        return exclusionsList()
+
+    pairs = np.unique(pairs,axis=0)
+
+    ids,counts = np.unique(pairs[:,0],return_counts=True)
+    offsets    = np.concatenate([[0],np.cumsum(counts)])
+
+    return exclusionsList(ids,offsets,pairs[:,1])
+
+def exclusionsFromData(data,idIndex=0,idListIndex=1):
+    """ Build the exclusions from a list in the ["id","id_list"] layout """
+
+    ids    = np.asarray([entry[idIndex] for entry in data],dtype=np.int64)
+    counts = np.asarray([len(entry[idListIndex]) for entry in data],dtype=np.int64)
+
+    indices = [j for entry in data for j in entry[idListIndex]]
+    pairs   = np.stack([np.repeat(ids,counts),np.asarray(indices,dtype=np.int64)],axis=1)
+
+    return exclusionsFromPairs(pairs,symmetric=False)
+
+def bandedExclusions(nParticles,exclusionDistance,offset=0):
+    """
+    Exclusions of a chain of nParticles consecutive ids (starting at offset), where each particle
+    excludes all the particles at distance (along the chain) less or equal than exclusionDistance.
+    """
+
+    if nParticles < 2 or exclusionDistance < 1:
+        return exclusionsList()
+
+    shifts = np.arange(-exclusionDistance,exclusionDistance+1,dtype=np.int64)
+    shifts = shifts[shifts != 0]
+
+    i = np.repeat(np.arange(nParticles,dtype=np.int64),len(shifts))
+    j = i + np.tile(shifts,nParticles)
+
+    valid = (j >= 0) & (j < nParticles)
+    i,j   = i[valid],j[valid]
+
+    # Pairs are generated already sorted by i and then by j
+    ids,counts = np.unique(i,return_counts=True)
+    offsets    = np.concatenate([[0],np.cumsum(counts)])
+
+    return exclusionsList(ids+offset,offsets,j+offset)
+
+def bondedExclusions(models,excludedBonds):
+    """
+    Exclusions generated by the bonded interactions of the models. Particles sharing a Bond2 entry
+    are excluded if excludedBonds > 0, particles sharing a Bond3 entry if excludedBonds > 1
+    and particles sharing a Bond4 entry if excludedBonds > 2.
+    All the pairs are gathered in a sparse adjacency matrix of the whole simulation.
+    """
+
+    bondLabels = {"Bond2":["id_i","id_j"],
+                  "Bond3":["id_i","id_j","id_k"],
+                  "Bond4":["id_i","id_j","id_k","id_l"]}
+    bondTypes = list(bondLabels.keys())[:excludedBonds]
+
+    nParticles = 0
+    rows = [np.empty(0,dtype=np.int64)]
+    cols = [np.empty(0,dtype=np.int64)]
+    for mdl in models:
+        nParticles = max(nParticles,mdl.getIdOffset()+mdl.getNumberOfParticles())
+        for info in mdl.getForceField().values():
+            type_ = info["type"][0]
+            if type_ not in bondTypes or getTableLength(info) == 0:
+                continue
+
+            bonds  = np.stack([getTableColumn(info,lbl) for lbl in bondLabels[type_]],axis=1).astype(np.int64)
+            bonds += mdl.getIdOffset()
+
+            # All the particles of a bonded entry exclude each other
+            for a in range(bonds.shape[1]):
+                for b in range(a+1,bonds.shape[1]):
+                    rows.append(bonds[:,a])
+                    cols.append(bonds[:,b])
+
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+
+    notSelf = (rows != cols)
+    rows,cols = rows[notSelf],cols[notSelf]
+
+    adjacency = sparse.coo_matrix((np.ones(len(rows),dtype=np.int32),(rows,cols)),shape=(nParticles,nParticles))
+    adjacency = (adjacency + adjacency.T).tocsr()
+    adjacency.sum_duplicates()
+    adjacency.sort_indices()
+
+    counts = np.diff(adjacency.indptr)
+    ids    = np.flatnonzero(counts)
+
+    return exclusionsList(ids,np.concatenate([[0],np.cumsum(counts[ids])]),adjacency.indices)
@@ -4,6 +4,7 @@ import copy
 import numpy as np
 
 from scipy.spatial.transform import Rotation as R
+from scipy.spatial import cKDTree
 from pyquaternion import Quaternion
 
 from .bounds import *
@@ -55,3 +56,17 @@ def quaternionFromVectors(vec1, vec2):
 
     return np.asarray([q0,q1,q2,q3])
 
+def getPairsWithinCutOff(positions,cutOff):
+    """ Pairs (i,j), i<j, of positions closer than cutOff and their distances.
+        Pairs are sorted by i and then by j (template order)"""
+
+    positions = np.asarray(positions,dtype=float).reshape(-1,3)
+
+    # The query radius is slightly enlarged, the cut-off is applied with the exact distances
+    pairs = cKDTree(positions).query_pairs(cutOff*(1.0+1e-9),output_type="ndarray").reshape(-1,2)
+    pairs = pairs[np.lexsort((pairs[:,1],pairs[:,0]))]
+
+    distances = np.linalg.norm(positions[pairs[:,0]] - positions[pairs[:,1]],axis=1)
+
+    inRange = distances < cutOff
+    return pairs[inRange],distances[inRange]
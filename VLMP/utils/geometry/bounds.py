@@ -1,5 +1,7 @@
 import logging
 
+import numpy as np
+
 class BoundsBox:
 
     def __init__(self,nParticles,concentration):
@@ -32,6 +34,14 @@ class boxChecker:
 
         return True
 
+    def checkPositions(self,positions):
+        """ Vectorized check, positions is a (N,3) array. Returns a boolean array """
+
+        upper = np.asarray([b/2.0 for b in self.box])
+
+        positions = np.asarray(positions,dtype=float).reshape(-1,3)
+        return np.all((positions <= upper) & (positions >= -upper),axis=1)
+
 class BoundsPlates:
 
     def __init__(self,nParticles,concentration,particleDiameter,padding,aspectRatio):
@@ -80,4 +90,18 @@ class platesChecker:
 
         return True
 
+    def checkPositions(self,positions):
+        """ Vectorized check, positions is a (N,3) array. Returns a boolean array """
+
+        boxX,boxY,_ = [b/2.0 for b in self.box]
+
+        zSup    = self.plateTop    - 1.05*self.particleDiameter
+        zBottom = self.plateBottom + 1.05*self.particleDiameter
+
+        upper = np.asarray([ boxX, boxY,zSup])
+        lower = np.asarray([-boxX,-boxY,zBottom])
+
+        positions = np.asarray(positions,dtype=float).reshape(-1,3)
+        return np.all((positions <= upper) & (positions >= lower),axis=1)
+
 
@@ -1,75 +1,295 @@
 import logging
 
-from MDAnalysis.lib.pkdtree import PeriodicKDTree
+import itertools
 
 import numpy as np
 
-def distributeRandomlyGeneratorChecker(box,posSets,radSets,newPosGenerator,distanceChecker,nMaxTries,radiusFactor):
+class cellList:
+    """
+    Incrementally updated cell list (hashed grid). Particles can be added at any time,
+    neighbour queries do not require rebuilding the structure.
+    Periodic directions use the minimum image convention, non periodic directions are unbounded.
+    box can be None if no direction is periodic.
+    """
 
-    logger = logging.getLogger("VLMP")
+    # Cells are encoded into a single integer key
+    _keyOffset = 2**20
+    _keyBase   = 2**21
 
-    newPositions = []
-    addedRads    = []
+    _neighbourOffsets = np.asarray(list(itertools.product((-1,0,1),repeat=3)),dtype=np.int64)
 
-    maxRadius = np.max([np.max(r) for r in radSets])
+    def __init__(self,box,cutOff,periodic=[True,True,True]):
 
-    for i in range(len(posSets)):
-        #Trying to find a new position for the particle set i
+        self.logger = logging.getLogger("VLMP")
 
-        if len(newPositions) == 0:
-            center = np.mean(posSets[i],axis=0)
-            # Generete a random 3D position
-            mp = newPosGenerator()
+        if cutOff <= 0.0:
+            self.logger.error(f"[CellList] Cut off has to be positive, but is {cutOff}")
+            raise Exception("Cut off has to be positive")
 
-            transVec = mp - center
-            newPositions += [list(p + transVec) for p in posSets[i]]
-            addedRads+=radSets[i]
-            logger.debug(f"Added particle 1/{len(posSets)}")
-            continue
+        self.cutOff   = cutOff
+        self.periodic = np.asarray(periodic,dtype=bool)
 
-        tree = PeriodicKDTree(box=np.asarray(box+[90,90,90],dtype=np.float32))
-        tree.set_coords(coords=np.asarray(newPositions,dtype=np.float32),
-                        cutoff=maxRadius*2.0)
+        if box is None:
+            if self.periodic.any():
+                self.logger.error(f"[CellList] Box has to be given for periodic directions")
+                raise Exception("Box not given")
+            box = [np.inf,np.inf,np.inf]
+        self.box = np.asarray([b if p else np.inf for b,p in zip(box,self.periodic)],dtype=float)
 
-        # Try to add the set in a random position
-        added = False
-        tries = 0
-        while not added and tries < nMaxTries:
-            center = np.mean(posSets[i],axis=0)
+        self.nCells   = np.zeros(3,dtype=int)
+        self.cellSize = np.full(3,cutOff,dtype=float)
+        for d in range(3):
+            if self.periodic[d]:
+                self.nCells[d]   = max(1,int(self.box[d]//cutOff))
+                self.cellSize[d] = self.box[d]/self.nCells[d]
 
-            # Generate a random position
-            mp = newPosGenerator()
+        #If there are less than 3 cells in a periodic direction, neighbour cells are repeated
+        self.repeatedNeighbours = bool(np.any(self.nCells[self.periodic] < 3))
+
+        self.clear()
+
+    def clear(self):
+        self.cells = {}
+
+        self.positions  = np.empty((0,3),dtype=float)
+        self.radii      = np.empty(0,dtype=float)
+        self.nParticles = 0
+
+    def __getCells(self,positions):
+        cells = np.floor(positions/self.cellSize).astype(np.int64)
+        cells[...,self.periodic] = np.mod(cells[...,self.periodic],self.nCells[self.periodic])
+        return cells
+
+    def __getKeys(self,cells):
+        cells = cells + self._keyOffset
+        return (cells[...,0]*self._keyBase + cells[...,1])*self._keyBase + cells[...,2]
+
+    def applyMinimumImage(self,dr):
+        dr[...,self.periodic] -= self.box[self.periodic]*np.round(dr[...,self.periodic]/self.box[self.periodic])
+        return dr
+
+    def add(self,positions,radii=None):
+        positions = np.asarray(positions,dtype=float).reshape(-1,3)
+        if radii is None:
+            radii = np.zeros(len(positions))
+        radii = np.asarray(radii,dtype=float).reshape(-1)
+
+        #Storage grows geometrically
+        if self.nParticles + len(positions) > len(self.positions):
+            capacity = max(2*len(self.positions),self.nParticles+len(positions))
+            self.positions = np.resize(self.positions,(capacity,3))
+            self.radii     = np.resize(self.radii,capacity)
+
+        indices = np.arange(self.nParticles,self.nParticles+len(positions))
+        self.positions[indices] = positions
+        self.radii[indices]     = radii
+        self.nParticles        += len(positions)
+
+        for index,key in zip(indices.tolist(),self.__getKeys(self.__getCells(positions)).tolist()):
+            self.cells.setdefault(key,[]).append(index)
+
+    def getPositions(self):
+        return self.positions[:self.nParticles]
+
+    def getRadii(self):
+        return self.radii[:self.nParticles]
+
+    def getNeighbours(self,positions,cutOff=None):
+        """
+        Find all the pairs (i,j) with distance smaller or equal than cutOff (at most the cell list cut off),
+        where i is the index of the query position and j the index of the stored particle.
+        Returns the arrays i, j and the distances.
+        """
+
+        if cutOff is None:
+            cutOff = self.cutOff
+        elif cutOff > self.cutOff:
+            self.logger.error(f"[CellList] Query cut off ({cutOff}) larger than the cell list cut off ({self.cutOff})")
+            raise Exception("Query cut off too large")
+
+        positions = np.asarray(positions,dtype=float).reshape(-1,3)
+
+        nQueries = len(positions)
+        if self.nParticles == 0 or nQueries == 0:
+            return np.empty(0,dtype=int),np.empty(0,dtype=int),np.empty(0,dtype=float)
+
+        #Keys of the neighbour cells of each query, shape (nQueries,27)
+        neighbourCells = self.__getCells(positions)[:,None,:] + self._neighbourOffsets[None,:,:]
+        neighbourCells[...,self.periodic] = np.mod(neighbourCells[...,self.periodic],self.nCells[self.periodic])
+        keys = self.__getKeys(neighbourCells)
+
+        if self.repeatedNeighbours:
+            keys.sort(axis=1)
+            keys[:,1:][keys[:,1:] == keys[:,:-1]] = -1 #Not a valid key
+
+        #Each different cell is looked up once
+        uniqueKeys,keyIndex = np.unique(keys,return_inverse=True)
+        keyIndex = keyIndex.reshape(-1)
+
+        cellParticles = [self.cells.get(k,[]) for k in uniqueKeys.tolist()]
+        cellCounts    = np.fromiter(map(len,cellParticles),dtype=np.int64,count=len(cellParticles))
+        cellStarts    = np.cumsum(cellCounts)-cellCounts
+        cellParticles = np.fromiter(itertools.chain.from_iterable(cellParticles),dtype=np.int64,count=int(cellCounts.sum()))
+
+        #Expand to all the (query,candidate) pairs
+        entryCounts = cellCounts[keyIndex]
+        nPairs      = int(entryCounts.sum())
+        if nPairs == 0:
+            return np.empty(0,dtype=int),np.empty(0,dtype=int),np.empty(0,dtype=float)
+
+        entryStarts = np.cumsum(entryCounts)-entryCounts
+        i = np.repeat(np.arange(len(keyIndex))//keys.shape[1],entryCounts)
+        j = cellParticles[np.repeat(cellStarts[keyIndex]-entryStarts,entryCounts)+np.arange(nPairs)]
+
+        dr = self.applyMinimumImage(positions[i]-self.positions[j])
+        d  = np.linalg.norm(dr,axis=1)
+
+        inRange = (d <= cutOff)
+        return i[inRange],j[inRange],d[inRange]
 
-            transVec = mp - center
+class randomSequentialAddition:
+    """
+    Random sequential addition of (rigid) sets of particles.
+    Candidates are given by a generator, they are accepted if all their positions are inside
+    the bounds (checker, optional) and no particle overlaps with the particles already added.
+    Two particles overlap if their distance is smaller or equal than radiusFactor*(r_i+r_j).
 
-            tentativePos = np.asarray([p + transVec for p in posSets[i]])
+    Checkers with a checkPositions method (see boxChecker) are evaluated over the whole batch of candidates,
+    otherwise check is called for each position. If distanceChecker is given, distanceChecker(p1,p2,r1,r2)
+    (p1,r1 added particle, p2,r2 candidate particle) is used instead of the overlap condition
+    for the pairs closer than radiusFactor*2*maxRadius, it returns False if they clash.
+    """
 
-            # Find the closest particles
-            pairs = tree.search_tree(np.asarray(tentativePos,dtype=np.float32),maxRadius*2.0)
+    def __init__(self,box,maxRadius,radiusFactor=1.0,periodic=[True,True,True],checker=None,distanceChecker=None):
 
-            toAdd = True
-            for i1,i2 in pairs:
+        self.logger = logging.getLogger("VLMP")
 
-                p1 = newPositions[i2]
-                p2 = tentativePos[i1]
+        self.maxRadius       = maxRadius
+        self.radiusFactor    = radiusFactor
+        self.checker         = checker
+        self.distanceChecker = distanceChecker
 
-                r1 = addedRads[i2]
-                r2 = radSets[i][i1]
+        self.cellList = cellList(box,radiusFactor*2.0*maxRadius,periodic)
 
-                toAdd = distanceChecker(p1,p2,r1,r2)
-                if not toAdd:
-                    break
-            if toAdd:
-                newPositions += [list(p) for p in tentativePos]
-                addedRads    += radSets[i]
-                added = True
-                logger.debug(f"Added particle {i+1}/{len(posSets)} at try {tries}/{nMaxTries}")
+    def clear(self):
+        self.cellList.clear()
+
+    def getPositions(self):
+        return self.cellList.getPositions()
+
+    def add(self,positions,radii):
+        self.cellList.add(positions,radii)
+
+    def __checkRadii(self,radii):
+        if np.max(radii) > self.maxRadius:
+            self.logger.error(f"[RandomSequentialAddition] Radius {np.max(radii)} larger than the maximum radius {self.maxRadius}")
+            raise Exception("Radius larger than maximum radius")
+
+    def getValidCandidates(self,candidates,radii):
+        """
+        Check a batch of candidates (list of arrays of positions) in a single query.
+        radii are the radii of the particles of each candidate (the same for all candidates).
+        Returns a boolean array, True for valid candidates.
+        """
+
+        radii = np.asarray(radii,dtype=float).reshape(-1)
+        self.__checkRadii(radii)
+
+        candidates = [np.asarray(c,dtype=float).reshape(-1,3) for c in candidates]
+
+        positions = np.concatenate(candidates)
+        owner     = np.repeat(np.arange(len(candidates)),[len(c) for c in candidates])
+
+        valid = np.ones(len(candidates),dtype=bool)
+        if self.checker is not None:
+            if hasattr(self.checker,"checkPositions"):
+                inside = self.checker.checkPositions(positions)
             else:
-                tries += 1
+                inside = np.asarray([self.checker.check(p) for p in positions.tolist()],dtype=bool)
+            valid[owner[~inside]] = False
+
+        iq,j,d = self.cellList.getNeighbours(positions)
+
+        rq = np.tile(radii,len(candidates))
+        if self.distanceChecker is None:
+            overlap = d <= self.radiusFactor*(rq[iq]+self.cellList.getRadii()[j])
+        else:
+            addedPositions = self.cellList.getPositions()
+            addedRadii     = self.cellList.getRadii()
+            overlap = np.asarray([not self.distanceChecker(addedPositions[jj],positions[ii],addedRadii[jj],rq[ii])
+                                  for ii,jj in zip(iq.tolist(),j.tolist())],dtype=bool)
+        valid[owner[iq[overlap]]] = False
+
+        return valid
+
+    def tryAdd(self,generator,radii,nMaxTries=None,batchSize=1):
+        """
+        Generate candidates (generator() returns an array of positions) until one is valid,
+        then add it. Candidates are tested in batches of batchSize (the first valid one is taken).
+        If nMaxTries is None, it tries until a valid candidate is found.
+        Returns the added positions (None if nMaxTries is reached) and the number of tries.
+        """
+
+        tries = 0
+        while nMaxTries is None or tries < nMaxTries:
+            nCandidates = batchSize if nMaxTries is None else min(batchSize,nMaxTries-tries)
+            candidates  = [generator() for _ in range(nCandidates)]
+
+            valid = self.getValidCandidates(candidates,radii)
+            if valid.any():
+                first = int(np.argmax(valid))
+                tries += first+1
+                self.add(candidates[first],radii)
+                return candidates[first],tries
+
+            tries += nCandidates
+
+        return None,tries
 
-        if not added:
+def distributeRandomlySets(box,posSets,radSets,newPosGenerator,nMaxTries,radiusFactor,periodic=True,batchSize=1,distanceChecker=None):
+    """
+    Place the sets of particles (rigid bodies) posSets, one after another, translating them to the
+    random positions given by newPosGenerator. Two particles clash if their distance is smaller or equal
+    than radiusFactor*(r1+r2) (or if distanceChecker returns False, see randomSequentialAddition).
+    Each set is tried nMaxTries times, batchSize placements are checked at once.
+    """
+
+    logger = logging.getLogger("VLMP")
+
+    maxRadius = np.max([np.max(r) for r in radSets])
+
+    setsAdder = randomSequentialAddition(box,maxRadius,
+                                         radiusFactor=radiusFactor,
+                                         periodic=[periodic]*3,
+                                         distanceChecker=distanceChecker)
+
+    for i in range(len(posSets)):
+        #Trying to find a new position for the particle set i
+
+        setPositions = np.asarray(posSets[i],dtype=float)
+        center       = np.mean(setPositions,axis=0)
+
+        def tentativePositions():
+            # Generate a random position
+            mp = newPosGenerator()
+            return setPositions + (mp - center)
+
+        added,tries = setsAdder.tryAdd(tentativePositions,radSets[i],nMaxTries=max(nMaxTries,1),batchSize=batchSize)
+
+        if added is None:
             logger.error("The number of tries to avoid clashes has been reached.")
             raise Exception("Clash avoidance failed")
 
-    return newPositions.copy()
+        logger.debug(f"Added particle {i+1}/{len(posSets)} at try {tries-1}/{nMaxTries}")
 
+    return setsAdder.getPositions().tolist()
+
+def distributeRandomlyGeneratorChecker(box,posSets,radSets,newPosGenerator,distanceChecker,nMaxTries,radiusFactor):
+    """
+    Place the sets of particles posSets in a periodic box. Pairs of particles closer than 2*max(radSets)
+    are checked with distanceChecker(p1,p2,r1,r2), which returns False if they clash.
+    Kept for compatibility, see distributeRandomlySets.
+    """
+    return distributeRandomlySets(box,posSets,radSets,newPosGenerator,nMaxTries,
+                                  radiusFactor=1.0,periodic=True,
+                                  distanceChecker=distanceChecker)
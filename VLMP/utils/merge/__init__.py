@@ -0,0 +1,373 @@
+import logging
+
+from deepdiff import DeepDiff
+
+from pyUAMMD import simulation
+
+# Merging of the components of a simulation (mode "modelId").
+#
+# Components hand over their data (ownership transfer): the simulations given to wrapSimulation
+# and mergeSimulations are not copied, they are consumed by the merge and must not be used afterwards.
+#
+# Model components (state, structure and force field only) are appended here in a single pass.
+# The result is the same as the one given by pyUAMMD simulation.append, but force field entries
+# shared by several models (for example "bonds") are not compared element by element:
+# after the ids update the entries of different models can not share any element,
+# so they are always concatenated. The rest of the components are appended by pyUAMMD.
+
+_idLabels     = simulation.id_labels
+_idListLabels = simulation.id_list_labels
+_typeLabels   = simulation.type_labels
+
+_structureLabels = ["id","type","resId","chainId","modelId","batchId"]
+_stateLabelZeros = {"position":[0.0,0.0,0.0],
+                    "velocity":[0.0,0.0,0.0],
+                    "direction":[0.0,0.0,0.0,1.0]}
+
+def wrapSimulation(sim,DEBUG_MODE = False):
+    """
+    pyUAMMD simulation holding the dictionary sim, which is not copied.
+    """
+
+    logger = logging.getLogger("VLMP")
+
+    if "state" in sim:
+        if "structure" not in sim.get("topology",{}):
+            logger.error("[Merge] Added state but not structure")
+            raise Exception("Added state but not structure")
+        if len(sim["state"]["data"]) != len(sim["topology"]["structure"]["data"]):
+            logger.error("[Merge] Number of particles in state and structure does not match")
+            raise Exception("Number of particles in state and structure does not match")
+
+    wrapped = simulation(None,DEBUG_MODE)
+    wrapped.sim = sim
+    return wrapped
+
+def _isModelComponent(sim,sim2app):
+    """
+    Check if sim2app can be appended by the fast path: it only contains state, structure and
+    force field, there are no groups or patchy particles and all the labels are known.
+    """
+
+    if not set(sim2app.keys()).issubset({"state","topology"}):
+        return False
+    if not set(sim2app.get("topology",{}).keys()).issubset({"structure","forceField"}):
+        return False
+    if "structure" not in sim2app.get("topology",{}):
+        return False
+
+    if not set(sim2app["topology"]["structure"]["labels"]).issubset(_structureLabels):
+        return False
+
+    for entry in sim2app["topology"].get("forceField",{}).values():
+        if entry["type"][0] in ["Groups","PatchyParticles"]:
+            return False
+
+    structureInSim = ("structure" in sim.get("topology",{}))
+
+    if structureInSim:
+        if not set(sim["topology"]["structure"]["labels"]).issubset(_structureLabels):
+            return False
+    elif "state" in sim:
+        return False
+
+    if "state" in sim and "state" in sim2app:
+        simLabels     = sim["state"]["labels"]
+        sim2appLabels = sim2app["state"]["labels"]
+        if "id" not in simLabels or "id" not in sim2appLabels:
+            return False
+        for label in simLabels:
+            if label not in sim2appLabels and label not in _stateLabelZeros:
+                return False
+
+    return True
+
+def _getOffset(structure,label):
+    if label not in structure["labels"]:
+        return 1
+    index = structure["labels"].index(label)
+    return max([0]+[d[index] for d in structure["data"]])+1
+
+def _appendStructure(sim,sim2app):
+
+    structure2app = sim2app["topology"]["structure"]
+
+    if "structure" not in sim.get("topology",{}):
+        sim.setdefault("topology",{})["structure"] = structure2app
+        return 0,False
+
+    structure = sim["topology"]["structure"]
+
+    if "modelId" not in structure["labels"]:
+        structure["labels"].append("modelId")
+        for d in structure["data"]:
+            d.append(0)
+
+    idOffset    = _getOffset(structure,"id")
+    modelOffset = _getOffset(structure,"modelId")
+
+    for label in _structureLabels:
+        if label in structure2app["labels"] and label not in structure["labels"]:
+            structure["labels"].append(label)
+            for d in structure["data"]:
+                d.append(0)
+        elif label in structure["labels"] and label not in structure2app["labels"]:
+            structure2app["labels"].append(label)
+            for d in structure2app["data"]:
+                d.append(0)
+
+    indices = [structure2app["labels"].index(label) for label in structure["labels"]]
+    idPos    = structure["labels"].index("id")
+    modelPos = structure["labels"].index("modelId")
+
+    data = structure["data"]
+    for d in structure2app["data"]:
+        row = [d[i] for i in indices]
+        row[idPos]    += idOffset
+        row[modelPos] += modelOffset
+        data.append(row)
+
+    return idOffset,True
+
+def _appendState(sim,sim2app,idOffset):
+
+    if "state" not in sim2app:
+        return
+
+    state2app = sim2app["state"]
+
+    if "state" not in sim:
+        sim["state"] = state2app
+        return
+
+    state = sim["state"]
+
+    for label,zero in _stateLabelZeros.items():
+        if label in state2app["labels"] and label not in state["labels"]:
+            state["labels"].append(label)
+            for d in state["data"]:
+                d.append(list(zero))
+        elif label in state["labels"] and label not in state2app["labels"]:
+            state2app["labels"].append(label)
+            for d in state2app["data"]:
+                d.append(list(zero))
+
+    indices = [state2app["labels"].index(label) for label in state["labels"]]
+    idPos   = state["labels"].index("id")
+
+    data = state["data"]
+    for d in state2app["data"]:
+        row = [d[i] for i in indices]
+        row[idPos] += idOffset
+        data.append(row)
+
+def _updateEntryIds(entry,idOffset):
+
+    if idOffset == 0 or "labels" not in entry or "data" not in entry:
+        return
+
+    idIndices     = [i for i,lbl in enumerate(entry["labels"]) if lbl in _idLabels]
+    idListIndices = [i for i,lbl in enumerate(entry["labels"]) if lbl in _idListLabels]
+
+    for d in entry["data"]:
+        for i in idIndices:
+            d[i] += idOffset
+        for i in idListIndices:
+            d[i] = [j+idOffset for j in d[i]]
+
+def _appendForceFieldEntry(entry,entry2app,entryName,disjointIds):
+
+    logger = logging.getLogger("VLMP")
+
+    equalParam = not DeepDiff(entry,entry2app,
+                              ignore_order=True,report_repetition=True,
+                              exclude_paths=["root['data']","root['labels']"])
+    if not equalParam:
+        logger.error(f"[Merge] Only force field entries which differ in data can be appended. Force field entry: \"{entryName}\"")
+        raise Exception("Only force field entries which differ in data can be appended")
+
+    if "data" not in entry or "data" not in entry2app:
+        return
+
+    isIdDependent        = any([lbl in _idLabels or lbl in _idListLabels for lbl in entry["labels"]])
+    isIdDependent2app    = any([lbl in _idLabels or lbl in _idListLabels for lbl in entry2app["labels"]])
+    if isIdDependent != isIdDependent2app:
+        logger.error(f"[Merge] Force field entry \"{entryName}\" is id dependent in one of the simulations but not in the other")
+        raise Exception("ForceField entry is id dependent in one of the simulations but not in the other")
+
+    # Each row of an entry with an id label refers to, at least, one particle. If ids are disjoint
+    # no row can be shared, so the comparison of the data (and its result) is known in advance
+    hasIdLabel  = any([lbl in _idLabels for lbl in entry["labels"]])
+    notEmpty    = len(entry["data"]) > 0 and len(entry2app["data"]) > 0
+    if not (disjointIds and hasIdLabel and notEmpty and entry["labels"] == entry2app["labels"]):
+        ddiff = DeepDiff(entry["data"],entry2app["data"],ignore_order=True,report_repetition=True)
+
+        if "values_changed" not in ddiff.keys():
+            nAdded   = len(ddiff.get("iterable_item_added",[]))
+            nRemoved = len(ddiff.get("iterable_item_removed",[]))
+
+            if nRemoved == 0:
+                if nAdded > 0:
+                    #Data is a subset of the data to append
+                    entry["data"] = entry2app["data"]
+                return
+            if nAdded == 0:
+                #Data to append is a subset of data
+                return
+
+    isTypeDependent     = any([lbl in _typeLabels for lbl in entry["labels"]])
+    isTypeDependent2app = any([lbl in _typeLabels for lbl in entry2app["labels"]])
+    if isTypeDependent != isTypeDependent2app:
+        logger.error(f"[Merge] Force field entry \"{entryName}\" is type dependent in one of the simulations but not in the other")
+        raise Exception("ForceField entry is type dependent in one of the simulations but not in the other")
+
+    entry["data"].extend(entry2app["data"])
+
+def _appendForceField(sim,sim2app,idOffset,disjointIds):
+
+    if "forceField" not in sim2app["topology"]:
+        return
+
+    forceField2app = sim2app["topology"]["forceField"]
+    for entry in forceField2app.values():
+        _updateEntryIds(entry,idOffset)
+
+    if "forceField" not in sim["topology"]:
+        sim["topology"]["forceField"] = forceField2app
+        return
+
+    forceField = sim["topology"]["forceField"]
+    for entryName,entry2app in forceField2app.items():
+        if entryName not in forceField:
+            forceField[entryName] = entry2app
+        else:
+            _appendForceFieldEntry(forceField[entryName],entry2app,entryName,disjointIds)
+
+def _appendModelComponent(sim,sim2app):
+
+    idOffset,structureInSim = _appendStructure(sim,sim2app)
+
+    _appendState(sim,sim2app,idOffset)
+    # If sim had a structure, all the ids in sim are smaller than idOffset
+    # and all the (updated) ids of sim2app are equal or larger
+    _appendForceField(sim,sim2app,idOffset,disjointIds = structureInSim)
+
+def mergeSimulations(simulations,DEBUG_MODE = False):
+    """
+    Merge (mode "modelId") a list of simulations (pyUAMMD simulations or dictionaries).
+    The simulations are consumed, their data is moved to the merged simulation.
+    """
+
+    merged = None
+    for sim2app in simulations:
+
+        if not isinstance(sim2app,simulation):
+            sim2app = wrapSimulation(sim2app,DEBUG_MODE)
+
+        if merged is None:
+            merged = sim2app
+        elif _isModelComponent(merged.sim,sim2app.sim):
+            _appendModelComponent(merged.sim,sim2app.sim)
+        else:
+            merged.append(sim2app,mode="modelId")
+
+    return merged
+
+class simulationSetAggregator:
+    """
+    Incremental version of pyUAMMD mergeSimulationsSet (with independent simulation steps).
+    Simulations are added one by one (and consumed), so the simulations of the set
+    do not have to be kept in memory until the set is aggregated.
+    """
+
+    ignoredSimulationStepTypes = ['UtilsStep','FlowControl','Groups']
+
+    def __init__(self):
+
+        self.logger = logging.getLogger("VLMP")
+
+        self.nSimulations         = 0
+        self.aggregatedSimulation = None
+
+    def __prepareSimulation(self,sim,simIndex):
+
+        #Simulation steps are applied over the particles with batchId simIndex
+
+        if "batchId" in sim["topology"]["structure"]["labels"]:
+            self.logger.error("[Merge] BatchId already set, for a single simulation. Cannot aggregate simulations")
+            raise Exception("BatchId already set")
+
+        if "simulationStep" not in sim.keys():
+            return
+
+        simulationSteps = sim["simulationStep"]
+
+        groupDefinitionRequired = False
+
+        keysToRename = []
+        for simStep in simulationSteps.keys():
+
+            simStepType = simulationSteps[simStep]["type"][0]
+
+            isIgnored = any([ignoredType in simStepType for ignoredType in self.ignoredSimulationStepTypes])
+
+            if not isIgnored:
+                if "group" not in simulationSteps[simStep]["parameters"].keys():
+                    simulationSteps[simStep]["parameters"]["group"] = f"batchId_{simIndex}"
+                    groupDefinitionRequired = True
+
+                keysToRename.append(simStep)
+
+            if "Groups" in simStepType:
+                #Rename all the declared groups and the references to them
+                for groupInfo in simulationSteps[simStep]["data"]:
+                    oldName = groupInfo[0]
+                    newName = oldName + f"_{simIndex}"
+                    groupInfo[0] = newName
+
+                    for simStep2rename in simulationSteps.keys():
+                        if simulationSteps[simStep2rename]["parameters"].get("group",None) == oldName:
+                            simulationSteps[simStep2rename]["parameters"]["group"] = newName
+
+        for k in keysToRename:
+            simulationSteps[k+f"_{simIndex}"] = simulationSteps.pop(k)
+
+        if groupDefinitionRequired:
+            if "groups_batchId" in simulationSteps.keys():
+                self.logger.error("[Merge] groups_batchId already defined")
+                raise Exception("groups_batchId already defined")
+
+            simulationSteps["groups_batchId"] = {
+                "type": ["Groups","GroupsList"],
+                "parameters": {},
+                "labels":["name","type","selection"],
+                "data":[
+                    [f"batchId_{simIndex}","BatchIds",[0]],
+                ]
+            }
+
+    def add(self,sim):
+
+        self.__prepareSimulation(sim,self.nSimulations)
+
+        if self.aggregatedSimulation is None:
+            self.aggregatedSimulation = sim
+        else:
+            self.aggregatedSimulation.append(sim,mode="batchId")
+
+        self.nSimulations += 1
+
+    def getAggregatedSimulation(self):
+
+        if self.aggregatedSimulation is None:
+            self.logger.error("[Merge] No simulations added to the simulation set")
+            raise Exception("Empty simulation set")
+
+        forceField = self.aggregatedSimulation["topology"].get("forceField",{})
+        neighborLists = [entry for entry in forceField.keys() if forceField[entry]["type"][0] == "VerletConditionalListSet"]
+
+        if len(neighborLists) > 1:
+            nlsTypes = ", ".join([f"\"{nl}\" ({forceField[nl]['type'][1]})" for nl in neighborLists])
+            self.logger.warning(f"[Merge] Resulting simulation will have multiple neighbor lists !!!. Neighbor lists types: {nlsTypes}.")
+
+        return self.aggregatedSimulation
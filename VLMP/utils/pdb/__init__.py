@@ -0,0 +1,146 @@
+import os
+
+import logging
+
+import hashlib
+
+from ..cache import getCacheFolder, fileLock, atomicWrite
+
+# Resolution of the PDB parameter of the protein models. It can be a local file (.pdb or .pqr)
+# or a PDB ID. IDs are looked up in a local store folder and only fetched if they are not found there.
+
+def isPDBFile(PDB):
+    return PDB.split(".")[-1] in ["pdb","pqr"]
+
+def isPDBId(PDB):
+    return len(PDB) == 4 and PDB.isalnum()
+
+class rcsbFetcher:
+    """ Downloads PDB files from the RCSB PDB database """
+
+    url = "https://files.rcsb.org/download/{}.pdb"
+
+    def __init__(self,timeout = 60):
+        self.logger = logging.getLogger("VLMP")
+        self.timeout = timeout
+
+    def fetch(self,pdbId):
+
+        import requests
+
+        response = requests.get(self.url.format(pdbId),timeout=self.timeout)
+
+        if response.status_code != 200:
+            self.logger.error(f"[PDB] Error downloading the PDB {pdbId} (status code {response.status_code}). Please verify the PDB ID.")
+            raise RuntimeError("Error downloading the PDB")
+
+        self.logger.info(f"[PDB] PDB {pdbId} downloaded successfully.")
+        return response.content
+
+class localFetcher:
+    """ Takes PDB files ({ID}.pdb) from a local folder, for example a mirror of the PDB or test data """
+
+    def __init__(self,folder):
+        self.logger = logging.getLogger("VLMP")
+        self.folder = folder
+
+    def fetch(self,pdbId):
+
+        for fileName in [f"{pdbId}.pdb",f"{pdbId.lower()}.pdb"]:
+            path = os.path.join(self.folder,fileName)
+            if os.path.isfile(path):
+                with open(path,"rb") as f:
+                    return f.read()
+
+        self.logger.error(f"[PDB] PDB {pdbId} not found in \"{self.folder}\"")
+        raise RuntimeError("PDB not found")
+
+class pdbResolver:
+    """
+    Resolves the PDB parameter of the protein models to a local file path.
+    PDB IDs are looked up in the store folder ({ID}.pdb) and fetched (see rcsbFetcher and localFetcher)
+    only if they are not found. Fetched files are written atomically under a file lock, so concurrent
+    processes fetch each PDB once. Resolved IDs and the hashes of the files are kept in memory.
+
+    The store folder is taken from the VLMP_PDB_DIR environment variable, if defined,
+    otherwise the PDB folder of the user cache folder is used (see getCacheFolder).
+    """
+
+    def __init__(self,storeFolder = None,fetcher = None):
+
+        self.logger = logging.getLogger("VLMP")
+
+        self.storeFolder = storeFolder
+        self.fetcher     = fetcher if fetcher is not None else rcsbFetcher()
+
+        self.resolvedPaths = {}
+        self.hashes        = {}
+
+    def getStoreFolder(self):
+        if self.storeFolder is None:
+            storeFolder = os.environ.get("VLMP_PDB_DIR",None)
+            if storeFolder is None:
+                storeFolder = getCacheFolder("PDB")
+            self.storeFolder = storeFolder
+        os.makedirs(self.storeFolder,exist_ok=True)
+        return self.storeFolder
+
+    def __fetch(self,pdbId,path):
+
+        with fileLock(path+".lock"):
+            # Another process could have fetched the PDB while waiting for the lock
+            if not os.path.isfile(path):
+                self.logger.info(f"[PDB] PDB {pdbId} not found in \"{self.getStoreFolder()}\", fetching it")
+                atomicWrite(path,self.fetcher.fetch(pdbId))
+
+    def resolve(self,PDB):
+        """ Local path of the PDB file. PDB is a path to a .pdb or .pqr file or a PDB ID """
+
+        if isPDBFile(PDB):
+            if not os.path.isfile(PDB):
+                self.logger.error(f"[PDB] PDB file \"{PDB}\" not found")
+                raise Exception("PDB file not found")
+            return PDB
+
+        if not isPDBId(PDB):
+            self.logger.error(f"[PDB] \"{PDB}\" is neither a PDB file (.pdb or .pqr) nor a valid PDB ID")
+            raise Exception("Invalid PDB")
+
+        pdbId = PDB.upper()
+        if pdbId not in self.resolvedPaths:
+            path = os.path.join(self.getStoreFolder(),f"{pdbId}.pdb")
+            if not os.path.isfile(path):
+                self.__fetch(pdbId,path)
+            self.resolvedPaths[pdbId] = path
+
+        return self.resolvedPaths[pdbId]
+
+    def getHash(self,path):
+        """ Hash of the content of a PDB file. Files are hashed again if they are modified """
+
+        stat = os.stat(path)
+        key  = (os.path.abspath(path),stat.st_mtime_ns,stat.st_size)
+
+        if key not in self.hashes:
+            with open(path,"rb") as f:
+                self.hashes[key] = hashlib.sha256(f.read()).hexdigest()
+
+        return self.hashes[key]
+
+    def clear(self):
+        self.resolvedPaths = {}
+        self.hashes        = {}
+
+_resolver = None
+
+def getPDBResolver():
+    """ PDB resolver used by the protein models """
+    global _resolver
+    if _resolver is None:
+        _resolver = pdbResolver()
+    return _resolver
+
+def setPDBResolver(resolver):
+    """ Sets the PDB resolver used by the protein models, for example with another store folder or fetcher """
+    global _resolver
+    _resolver = resolver
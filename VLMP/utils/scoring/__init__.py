@@ -0,0 +1,143 @@
+import json
+
+from pyUAMMD import simulation
+
+# Scores of built (pyUAMMD) simulations, used to distribute the simulation pool into simulation sets.
+# All the functions accept a pyUAMMD simulation or a dictionary with the same layout.
+
+# Cost model. The cost of a simulation is estimated as the number of interactions
+# evaluated per time step, multiplied by the number of integration steps.
+# Non-bonded interactions are evaluated, per particle, over its neighbours
+_nonBondedNeighbours = 32
+# Simulation steps (measures, writing, ...) are expensive compared with an integration step
+# (usually they require copying data from the device), but they are executed only each intervalStep steps
+_simulationStepCostFactor = 10
+
+# Device memory model (bytes). Rough estimates of the size of the UAMMD data structures
+_bytesPerParticle = 128 # Particle data: positions, velocities, forces, energies, ids, types, ...
+_bytesPerValue    = 4   # Single precision numbers and ids
+
+def _getForceField(sim):
+    if "topology" not in sim:
+        return {}
+    return sim["topology"].get("forceField",{})
+
+def _getNumberOfValues(entry):
+    """ Number of values (numbers, ids or names) stored in the data of an entry """
+    data = entry.get("data",[])
+    if len(data) == 0:
+        return 0
+
+    nValues = 0
+    for i,value in enumerate(data[0]):
+        if isinstance(value,list):
+            if len(value) > 0 and isinstance(value[0],list):
+                nValues += sum([len(v) for d in data for v in d[i]])
+            else:
+                #Lists of variable size (for example lists of ids)
+                nValues += sum([len(d[i]) for d in data])
+        else:
+            nValues += len(data)
+    return nValues
+
+def _getEntryArity(entry):
+    return len([lbl for lbl in entry.get("labels",[]) if lbl in simulation.id_labels])
+
+def getNumberOfParticles(sim):
+    try:
+        return len(sim["topology"]["structure"]["data"])
+    except KeyError:
+        return 0
+
+def getIntegrationSteps(sim):
+    """ Total number of steps of the integrators schedule """
+    if "integrator" not in sim or "schedule" not in sim["integrator"]:
+        return 0
+    schedule = sim["integrator"]["schedule"]
+    stepsIndex = schedule["labels"].index("steps")
+    return sum([d[stepsIndex] for d in schedule["data"]])
+
+def getNumberOfInteractions(sim):
+    """
+    Number of interactions evaluated per time step: bonded interactions, non-bonded
+    interactions (estimated from the number of particles) and external potentials.
+    """
+
+    N = getNumberOfParticles(sim)
+
+    nInteractions = 0
+    for entry in _getForceField(sim).values():
+        entryType = entry["type"][0]
+        if entryType.startswith("Bond"):
+            nInteractions += len(entry.get("data",[]))
+        elif entryType in ["NonBonded","PatchyParticles"]:
+            nInteractions += N*_nonBondedNeighbours
+        elif entryType in ["Surface","External"]:
+            nInteractions += N
+
+    return nInteractions
+
+def estimateDeviceMemory(sim):
+    """
+    Estimated device memory (bytes) required by the simulation. It includes the particle data,
+    bond lists (and the per particle bond references), neighbour lists and their exclusions,
+    non-bonded parameters (type matrices) and groups.
+    """
+
+    N = getNumberOfParticles(sim)
+
+    memory = N*_bytesPerParticle
+
+    entries = list(_getForceField(sim).values())
+    if "simulationStep" in sim:
+        entries += [step for step in sim["simulationStep"].values() if step["type"][0] == "Groups"]
+
+    for entry in entries:
+        entryType = entry["type"][0]
+
+        memory += _getNumberOfValues(entry)*_bytesPerValue
+
+        if entryType.startswith("Bond"):
+            #Each particle keeps the list of the bonds it is involved in
+            memory += len(entry.get("data",[]))*_getEntryArity(entry)*_bytesPerValue
+        elif entryType == "VerletConditionalListSet":
+            #One neighbour list for each condition (for example "intra_inter")
+            nLists  = len(entry["type"][1].split("_"))
+            memory += nLists*N*_nonBondedNeighbours*_bytesPerValue
+
+    return memory
+
+def getSerializedSize(sim):
+    """ Size (bytes) of the simulation serialized as compact JSON """
+    if isinstance(sim,simulation):
+        sim = sim.sim
+    return len(json.dumps(sim))
+
+def estimateSimulationCost(sim):
+    """
+    Estimated (relative) cost of running the simulation. It takes into account the number of particles,
+    the number of integration steps, the bonded and non-bonded interactions and the simulation steps
+    (with their intervals). Only useful to compare simulations, it is not a time.
+    """
+
+    N = getNumberOfParticles(sim)
+
+    #Integration and interactions
+    costPerStep = N + getNumberOfInteractions(sim)
+
+    #Simulation steps
+    if "simulationStep" in sim:
+        for step in sim["simulationStep"].values():
+            intervalStep = step.get("parameters",{}).get("intervalStep",None)
+            if intervalStep:
+                costPerStep += _simulationStepCostFactor*N/intervalStep
+
+    return max(1,getIntegrationSteps(sim))*costPerStep
+
+# Scoring properties available for the distribution of the simulation pool.
+# All of them are (approximately) additive: the score of a simulation set is the sum of the scores of its simulations
+scoringProperties = {"numberOfParticles":getNumberOfParticles,
+                     "numberOfInteractions":getNumberOfInteractions,
+                     "estimatedDeviceMemory":estimateDeviceMemory,
+                     "serializedSize":getSerializedSize,
+                     "estimatedCost":estimateSimulationCost}
@@ -1,5 +1,6 @@
 import logging
-import copy
+
+import numpy as np
 
 from .commonSelections import availableCommonSelections
 from .commonSelections import processCommonSelection
@@ -30,282 +31,291 @@ def selectionListType(selectionList):
         logger.error(f"[ProcessSelections] Selection list \"{selectionList}\" is not correct. Only lists of integers are allowed")
         raise Exception("Selection list is not correct")
 
-def extractDeepestParentheses(tokens):
+def getAllIds(models):
+    allIds = [mdl.getGlobalIds() for mdl in models]
+    # Convert list of lists to a single list
+    allIds = [i for sublist in allIds for i in sublist]
+
+    return allIds
+
+################ SELECTION EXPRESSIONS #################
+
+# Selection expressions are parsed into a tree of nodes:
+#   ("all",), ("none",)
+#   ("model", modelName, (selectionToken1, selectionToken2, ...))
+#   ("not", node), ("and", node1, node2), ("or", node1, node2)
+# Precedence is: not > and > or. Parentheses can be used to group.
+
+specialSelections = ["all","none"]
+modifiers         = ["not"]
+logicalOperators  = ["and","or","(",")"]
+
+def tokenizeSelection(expr):
+    procExpr = expr
+    procExpr = procExpr.replace("("," ( ")
+    procExpr = procExpr.replace(")"," ) ")
+
+    return [tk.strip() for tk in procExpr.split()]
+
+def parseSelection(tokens,modelNames):
 
     logger = logging.getLogger("VLMP")
 
-    maxDepth     = 0
-    currentDepth = 0
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def parseOr():
+        nonlocal position
+        node = parseAnd()
+        while peek() == "or":
+            position += 1
+            node = ("or",node,parseAnd())
+        return node
+
+    def parseAnd():
+        nonlocal position
+        node = parseNot()
+        while peek() == "and":
+            position += 1
+            node = ("and",node,parseNot())
+        return node
+
+    def parseNot():
+        nonlocal position
+        if peek() == "not":
+            position += 1
+            return ("not",parseNot())
+        return parseAtom()
+
+    def parseAtom():
+        nonlocal position
+        tk = peek()
+        if tk is None:
+            logger.error(f"[ParseSelection] Unexpected end of selection expression")
+            raise Exception("Selection syntax error")
+
+        position += 1
+        if tk == "(":
+            node = parseOr()
+            if peek() != ")":
+                logger.error("[ParseSelection] Parentheses are not balanced")
+                raise Exception("Parentheses are not balanced")
+            position += 1
+            return node
+        elif tk in specialSelections:
+            return (tk,)
+        elif tk in modelNames:
+            # Get all next tokens which are not logical operators nor special selections
+            modelSelection = []
+            while peek() is not None and peek() not in logicalOperators and peek() not in specialSelections:
+                modelSelection.append(peek())
+                position += 1
+            return ("model",tk,tuple(modelSelection))
+        elif tk in logicalOperators or tk in modifiers:
+            logger.error(f"[ParseSelection] Unexpected token \"{tk}\"")
+            raise Exception("Selection syntax error")
+        else:
+            logger.error(f"[ParseSelection] Unknown model \"{tk}\"")
+            raise Exception("Model not recognized")
 
-    for tk in tokens:
-        if tk == '(':
-            currentDepth += 1
-            if currentDepth > maxDepth:
-                maxDepth = currentDepth
-        elif tk == ')':
-            currentDepth -= 1
+    node = parseOr()
+    if position != len(tokens):
+        logger.error(f"[ParseSelection] Unexpected token \"{tokens[position]}\"")
+        raise Exception("Selection syntax error")
 
-    if currentDepth != 0:
-        logger.error("[ExtractDeepestParentheses] Parentheses are not balanced")
-        raise Exception("Parentheses are not balanced")
+    return node
 
-    currentDepth = 0
+class selectionEvaluator:
 
-    deepestStart = -1
-    deepestEnd   = -1
+    # Evaluates parsed selections over the models of a simulation.
+    # Particle selections are represented as boolean masks over the global ids,
+    # selections of pairs, triples, ... as arrays of sorted tuples (one per row).
+    # Every evaluated node is cached, so common expressions ("all", "not TIP", ...)
+    # are evaluated once per simulation.
 
-    for i, tk in enumerate(tokens):
-        if tk == '(':
-            currentDepth += 1
-            if currentDepth == maxDepth:
-                deepestStart = i
-        elif tk == ')':
-            if currentDepth == maxDepth:
-                deepestEnd = i
-                break
-            currentDepth -= 1
+    _models = None
+    _cache  = None
 
-    if deepestStart != -1 and deepestEnd != -1:
-        return tokens[deepestStart:deepestEnd+1], deepestStart, deepestEnd
+    def __init__(self,models):
 
-    return None, -1, -1
+        self.logger = logging.getLogger("VLMP")
 
-def evaluateTokens(tokens,allIds):
+        if selectionEvaluator._models is None or selectionEvaluator._models != models:
+            self.logger.debug("[SelectionEvaluator] Initializing selection evaluator")
 
-    logger = logging.getLogger("VLMP")
+            selectionEvaluator._models = models
+            selectionEvaluator._cache  = {}
 
-    logger.debug(f"[EvaluateTokens] Evaluating tokens: {tokens}")
+        self.availableModels     = {mdl.getName():mdl for mdl in models}
+        self.availableSelections = {mdl.getName():mdl.definedSelections for mdl in models}
 
-    evalTokens = []
-    if tokens[0] == "(" and tokens[-1] == ")":
-        evalTokens = tokens[1:-1]
-    else:
-        evalTokens = tokens
+        if "__allIds__" not in selectionEvaluator._cache:
+            allIds = np.asarray(getAllIds(models),dtype=int)
+            nIds   = int(allIds.max())+1 if len(allIds) > 0 else 0
 
-    if len(evalTokens) == 1:
-        return evalTokens[0]
+            allMask = np.zeros(nIds,dtype=bool)
+            allMask[allIds] = True
 
-    # Apply global not modifier if present
-    for i in range(len(evalTokens)-1):
-        if evalTokens[i] == "not":
-            if not isinstance(evalTokens[i+1],list):
-                logger.error(f"[EvaluateTokens] \"not\" modifier is not valid for token \"{evalTokens[i+1]}\"")
-                raise Exception("Selection syntax error")
-            if selectionListType(evalTokens[i+1]) != 1:
-                logger.error(f"[EvaluateTokens] \"not\" modifier is only valid for particle selections (no pairs, triples, ...)")
-                raise Exception("Selection syntax error")
-            evalTokens[i+1] = list(set(allIds).difference(set(evalTokens[i+1])))
-    # Remove not modifiers
-    evalTokens = [tk for tk in evalTokens if tk != "not"]
+            selectionEvaluator._cache["__allIds__"] = allMask
 
-    if len(evalTokens) == 1:
-        return evalTokens[0]
+        self.allMask = selectionEvaluator._cache["__allIds__"]
 
-    if len(evalTokens) > 3:
-        logger.error(f"[EvaluateTokens] Logical expression \"{evalTokens}\" is not correct, too many tokens")
-        raise Exception("Logical expression is not correct")
-    else:
-        op1 = evalTokens[0]
-        op2 = evalTokens[2]
-        op  = evalTokens[1]
+    # A selection value is a tuple (n,data).
+    # n = 0: empty selection, n = 1: particles (data is a mask), n > 1: n-tuples (data is an array)
 
-        if op == "and":
-            return list(set(op1).intersection(set(op2)))
-        elif op == "or":
-            return list(set(op1).union(set(op2)))
+    def __fromIds(self,ids):
+        listType = selectionListType(ids)
+        if listType == 0:
+            return (0,None)
+        if listType == 1:
+            mask = np.zeros_like(self.allMask)
+            mask[np.asarray(ids,dtype=int)] = True
+            return (1,mask)
+        return (listType,np.unique(np.sort(np.asarray(ids,dtype=int),axis=1),axis=0))
+
+    def toIds(self,value):
+        n,data = value
+        if n == 0:
+            return []
+        if n == 1:
+            return np.flatnonzero(data).tolist()
+        return data.tolist()
+
+    def __evaluateModelSelection(self,modelName,modelSelection):
+
+        model = self.availableModels[modelName]
+
+        if len(modelSelection) == 0:
+            # All model
+            return self.__fromIds(model.getGlobalIds())
+
+        isModified = (modelSelection[0] in modifiers)
+        if isModified:
+            modifier = modelSelection[0]
+            selectionType    = modelSelection[1]
+            selectionOptions = modelSelection[2:]
         else:
-            logger.error(f"[EvaluateTokens] Operator \"{op}\" is not valid")
-            raise Exception("Operator is not valid")
+            selectionType    = modelSelection[0]
+            selectionOptions = modelSelection[1:]
 
-    logger.error(f"[EvaluateTokens] Tokens are not correct, the following tokens are not valid: {tokens}")
-    raise Exception("Tokens are not correct")
+        if selectionType not in self.availableSelections[modelName] and selectionType not in availableCommonSelections:
+            self.logger.error(f"[ProcessSelections] Neither model \"{modelName}\" nor common selections have selection \"{selectionType}\"")
+            raise Exception("Selection not recognized")
 
-def getAllIds(models):
-    allIds = [mdl.getGlobalIds() for mdl in models]
-    # Convert list of lists to a single list
-    allIds = [i for sublist in allIds for i in sublist]
+        selectionOptions = " ".join(selectionOptions)
 
-    return allIds
+        if selectionType in availableCommonSelections and selectionType not in self.availableSelections[modelName]:
+            ids = processCommonSelection(model,selectionType,selectionOptions,applyOffset=False)
+            # Offset is applied after
+        else:
+            if selectionType in availableCommonSelections:
+                self.logger.debug(f"[ProcessSelections] Model \"{modelName}\" is overriding common selection \"{selectionType}\"")
+            ids = model.processSelection(selectionType,selectionOptions)
 
-def processSelections(models,selections):
+        if ids is None:
+            self.logger.error(f"[ProcessSelections] Model \"{modelName}\" does not process selection \"{selectionType}\" with options \"{selectionOptions}\"")
+            raise Exception("Selection not recognized")
 
-    logger = logging.getLogger("VLMP")
+        #Apply offset
+        if selectionListType(ids) > 0:
+            ids = (np.asarray(ids,dtype=int)+model.getIdOffset()).tolist()
 
-    specialSelections = ["all","none"]
-    modifiers         = ["not"]
-    logicalOperators  = ["and","or","(",")"]
+        value = self.__fromIds(ids)
 
-    availableModels     = {mdl.getName():mdl for mdl in models}
-    availableSelections = {mdl.getName():mdl.definedSelections for mdl in models}
+        if isModified:
+            if modifier == "not":
+                #Not modifier only works for particle selections
+                if value[0] > 1:
+                    self.logger.error(f"[ProcessSelections] Modifier \"{modifier}\" only works for particle selections (no pairs, triples, ...)")
+                    raise Exception("Selection syntax error")
+                value = self.__not(value,self.evaluate(("model",modelName,())))
+            else:
+                self.logger.error(f"[ProcessSelections] Modifier \"{modifier}\" is not recognized")
+                raise Exception("Selection syntax error")
+
+        return value
+
+    def __not(self,value,universe):
+        if value[0] > 1:
+            self.logger.error(f"[EvaluateSelection] \"not\" modifier is only valid for particle selections (no pairs, triples, ...)")
+            raise Exception("Selection syntax error")
+        if value[0] == 0:
+            return universe
+        if universe[0] == 0:
+            return (0,None)
+        return (1,universe[1] & ~value[1])
+
+    def __binary(self,op,value1,value2):
+        n1,data1 = value1
+        n2,data2 = value2
+
+        # Empty selections are compatible with any other selection
+        if n1 == 0 or n2 == 0:
+            if op == "and":
+                return (0,None)
+            return value2 if n1 == 0 else value1
+
+        if n1 != n2:
+            self.logger.error(f"[EvaluateSelection] Operator \"{op}\" applied to different types of lists")
+            raise Exception("Selection has different types of lists")
+
+        if n1 == 1:
+            data = (data1 & data2) if op == "and" else (data1 | data2)
+            return (1,data) if data.any() else (0,None)
 
-    # Buffering for allIds
-    allIds = None
+        if op == "and":
+            rows = set(map(tuple,data2.tolist()))
+            data = data1[[tuple(r) in rows for r in data1.tolist()]]
+        else:
+            data = np.unique(np.concatenate([data1,data2]),axis=0)
+        return (n1,data) if len(data) > 0 else (0,None)
+
+    def evaluate(self,node):
+
+        if node in selectionEvaluator._cache:
+            return selectionEvaluator._cache[node]
+
+        if node[0] == "all":
+            value = (1,self.allMask) if self.allMask.any() else (0,None)
+        elif node[0] == "none":
+            value = (0,None)
+        elif node[0] == "model":
+            value = self.__evaluateModelSelection(node[1],node[2])
+        elif node[0] == "not":
+            value = self.__not(self.evaluate(node[1]),self.evaluate(("all",)))
+        else:
+            value = self.__binary(node[0],self.evaluate(node[1]),self.evaluate(node[2]))
 
-    #Statr selection processing
+        selectionEvaluator._cache[node] = value
+        return value
+
+def processSelections(models,selections):
+
+    logger = logging.getLogger("VLMP")
+
+    evaluator = selectionEvaluator(models)
+    modelNames = evaluator.availableModels.keys()
+
+    #Start selection processing
     processedSelections = {}
     for sel,expr in selections.items():
 
         if sel in processedSelections.keys():
             logger.error(f"[ProcessSelections] Selection \"{sel}\" already processed")
             raise Exception("Selection already processed")
-        else:
-            processedSelections[sel] = []
-
-        procExpr = expr
-        procExpr = procExpr.replace("("," ( ")
-        procExpr = procExpr.replace(")"," ) ")
-
-        tokens = procExpr.split()
-        procTokens = []
-        ignoreTokens = 0
-        for tk in tokens:
-            tk = tk.strip()
-            if ignoreTokens > 0:
-                ignoreTokens -= 1
-                continue
-            if tk in logicalOperators or tk in modifiers:
-                procTokens.append(tk)
-            elif tk in specialSelections:
-                if tk == "all":
-                    if allIds is None:
-                        allIds = getAllIds(models)
-                    procTokens.append(allIds)
-                elif tk == "none":
-                    procTokens.append([])
-            elif tk in availableModels.keys():
-
-                try:
-                    # Get all next tokens which are not logical operators nor special selections
-                    currentModelSelection = []
-                    for i in range(tokens.index(tk)+1,len(tokens)):
-                        if tokens[i] in logicalOperators or tokens[i] in specialSelections:
-                            break
-                        else:
-                            currentModelSelection.append(tokens[i])
-
-                    if len(currentModelSelection) == 0:
-                        # All model
-                        procTokens.append(availableModels[tk].getGlobalIds())
-                        continue
-
-                    ignoreTokens = len(currentModelSelection)
-
-                    isModified = (currentModelSelection[0].strip() in modifiers)
-                    if isModified:
-                        modifier = currentModelSelection[0].strip()
-                        selectionType    = currentModelSelection[1]
-                        selectionOptions = currentModelSelection[2:]
-                    else:
-                        selectionType    = currentModelSelection[0]
-                        selectionOptions = currentModelSelection[1:]
-
-                    if selectionType not in availableSelections[tk] and selectionType not in availableCommonSelections:
-                        logger.error(f"[ProcessSelections] Neither model \"{tk}\" nor common selections have selection \"{selectionType}\"")
-                        raise Exception("Selection not recognized")
-
-                    selectionOptions = " ".join(selectionOptions)
-
-                    if selectionType in availableCommonSelections and selectionType not in availableSelections[tk]:
-                        ids = processCommonSelection(availableModels[tk],selectionType,selectionOptions,applyOffset=False)
-                        # Offset is applied after
-                    else:
-                        if selectionType in availableCommonSelections:
-                            logger.debug(f"[ProcessSelections] Model \"{tk}\" is overriding common selection \"{selectionType}\"")
-                        ids = availableModels[tk].processSelection(selectionType,selectionOptions)
-
-                    if ids is None:
-                        logger.error(f"[ProcessSelections] Model \"{tk}\" does not process selection \"{selectionType}\" with options \"{selectionOptions}\"")
-                        raise Exception("Selection not recognized")
-
-                    #Apply offset
-                    listType = selectionListType(ids)
-                    if listType == 1:
-                        ids = [i+availableModels[tk].getIdOffset() for i in ids]
-                    else:
-                        for i in range(len(ids)):
-                            ids[i] = [j+availableModels[tk].getIdOffset() for j in ids[i]]
-
-                    if isModified:
-                        if modifier == "not":
-                            #Not modifier only works for listType 1
-                            if listType != 1:
-                                logger.error(f"[ProcessSelections] Modifier \"{modifier}\" only works for particle selections (no pairs, triples, ...)")
-                                raise Exception("Selection syntax error")
-                            ids = list(set(availableModels[tk].getGlobalIds()).difference(set(ids)))
-                        else:
-                            logger.error(f"[ProcessSelections] Modifier \"{modifier}\" is not recognized")
-                            raise Exception("Selection syntax error")
-
-                    procTokens.append(ids)
-                except Exception as e:
-                    failedSelection = tk + " " + " ".join(currentModelSelection)
-                    logger.error(f"[ProcessSelections] Selection \"{sel}\" has a syntax error. Error processing model selection \"{failedSelection}\"")
-                    raise Exception("Selection syntax error")
-            else:
-                logger.error(f"[ProcessSelections] Selection \"{sel}\" refers to an unknown model \"{tk}\"")
-                raise Exception("Model not recognized")
-
-        # At this point, procTokens is a list of lists and logical operators
-        # We check here if all list are the same type
-        # Lists can be a list of integers: [1,2,3,4,...]
-        # List of pairs of integers: [[1,2],[3,4],...]
-        # List of triples of integers: [[1,2,3],[4,5,6],...]
-        # ...
-        # In general, a list of n-tuples of integers
-        # But all lists must have the same type
-
-        listType = -1
-        for i in range(len(procTokens)):
-            if procTokens[i] in logicalOperators or procTokens[i] in modifiers:
-                continue
-            else:
-                if listType == -1:
-                    listType = selectionListType(procTokens[i])
-                elif listType != selectionListType(procTokens[i]):
-                    logger.error(f"[ProcessSelections] Selection \"{sel}\" has different types of lists")
-                    raise Exception("Selection has different types of lists")
-
-        # If not is present we preprer the list of all ids
-        for i in range(len(procTokens)):
-            if procTokens[i] == "not":
-                if allIds is None:
-                    allIds = getAllIds(models)
-                    break
 
         try:
-            while len(procTokens) > 1:
-                toProcess, start, end = extractDeepestParentheses(procTokens)
-                if toProcess is None:
-                    # Full expression is processed
-                    toProcess = copy.deepcopy(procTokens)
-                    start = 0
-                    end   = len(procTokens)-1
-                processed = evaluateTokens(toProcess,allIds)
-                # Replace tokens
-                procTokens = procTokens[:start] + [processed] + procTokens[end+1:]
+            node = parseSelection(tokenizeSelection(expr),modelNames)
+            processedSelections[sel] = evaluator.toIds(evaluator.evaluate(node))
         except Exception as e:
-            logger.error(f"[ProcessSelections] Selection \"{sel}\" has a syntax error")
-            raise Exception("Selection syntax error")
-
-        # Clean up
-        procTokens = procTokens[0]
-        if selectionListType(procTokens) == 1:
-            procTokens = list(set(procTokens))
-        else:
-            # Sort every sublist and convert to tuple
-            for i in range(len(procTokens)):
-                procTokens[i] = tuple(sorted(procTokens[i]))
-            # Remove duplicates
-            procTokens = list(set(procTokens))
-            # Convert back to list
-            for i in range(len(procTokens)):
-                procTokens[i] = list(procTokens[i])
-
+            logger.error(f"[ProcessSelections] Error processing selection \"{sel}\": \"{expr}\"")
+            raise e
 
-        processedSelections[sel] = procTokens
         logger.debug(f"[ProcessSelections] Selection \"{sel}\" processed: {processedSelections[sel]}")
 
-    return copy.deepcopy(processedSelections)
+    return processedSelections
 
 def splitStateAccordingStructure(state,structure):
 
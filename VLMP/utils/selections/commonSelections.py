@@ -4,6 +4,7 @@ import logging
 
 from VLMP.utils.input import getLabelIndex
 from VLMP.utils.input.stringUtils import string2integerList
+from VLMP.utils.tables import getTableValues
 
 availableCommonSelections = [
         'id',
@@ -40,22 +41,25 @@ def modelStructureSelection(model, selectionType, selectionOptions, applyOffset=
         # Selection options is a list of integers (as string)
         selectedIDs = string2integerList(selectionOptions)
         # Check if all selectedIDs are in model.getLocalIds()
-        localIds = model.getLocalIds()
-        if set(selectedIDs).issubset(localIds):
+        if model.hasLocalIds(selectedIDs):
             sel = selectedIDs
     else:
-        idLabelIndex  = getLabelIndex("id",structure["labels"])
-        strLabelIndex = getLabelIndex(selectionType,structure["labels"])
-
         if selectionType in ["resId","chainId","modelId"]:
             selectionOptions = string2integerList(selectionOptions)
         else: # selectionType == "type"
             selectionOptions = selectionOptions.split()
             selectionOptions = [x.strip() for x in selectionOptions]
 
-        for i in range(len(structure["data"])):
-            if structure["data"][i][strLabelIndex] in selectionOptions:
-                sel.append(structure["data"][i][idLabelIndex])
+        # Rows of the structure matching the options, taken from the inverted index.
+        # Rows are sorted so the structure order is kept.
+        structureIndex = model.getStructureIndex(selectionType)
+        selectedRows = [structureIndex[opt] for opt in set(selectionOptions) if opt in structureIndex]
+        if len(selectedRows) == 1:
+            selectedRows = selectedRows[0]
+        else:
+            selectedRows = sorted([row for rows in selectedRows for row in rows])
+
+        sel = getTableValues(structure,"id",selectedRows)
 
     ##############################################################
 
@@ -0,0 +1,260 @@
+import copy
+import pickle
+
+import logging
+
+import numpy as np
+
+from ..input import getLabelIndex
+
+class categoricalColumn:
+    """
+    Column of repeated values (for example particle types) stored as the
+    list of different values (categories) and an integer code for each row.
+    """
+
+    def __init__(self,categories,codes):
+        self.categories = np.asarray(categories)
+        self.codes      = np.asarray(codes,dtype=np.int64)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def getValues(self):
+        return self.categories[self.codes]
+
+    def tolist(self):
+        categories = self.categories.tolist()
+        return [categories[c] for c in self.codes.tolist()]
+
+class columnarTable:
+    """
+    Table (state, structure or force field entry) stored by columns. Each column is
+    a numpy array with one row per particle (or bond), positions are (N,3) arrays.
+
+    The table can be used where the pyUAMMD layout ({"labels":[...],"data":[...]}) is expected.
+    Accessing "data" materializes the rows and, from then on, the table is backed by the rows,
+    so code modifying them in place keeps working. Other entries (for example "type" and
+    "parameters" of a force field entry) are stored as they are given.
+    """
+
+    def __init__(self,labels,columns,**entries):
+
+        self.logger = logging.getLogger("VLMP")
+
+        self._labels  = list(labels)
+        self._entries = entries.copy()
+
+        if len(columns) != len(self._labels):
+            self.logger.error(f"[ColumnarTable] Number of columns ({len(columns)}) does not match the number of labels ({len(self._labels)})")
+            raise Exception("Columns and labels do not match")
+
+        self._columns = {}
+        for lbl,col in zip(self._labels,columns):
+            if not isinstance(col,categoricalColumn):
+                col = np.asarray(col)
+            self._columns[lbl] = col
+
+        lengths = set([len(col) for col in self._columns.values()])
+        if len(lengths) > 1:
+            self.logger.error(f"[ColumnarTable] Columns have different lengths ({lengths})")
+            raise Exception("Columns have different lengths")
+
+        self._nRows = lengths.pop() if len(lengths) == 1 else 0
+        self._data  = None
+
+        #Columns shared with other tables (see copy), they are copied before being modified
+        self._sharedColumns = set()
+
+    ########################################################
+
+    def isColumnar(self):
+        return self._data is None
+
+    def __len__(self):
+        if self._data is not None:
+            return len(self._data)
+        return self._nRows
+
+    def getLabels(self):
+        return self._labels
+
+    def getColumn(self,label):
+        """ Column of the table as a numpy array. If the table is columnar the array is not copied """
+        index = getLabelIndex(label,self._labels)
+        if self._data is not None:
+            return toColumn([row[index] for row in self._data])
+
+        col = self._columns[label]
+        if isinstance(col,categoricalColumn):
+            return col.getValues()
+        return col
+
+    def setColumnValues(self,label,rows,values):
+        """ Set the values of the given rows of a column """
+        index = getLabelIndex(label,self._labels)
+        if self._data is not None:
+            for row,v in zip(np.asarray(rows).tolist(),values.tolist()):
+                self._data[row][index] = v
+            return
+
+        col = self._columns[label]
+        if isinstance(col,categoricalColumn):
+            col = np.asarray(col.getValues(),dtype=object)
+        elif col.dtype.kind in "biuf" and values.dtype.kind in "biuf":
+            col = col.astype(np.result_type(col,values),copy=False)
+        if label in self._sharedColumns and col is self._columns[label]:
+            col = col.copy()
+        self._sharedColumns.discard(label)
+        col[rows] = values
+        self._columns[label] = col
+
+    def copy(self):
+        """
+        Copy of the table. If the table is columnar, columns are shared (copy on write):
+        a column is only copied when its values are set. Otherwise the rows are copied.
+        """
+        if self._data is not None:
+            table = columnarTable(self._labels,[[] for _ in self._labels],**copy.deepcopy(self._entries))
+            table._data    = copyData(self._data)
+            table._columns = None
+            return table
+
+        table = columnarTable.__new__(columnarTable)
+        table.logger   = self.logger
+        table._labels  = self._labels.copy()
+        table._entries = copy.deepcopy(self._entries)
+        table._columns = self._columns.copy()
+        table._nRows   = self._nRows
+        table._data    = None
+
+        table._sharedColumns = set(self._labels)
+        self._sharedColumns  = set(self._labels)
+
+        return table
+
+    ########################################################
+
+    def __materialize(self,copyObjects=True):
+        columns = []
+        for lbl in self._labels:
+            col = self._columns[lbl]
+            if copyObjects and isinstance(col,np.ndarray) and col.dtype == object:
+                #Object columns (for example lists of ids) can hold mutable values
+                columns.append(copy.deepcopy(col.tolist()))
+            else:
+                columns.append(col.tolist())
+        return [list(row) for row in zip(*columns)]
+
+    def toDict(self,handOver=False):
+        """
+        Table in the pyUAMMD layout. The returned object does not share data with the table,
+        unless handOver is True. In that case nothing is copied and the table must not be used afterwards.
+        """
+        if handOver:
+            table = self._entries.copy()
+            table["labels"] = self._labels
+            table["data"]   = self._data if self._data is not None else self.__materialize(copyObjects=False)
+            return table
+
+        if self._data is not None:
+            data = copy.deepcopy(self._data)
+        else:
+            data = self.__materialize()
+
+        table = copy.deepcopy(self._entries)
+        table["labels"] = self._labels.copy()
+        table["data"]   = data
+        return table
+
+    ########################################################
+
+    def keys(self):
+        return list(self._entries.keys())+["labels","data"]
+
+    def items(self):
+        return [(key,self[key]) for key in self.keys()]
+
+    def __contains__(self,key):
+        return key in self._entries or key in ["labels","data"]
+
+    def __getitem__(self,key):
+        if key == "labels":
+            return self._labels
+        if key == "data":
+            if self._data is None:
+                self._data    = self.__materialize()
+                self._columns = None
+            return self._data
+        return self._entries[key]
+
+    def __setitem__(self,key,value):
+        if key == "labels":
+            self.__getitem__("data")
+            self._labels = value
+        elif key == "data":
+            self._data    = value
+            self._columns = None
+        else:
+            self._entries[key] = value
+
+def toColumn(values):
+    """ Numpy array from a list of values. Not homogeneous data (lists of different sizes) gives an object array """
+    try:
+        column = np.asarray(values)
+        if column.dtype != object:
+            return column
+    except ValueError:
+        pass
+    column = np.empty(len(values),dtype=object)
+    column[:] = values
+    return column
+
+# The functions below accept both columnar tables and tables in the pyUAMMD layout
+
+def getTableLength(table):
+    if isinstance(table,columnarTable):
+        return len(table)
+    return len(table["data"])
+
+def getTableColumn(table,label):
+    if isinstance(table,columnarTable):
+        return table.getColumn(label)
+    index = getLabelIndex(label,table["labels"])
+    return toColumn([row[index] for row in table["data"]])
+
+def getTableValues(table,label,rows):
+    """ Values (list) of the column label for the given rows """
+    if isinstance(table,columnarTable) and table.isColumnar():
+        return table.getColumn(label)[np.asarray(rows,dtype=int)].tolist()
+    index = getLabelIndex(label,table["labels"])
+    data  = table["data"]
+    return [data[row][index] for row in rows]
+
+def setTableValues(table,label,rows,values):
+    values = toColumn(values)
+    if isinstance(table,columnarTable):
+        table.setColumnValues(label,rows,values)
+        return
+    index = getLabelIndex(label,table["labels"])
+    data  = table["data"]
+    for row,v in zip(np.asarray(rows).tolist(),values.tolist()):
+        data[row][index] = v
+
+def copyData(data):
+    """ Deep copy of JSON-like data (tables rows, dictionaries of tables, ...). Faster than copy.deepcopy for large tables """
+    return pickle.loads(pickle.dumps(data,protocol=pickle.HIGHEST_PROTOCOL))
+
+def copyTable(table):
+    """ Copy of a table, columnar tables are copied on write (see columnarTable.copy) """
+    if isinstance(table,columnarTable):
+        return table.copy()
+    return copyData(table)
+
+def tableToDict(table,handOver=False):
+    """ Copy of the table in the pyUAMMD layout. If handOver is True the table is not copied (see columnarTable.toDict) """
+    if isinstance(table,columnarTable):
+        return table.toDict(handOver)
+    if handOver:
+        return table
+    return copy.deepcopy(table)